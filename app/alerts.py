@@ -0,0 +1,324 @@
+import json
+import logging
+import operator
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, func, insert, or_, select
+from sqlalchemy.orm import Session
+
+from . import models
+
+# 体征异常告警
+# 告警规则（阈值）可通过 ALERT_RULES_FILE 指向的 JSON 文件配置，启动时编译为比较函数；
+# 随访新增/修改/批量导入时在同一事务中求值并写入 follow_up_alerts 表，
+# “某医生的未处理告警”只需走 (doctor_id, status, id) 索引。
+
+logger = logging.getLogger(__name__)
+
+ALERT_RULES_ENV = "ALERT_RULES_FILE"
+ALERT_STATUS_OPEN = "open"
+ALERT_STATUS_RESOLVED = "resolved"
+SEVERITY_CRITICAL = "critical"
+SEVERITY_WARNING = "warning"
+BACKFILL_CHUNK_SIZE = 5000
+
+# 默认规则：同一规则有多个级别时取最严重的一级，每条随访每条规则最多产生一条告警
+DEFAULT_RULES = [
+    {"name": "systolic_high", "metric": "systolic_blood_pressure", "op": ">=", "message": "收缩压偏高",
+     "levels": [{"threshold": 180, "severity": SEVERITY_CRITICAL}, {"threshold": 140, "severity": SEVERITY_WARNING}]},
+    {"name": "systolic_low", "metric": "systolic_blood_pressure", "op": "<", "message": "收缩压偏低",
+     "levels": [{"threshold": 90, "severity": SEVERITY_WARNING}]},
+    {"name": "diastolic_high", "metric": "diastolic_blood_pressure", "op": ">=", "message": "舒张压偏高",
+     "levels": [{"threshold": 110, "severity": SEVERITY_CRITICAL}, {"threshold": 90, "severity": SEVERITY_WARNING}]},
+    {"name": "blood_oxygen_low", "metric": "blood_oxygen", "op": "<", "message": "血氧饱和度偏低",
+     "levels": [{"threshold": 90, "severity": SEVERITY_CRITICAL}, {"threshold": 95, "severity": SEVERITY_WARNING}]},
+    {"name": "blood_glucose_high", "metric": "blood_glucose", "op": ">=", "message": "血糖偏高",
+     "levels": [{"threshold": 16.7, "severity": SEVERITY_CRITICAL}, {"threshold": 11.1, "severity": SEVERITY_WARNING}]},
+    {"name": "blood_glucose_low", "metric": "blood_glucose", "op": "<", "message": "血糖偏低",
+     "levels": [{"threshold": 3.0, "severity": SEVERITY_CRITICAL}, {"threshold": 3.9, "severity": SEVERITY_WARNING}]},
+    {"name": "temperature_high", "metric": "temperature", "op": ">=", "message": "体温偏高",
+     "levels": [{"threshold": 39.0, "severity": SEVERITY_CRITICAL}, {"threshold": 37.3, "severity": SEVERITY_WARNING}]},
+    {"name": "temperature_low", "metric": "temperature", "op": "<", "message": "体温偏低",
+     "levels": [{"threshold": 35.5, "severity": SEVERITY_WARNING}]},
+    {"name": "heart_rate_abnormal_high", "metric": "heart_rate", "op": ">", "message": "心率过快",
+     "levels": [{"threshold": 120, "severity": SEVERITY_CRITICAL}, {"threshold": 100, "severity": SEVERITY_WARNING}]},
+    {"name": "heart_rate_abnormal_low", "metric": "heart_rate", "op": "<", "message": "心率过缓",
+     "levels": [{"threshold": 40, "severity": SEVERITY_CRITICAL}, {"threshold": 50, "severity": SEVERITY_WARNING}]},
+]
+
+_OPERATORS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+
+
+class CompiledRule:
+    """一条规则编译后的形式：比较函数 + 按严重程度排好序的阈值"""
+
+    __slots__ = ("name", "metric", "message", "compare", "levels")
+
+    def __init__(self, config: dict):
+        op = config["op"]
+        if op not in _OPERATORS:
+            raise ValueError(f"告警规则 {config.get('name')} 的比较符无效: {op}")
+        if config["metric"] not in models.FollowUp.__table__.columns:
+            raise ValueError(f"告警规则 {config.get('name')} 的指标不存在: {config['metric']}")
+        self.name = config["name"]
+        self.metric = config["metric"]
+        self.message = config.get("message") or self.name
+        self.compare = _OPERATORS[op]
+        # 偏高类规则阈值从高到低检查，偏低类从低到高，第一个命中的即最严重级别
+        self.levels = sorted(
+            ((float(level["threshold"]), level["severity"]) for level in config["levels"]),
+            reverse=op in (">", ">=")
+        )
+
+    def evaluate(self, value) -> Optional[dict]:
+        if value is None:
+            return None
+        value = float(value)
+        for threshold, severity in self.levels:
+            if self.compare(value, threshold):
+                return {
+                    "rule": self.name,
+                    "metric": self.metric,
+                    "value": value,
+                    "severity": severity,
+                    "message": f"{self.message}: {value:g}（阈值 {threshold:g}）",
+                }
+        return None
+
+
+class RuleSet:
+    def __init__(self, configs: List[dict]):
+        self.rules = [CompiledRule(config) for config in configs]
+        self.metrics = sorted({rule.metric for rule in self.rules})
+
+    def evaluate(self, row) -> List[dict]:
+        """row 为字典或 FollowUp 对象，返回命中的告警（不含随访/老人/医生ID）"""
+        get = row.get if isinstance(row, dict) else lambda name: getattr(row, name, None)
+        hits = []
+        for rule in self.rules:
+            hit = rule.evaluate(get(rule.metric))
+            if hit is not None:
+                hits.append(hit)
+        return hits
+
+    def evaluate_many(self, rows: Iterable) -> List[List[dict]]:
+        """批量求值，结果与 rows 一一对应"""
+        return [self.evaluate(row) for row in rows]
+
+
+_rule_set: Optional[RuleSet] = None
+_rule_lock = threading.Lock()
+
+
+def load_rule_configs(path: str = None) -> List[dict]:
+    path = path or os.getenv(ALERT_RULES_ENV)
+    if not path:
+        return DEFAULT_RULES
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def configure_rules(path: str = None) -> RuleSet:
+    """启动时调用：读取并编译规则（配置有误时启动即失败，而不是在写入随访时才报错）"""
+    global _rule_set
+    rule_set = RuleSet(load_rule_configs(path))
+    with _rule_lock:
+        _rule_set = rule_set
+    logger.info(f"告警规则编译完成，共 {len(rule_set.rules)} 条")
+    return rule_set
+
+
+def get_rule_set() -> RuleSet:
+    """未在启动时配置（如独立脚本）时按默认方式编译一次"""
+    rule_set = _rule_set
+    if rule_set is None:
+        rule_set = configure_rules()
+    return rule_set
+
+
+def _alert_rows(follow_up_id: int, elderly_id: int, doctor_id: int, hits: List[dict]) -> List[dict]:
+    return [
+        dict(hit, follow_up_id=follow_up_id, elderly_id=elderly_id, doctor_id=doctor_id, status=ALERT_STATUS_OPEN)
+        for hit in hits
+    ]
+
+
+def write_alerts(db: Session, rows: List[dict]):
+    """一次插入多条告警，不提交事务"""
+    if rows:
+        db.execute(insert(models.FollowUpAlert), rows)
+
+
+def evaluate_follow_up(db: Session, follow_up: models.FollowUp):
+    """
+    新增/修改单条随访后调用（需已 flush 得到ID），不提交事务
+    已处理的告警保留；仍然异常的未处理告警更新数值；不再异常的未处理告警删除
+    """
+    hits = {hit["rule"]: hit for hit in get_rule_set().evaluate(follow_up)}
+    existing = {
+        alert.rule: alert for alert in db.query(models.FollowUpAlert)
+        .filter(models.FollowUpAlert.follow_up_id == follow_up.id)
+    }
+    new_rows = []
+    for rule, hit in hits.items():
+        alert = existing.get(rule)
+        if alert is None:
+            new_rows.extend(_alert_rows(follow_up.id, follow_up.elderly_id, follow_up.doctor_id, [hit]))
+        elif alert.status == ALERT_STATUS_OPEN:
+            alert.value = hit["value"]
+            alert.severity = hit["severity"]
+            alert.message = hit["message"]
+            alert.elderly_id = follow_up.elderly_id
+            alert.doctor_id = follow_up.doctor_id
+    for rule, alert in existing.items():
+        if rule not in hits and alert.status == ALERT_STATUS_OPEN:
+            db.delete(alert)
+    write_alerts(db, new_rows)
+
+
+def alerts_for_follow_ups(rows: Iterable) -> List[dict]:
+    """rows 为已入库的随访（含 id/elderly_id/doctor_id 及规则用到的指标），返回待写入的告警行"""
+    rows = list(rows)
+    return [
+        alert
+        for row, hits in zip(rows, get_rule_set().evaluate_many(rows))
+        for alert in _alert_rows(row["id"], row["elderly_id"], row["doctor_id"], hits)
+    ]
+
+
+def _read_back_ids(db: Session, rows: List[dict], elderly_ids: set, before_id: int) -> List[Optional[int]]:
+    """
+    不支持 RETURNING 的数据库（MySQL）：一次查询取回本批插入的、属于 elderly_ids 的随访ID，结果与 rows 一一对应
+    按老人分组对应：同一老人的记录在同一条批量插入中按参数顺序分配递增的ID；
+    可重复读隔离级别下 id > before_id 只会读到本事务插入的行
+    """
+    table = models.FollowUp.__table__
+    conditions = [table.c.elderly_id.in_([elderly_id for elderly_id in elderly_ids if elderly_id is not None])]
+    if None in elderly_ids:
+        conditions.append(table.c.elderly_id.is_(None))
+    inserted = defaultdict(list)
+    for follow_up_id, elderly_id in db.execute(
+        select(table.c.id, table.c.elderly_id).where(table.c.id > before_id, or_(*conditions)).order_by(table.c.id)
+    ):
+        inserted[elderly_id].append(follow_up_id)
+    positions = defaultdict(list)
+    for index, row in enumerate(rows):
+        if row.get("elderly_id") in elderly_ids:
+            positions[row.get("elderly_id")].append(index)
+    ids = [None] * len(rows)
+    for elderly_id, indexes in positions.items():
+        for index, follow_up_id in zip(indexes, inserted[elderly_id][-len(indexes):]):
+            ids[index] = follow_up_id
+    return ids
+
+
+def insert_follow_ups_with_alerts(db: Session, rows: List[dict]) -> int:
+    """
+    批量插入随访并生成告警，不提交事务，返回告警条数
+    先整批求值，全部随访一次批量插入；有告警时取回这些随访的ID（支持 RETURNING 的数据库在插入时按参数顺序返回，
+    MySQL 插入后按插入前的最大ID一次查回），告警最后一次性写入
+    """
+    if not rows:
+        return 0
+    results = get_rule_set().evaluate_many(rows)
+    if not any(results):
+        db.execute(insert(models.FollowUp), rows)
+        return 0
+    if db.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order:
+        ids = db.execute(
+            insert(models.FollowUp).returning(models.FollowUp.id, sort_by_parameter_order=True), rows
+        ).scalars().all()
+    else:
+        before_id = db.execute(select(func.max(models.FollowUp.id))).scalar() or 0
+        db.execute(insert(models.FollowUp), rows)
+        flagged = {row.get("elderly_id") for row, hits in zip(rows, results) if hits}
+        ids = _read_back_ids(db, rows, flagged, before_id)
+    alert_rows = []
+    for row, hits, follow_up_id in zip(rows, results, ids):
+        if hits:
+            alert_rows.extend(_alert_rows(follow_up_id, row.get("elderly_id"), row.get("doctor_id"), hits))
+    write_alerts(db, alert_rows)
+    return len(alert_rows)
+
+
+def delete_follow_up_alerts(db: Session, follow_up_id: int):
+    """删除随访记录前调用"""
+    db.execute(delete(models.FollowUpAlert).where(models.FollowUpAlert.follow_up_id == follow_up_id))
+
+
+def backfill_alerts(db: Session, chunk_size: int = BACKFILL_CHUNK_SIZE) -> int:
+    """
+    为已有随访补算告警（数据迁移后运行），按随访ID分批，每批一个事务
+    只读取规则用到的指标列，已存在的 (随访, 规则) 告警跳过
+    """
+    rule_set = get_rule_set()
+    table = models.FollowUp.__table__
+    columns = [table.c.id, table.c.elderly_id, table.c.doctor_id] + [table.c[name] for name in rule_set.metrics]
+    created = 0
+    last_id = 0
+    while True:
+        batch = db.execute(
+            select(*columns).where(table.c.id > last_id).order_by(table.c.id).limit(chunk_size)
+        ).mappings().all()
+        if not batch:
+            break
+        existing = {
+            (row[0], row[1]) for row in db.execute(
+                select(models.FollowUpAlert.follow_up_id, models.FollowUpAlert.rule)
+                .where(models.FollowUpAlert.follow_up_id.between(batch[0]["id"], batch[-1]["id"]))
+            )
+        }
+        alert_rows = [
+            alert for alert in alerts_for_follow_ups(batch)
+            if (alert["follow_up_id"], alert["rule"]) not in existing
+        ]
+        write_alerts(db, alert_rows)
+        db.commit()
+        created += len(alert_rows)
+        last_id = batch[-1]["id"]
+    logger.info(f"告警补算完成，新增 {created} 条")
+    return created
+
+
+def get_doctor_alerts(db: Session, doctor_id: int, alert_status: str = ALERT_STATUS_OPEN,
+                      page: int = 1, per_page: int = 20) -> dict:
+    """某医生的告警（默认未处理），按ID倒序分页"""
+    query = db.query(models.FollowUpAlert).filter(
+        models.FollowUpAlert.doctor_id == doctor_id,
+        models.FollowUpAlert.status == alert_status
+    )
+    total = query.with_entities(func.count(models.FollowUpAlert.id)).scalar() or 0
+    items = query.order_by(models.FollowUpAlert.id.desc()).offset((page - 1) * per_page).limit(per_page).all()
+    return {
+        "items": items,
+        "total": total,
+        "page": page,
+        "per_page": per_page,
+        "total_pages": (total + per_page - 1) // per_page,
+    }
+
+
+def resolve_alert(db: Session, alert_id: int):
+    alert = db.query(models.FollowUpAlert).filter(models.FollowUpAlert.id == alert_id).first()
+    if alert is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="告警不存在")
+    if alert.status != ALERT_STATUS_RESOLVED:
+        alert.status = ALERT_STATUS_RESOLVED
+        alert.resolved_at = datetime.now()
+        db.commit()
+        db.refresh(alert)
+    return alert
+
+
+if __name__ == "__main__":
+    from .database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine, tables=[models.FollowUpAlert.__table__])
+    configure_rules()
+    with SessionLocal() as session:
+        print(f"告警补算完成，新增 {backfill_alerts(session)} 条")
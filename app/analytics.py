@@ -0,0 +1,289 @@
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import select, type_coerce
+from sqlalchemy.orm import Session
+from sqlalchemy.types import NullType
+
+from . import models
+from .crud import apply_follow_up_filters
+
+try:
+    import numpy as np  # 可选依赖，统计分析接口需要
+except ImportError:
+    np = None
+
+# 人群统计分析
+# 只读取所需的指标列，按批从服务端游标取出后直接转成 NumPy 数组（空值为 NaN），
+# 分组计数/求和用 bincount，分位数对排序后的数组切片计算，全程不构造 ORM 对象。
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_CHUNK_SIZE = 100000  # 每批从游标读取的行数
+DEFAULT_PERCENTILES = [5, 25, 50, 75, 95]
+DEFAULT_HISTOGRAM_BINS = 20
+
+# 血压控制达标：收缩压 < 140 且 舒张压 < 90 (mmHg)
+BP_SYSTOLIC_TARGET = 140
+BP_DIASTOLIC_TARGET = 90
+
+# 年龄分段（左闭右开）
+AGE_BANDS = [(0, 60, "<60"), (60, 70, "60-69"), (70, 80, "70-79"), (80, 90, "80-89"), (90, 200, "90+")]
+# BMI 分类（中国成人标准）
+BMI_CATEGORIES = [(0, 18.5, "偏瘦"), (18.5, 24, "正常"), (24, 28, "超重"), (28, 1000, "肥胖")]
+
+# 尿常规异常判定：定性项目 > 0 为阳性，pH 与比重超出参考范围为异常
+URINE_POSITIVE_ITEMS = [
+    "urine_protein", "urine_glucose", "urine_blood", "urine_ketone",
+    "urine_nitrite", "urine_wbc", "urine_bilirubin"
+]
+URINE_RANGE_ITEMS = {
+    "urine_ph": (4.5, 8.0),
+    "urine_specific_gravity": (1.003, 1.030),
+}
+
+GROUP_BY_DOCTOR = "doctor"
+GROUP_BY_AGE_BAND = "age_band"
+GROUP_BY_NONE = "none"
+
+
+def _require_numpy():
+    if np is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="统计分析需要安装 numpy"
+        )
+
+
+def load_columns(db: Session, columns: Dict[str, object], filters: Optional[dict] = None,
+                 join_elderly: bool = False, chunk_size: int = ANALYTICS_CHUNK_SIZE) -> Dict[str, "np.ndarray"]:
+    """
+    按批读取 columns（名称 -> 列表达式）并返回 名称 -> float64 数组
+    filters 为 apply_follow_up_filters 的参数；join_elderly 为 True 时可使用老人表的列（如年龄）
+    """
+    _require_numpy()
+    stmt = select(*[type_coerce(expr, NullType()).label(name) for name, expr in columns.items()]) \
+        .select_from(models.FollowUp)
+    if join_elderly:
+        stmt = stmt.join(models.Elderly, models.Elderly.id == models.FollowUp.elderly_id)
+    stmt = apply_follow_up_filters(stmt, **(filters or {}))
+
+    result = db.connection().execute(stmt.execution_options(stream_results=True, yield_per=chunk_size))
+    # 驱动返回的 None 转为 NaN，Decimal 转为 float；先转为普通元组，numpy 处理 Row 对象很慢
+    chunks = [np.array([tuple(row) for row in rows], dtype=np.float64) for rows in result.partitions()]
+    data = np.concatenate(chunks) if chunks else np.empty((0, len(columns)))
+    return {name: data[:, position] for position, name in enumerate(columns)}
+
+
+def group_inverse(keys: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray"]:
+    """返回 (分组键, 每行所属分组下标)，键为 NaN 的行归入 -1"""
+    keys = np.where(np.isnan(keys), -1, keys).astype(np.int64)
+    return np.unique(keys, return_inverse=True)
+
+
+def grouped_percentiles(values: "np.ndarray", inverse: "np.ndarray", group_count: int,
+                        percentiles: List[float]) -> "np.ndarray":
+    """按组计算分位数，values 中的 NaN 已排除；返回 (组数, 分位数个数)，空组为 NaN"""
+    order = np.lexsort((values, inverse))
+    sorted_values = values[order]
+    bounds = np.searchsorted(inverse[order], np.arange(group_count + 1))
+    output = np.full((group_count, len(percentiles)), np.nan)
+    for group in range(group_count):
+        segment = sorted_values[bounds[group]:bounds[group + 1]]
+        if segment.size:
+            output[group] = np.percentile(segment, percentiles)
+    return output
+
+
+def band_index(values: "np.ndarray", bands) -> "np.ndarray":
+    """按 (下界, 上界, 标签) 分段，返回段下标，不在任何段内（含 NaN）返回 -1"""
+    edges = np.array([band[0] for band in bands] + [bands[-1][1]], dtype=np.float64)
+    index = np.searchsorted(edges, values, side="right") - 1
+    index[(index < 0) | (index >= len(bands)) | np.isnan(values)] = -1
+    return index
+
+
+def _round(value) -> Optional[float]:
+    return None if value is None or np.isnan(value) else round(float(value), 4)
+
+
+def _doctor_names(db: Session, doctor_ids) -> Dict[int, str]:
+    ids = [int(doctor_id) for doctor_id in doctor_ids if doctor_id >= 0]
+    if not ids:
+        return {}
+    return dict(db.query(models.Doctor.id, models.Doctor.name).filter(models.Doctor.id.in_(ids)).all())
+
+
+def metric_summary(db: Session, metric: str, group_by: str = GROUP_BY_NONE, filters: Optional[dict] = None,
+                   percentiles: List[float] = None, bins: int = DEFAULT_HISTOGRAM_BINS) -> List[dict]:
+    """单个指标的分组统计：数量、均值、标准差、极值、分位数和直方图"""
+    percentiles = percentiles or DEFAULT_PERCENTILES
+    table = models.FollowUp.__table__
+    columns = {"value": table.c[metric]}
+    if group_by == GROUP_BY_DOCTOR:
+        columns["group"] = table.c.doctor_id
+    elif group_by == GROUP_BY_AGE_BAND:
+        columns["group"] = models.Elderly.age
+    data = load_columns(db, columns, filters, join_elderly=group_by == GROUP_BY_AGE_BAND)
+
+    values = data["value"]
+    valid = ~np.isnan(values)
+    if group_by == GROUP_BY_AGE_BAND:
+        raw_groups = band_index(data["group"], AGE_BANDS).astype(np.float64)
+    elif group_by == GROUP_BY_DOCTOR:
+        raw_groups = data["group"]
+    else:
+        raw_groups = np.zeros(values.shape[0])
+    values = values[valid]
+    group_keys, inverse = group_inverse(raw_groups[valid])
+    group_count = len(group_keys)
+
+    counts = np.bincount(inverse, minlength=group_count)
+    sums = np.bincount(inverse, weights=values, minlength=group_count)
+    squares = np.bincount(inverse, weights=values * values, minlength=group_count)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts
+        stds = np.sqrt(np.maximum(squares / counts - means * means, 0))
+    minimums = np.full(group_count, np.inf)
+    maximums = np.full(group_count, -np.inf)
+    np.minimum.at(minimums, inverse, values)
+    np.maximum.at(maximums, inverse, values)
+    quantiles = grouped_percentiles(values, inverse, group_count, percentiles)
+
+    # 所有分组共用同一组直方图边界，便于前端对比；各组直方图用一次 bincount 得到
+    edges = np.histogram_bin_edges(values, bins=bins) if values.size else np.array([])
+    if edges.size:
+        bin_index = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, bins - 1)
+        histograms = np.bincount(inverse * bins + bin_index, minlength=group_count * bins).reshape(group_count, bins)
+    names = _doctor_names(db, group_keys) if group_by == GROUP_BY_DOCTOR else {}
+
+    summaries = []
+    for position, key in enumerate(group_keys):
+        if group_by == GROUP_BY_AGE_BAND:
+            label = AGE_BANDS[key][2] if key >= 0 else "未知"
+        elif group_by == GROUP_BY_DOCTOR:
+            label = names.get(int(key), "未知") if key >= 0 else "未知"
+        else:
+            label = "全部"
+        histogram = histograms[position] if edges.size else []
+        summaries.append({
+            "group": label,
+            "group_key": int(key) if group_by != GROUP_BY_NONE else None,
+            "count": int(counts[position]),
+            "mean": _round(means[position]),
+            "std": _round(stds[position]),
+            "min": _round(minimums[position]),
+            "max": _round(maximums[position]),
+            "percentiles": {f"p{p:g}": _round(value) for p, value in zip(percentiles, quantiles[position])},
+            "histogram": {
+                "edges": [round(float(edge), 4) for edge in edges],
+                "counts": [int(count) for count in histogram]
+            }
+        })
+    return summaries
+
+
+def bp_control_by_doctor(db: Session, filters: Optional[dict] = None) -> List[dict]:
+    """各医生随访记录的血压控制达标率（收缩压、舒张压均有值的记录参与计算）"""
+    table = models.FollowUp.__table__
+    data = load_columns(db, {
+        "doctor_id": table.c.doctor_id,
+        "systolic": table.c.systolic_blood_pressure,
+        "diastolic": table.c.diastolic_blood_pressure,
+    }, filters)
+    measured = ~np.isnan(data["systolic"]) & ~np.isnan(data["diastolic"])
+    systolic = data["systolic"][measured]
+    diastolic = data["diastolic"][measured]
+    group_keys, inverse = group_inverse(data["doctor_id"][measured])
+
+    controlled = (systolic < BP_SYSTOLIC_TARGET) & (diastolic < BP_DIASTOLIC_TARGET)
+    totals = np.bincount(inverse, minlength=len(group_keys))
+    controlled_counts = np.bincount(inverse, weights=controlled, minlength=len(group_keys))
+    names = _doctor_names(db, group_keys)
+
+    return [
+        {
+            "doctor_id": int(key) if key >= 0 else None,
+            "doctor_name": names.get(int(key), "未知"),
+            "records": int(totals[position]),
+            "controlled": int(controlled_counts[position]),
+            "control_rate": round(float(controlled_counts[position] / totals[position]), 4)
+        }
+        for position, key in enumerate(group_keys)
+    ]
+
+
+def bmi_distribution_by_age(db: Session, filters: Optional[dict] = None) -> List[dict]:
+    """按年龄段统计 BMI 分类人数和分位数"""
+    data = load_columns(db, {
+        "bmi": models.FollowUp.__table__.c.bmi,
+        "age": models.Elderly.age,
+    }, filters, join_elderly=True)
+    valid = ~np.isnan(data["bmi"])
+    bmi = data["bmi"][valid]
+    bands = band_index(data["age"][valid], AGE_BANDS)
+    categories = band_index(bmi, BMI_CATEGORIES)
+
+    # 二维计数：年龄段 x BMI 分类，一次 bincount 完成
+    band_count, category_count = len(AGE_BANDS) + 1, len(BMI_CATEGORIES) + 1  # 末位存放 -1（未知）
+    cells = np.bincount(
+        (bands % band_count) * category_count + (categories % category_count),
+        minlength=band_count * category_count
+    ).reshape(band_count, category_count)
+    quantiles = grouped_percentiles(bmi, bands % band_count, band_count, DEFAULT_PERCENTILES)
+
+    distribution = []
+    for band in range(band_count):
+        total = int(cells[band].sum())
+        if total == 0:
+            continue
+        distribution.append({
+            "age_band": AGE_BANDS[band][2] if band < len(AGE_BANDS) else "未知",
+            "count": total,
+            "categories": {
+                BMI_CATEGORIES[category][2]: int(cells[band, category])
+                for category in range(len(BMI_CATEGORIES))
+            },
+            "percentiles": {f"p{p:g}": _round(value) for p, value in zip(DEFAULT_PERCENTILES, quantiles[band])}
+        })
+    return distribution
+
+
+def urine_abnormal_prevalence(db: Session, filters: Optional[dict] = None) -> List[dict]:
+    """尿常规各项目的异常检出率，以及任一项目异常的记录占比"""
+    table = models.FollowUp.__table__
+    items = URINE_POSITIVE_ITEMS + list(URINE_RANGE_ITEMS)
+    data = load_columns(db, {name: table.c[name] for name in items}, filters)
+
+    any_tested = None
+    any_abnormal = None
+    prevalence = []
+    for name in items:
+        values = data[name]
+        tested = ~np.isnan(values)
+        if name in URINE_RANGE_ITEMS:
+            low, high = URINE_RANGE_ITEMS[name]
+            abnormal = tested & ((values < low) | (values > high))
+        else:
+            abnormal = tested & (values > 0)
+        any_tested = tested if any_tested is None else any_tested | tested
+        any_abnormal = abnormal if any_abnormal is None else any_abnormal | abnormal
+        tested_count = int(tested.sum())
+        abnormal_count = int(abnormal.sum())
+        prevalence.append({
+            "item": name,
+            "tested": tested_count,
+            "abnormal": abnormal_count,
+            "prevalence": round(abnormal_count / tested_count, 4) if tested_count else None
+        })
+
+    tested_count = int(any_tested.sum())
+    abnormal_count = int(any_abnormal.sum())
+    prevalence.append({
+        "item": "any",
+        "tested": tested_count,
+        "abnormal": abnormal_count,
+        "prevalence": round(abnormal_count / tested_count, 4) if tested_count else None
+    })
+    return prevalence
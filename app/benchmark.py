@@ -0,0 +1,640 @@
+"""
+性能基准脚本，在临时 SQLite 数据库上运行，不依赖 MySQL
+用法:
+    python -m app.benchmark async --rows 20000 --clients 50 --requests 2000
+    python -m app.benchmark export --rows 200000
+    python -m app.benchmark search --rows 0 --elderly 1000000
+    python -m app.benchmark analytics --rows 10000000 --elderly 100000
+    python -m app.benchmark worklist --rows 5000000 --elderly 500000
+    python -m app.benchmark projection --rows 1000000 --elderly 100000
+    python -m app.benchmark serialization --rows 20000 --requests 2000
+    python -m app.benchmark columnar --rows 200000 --elderly 50 --requests 50
+    python -m app.benchmark http_cache --rows 200000 --clients 20 --requests 2000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import create_engine, func, insert
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import Base, create_configured_async_engine, create_configured_engine, to_async_url
+
+METRIC_RANGES = {
+    "height": (145, 185),
+    "weight": (40, 95),
+    "bmi": (16, 35),
+    "systolic_blood_pressure": (95, 190),
+    "diastolic_blood_pressure": (55, 115),
+    "blood_oxygen": (88, 100),
+    "blood_glucose": (3.5, 15),
+    "pulse_rate": (50, 110),
+    "heart_rate": (50, 110),
+    "temperature": (35.8, 38.5),
+    "total_cholesterol": (3, 8),
+    "triglycerides": (0.5, 4),
+    "hdl_cholesterol": (0.7, 2.2),
+    "ldl_cholesterol": (1.5, 5),
+    "uric_acid": (150, 550),
+    "urine_specific_gravity": (1.0, 1.04),
+    "urine_ph": (4.5, 8.5),
+}
+
+
+SURNAMES = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈姚卢姜崔钟谭陆汪范金石廖贾夏韦付方白邹孟熊秦邱江尹薛闫段雷侯龙史陶黎贺顾毛郝龚邵万钱严覃武戴莫孔向汤"
+GIVEN_CHARS = "伟芳娜秀英敏静丽强磊军洋勇艳杰娟涛明超兰霞平刚桂华玉萍红建国志文辉力永春海燕云鹏飞宇浩凤梅琴兵德福林荣生金珍淑凯雪清"
+
+
+def random_name(rng: random.Random) -> str:
+    return rng.choice(SURNAMES) + "".join(rng.choice(GIVEN_CHARS) for _ in range(rng.randint(1, 2)))
+
+
+def random_metrics(rng: random.Random) -> dict:
+    values = {}
+    for column, (low, high) in METRIC_RANGES.items():
+        value = rng.uniform(low, high)
+        values[column] = int(value) if isinstance(low, int) and isinstance(high, int) else round(value, 2)
+    return values
+
+
+def seed_database(url: str, elderly: int = 1000, doctors: int = 20, rows: int = 20000, seed: int = 7):
+    """建表并批量写入测试数据（含姓名搜索索引和最近随访汇总表）"""
+    from app.latest_follow_ups import rebuild_latest_follow_ups
+    from app.search_index import ENTITY_DOCTOR, ENTITY_ELDERLY, name_grams
+
+    rng = random.Random(seed)
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        doctor_rows = [
+            {"id": i, "name": random_name(rng), "department": "全科", "contact": "未填写"}
+            for i in range(1, doctors + 1)
+        ]
+        conn.execute(insert(models.Doctor), doctor_rows)
+        conn.execute(insert(models.NameSearchGram), [
+            {"entity_type": ENTITY_DOCTOR, "gram": gram, "entity_id": row["id"]}
+            for row in doctor_rows for gram in name_grams(row["name"])
+        ])
+        for chunk_start in range(1, elderly + 1, 5000):
+            elderly_rows = [
+                {"id": i, "name": random_name(rng), "gender": i % 2, "age": 60 + i % 35, "contact": "未填写",
+                 "address": "未填写", "birth_date": date(1940 + i % 25, 1 + i % 12, 1 + i % 28),
+                 "birth_place": "未填写", "education": "未填写", "occupation": "未填写"}
+                for i in range(chunk_start, min(chunk_start + 5000, elderly + 1))
+            ]
+            conn.execute(insert(models.Elderly), elderly_rows)
+            conn.execute(insert(models.NameSearchGram), [
+                {"entity_type": ENTITY_ELDERLY, "gram": gram, "entity_id": row["id"]}
+                for row in elderly_rows for gram in name_grams(row["name"])
+            ])
+        # 随访日期分布在最近 600 天内，下次随访约定在 30/60/90 天后，待办列表中各紧急程度都有数据
+        start = datetime.now().replace(second=0, microsecond=0) - timedelta(days=600)
+        batch = []
+        for i in range(rows):
+            followup_date = start + timedelta(minutes=rng.randint(0, 60 * 24 * 600))
+            row = {
+                "elderly_id": rng.randint(1, elderly),
+                "doctor_id": rng.randint(1, doctors),
+                "followup_date": followup_date,
+                "next_follow_up_date": followup_date + timedelta(days=rng.choice((30, 60, 90))),
+                "content": "常规随访",
+            }
+            row.update(random_metrics(rng))
+            batch.append(row)
+            if len(batch) == 5000:
+                conn.execute(insert(models.FollowUp), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(models.FollowUp), batch)
+    with sessionmaker(bind=engine)() as db:
+        rebuild_latest_follow_ups(db)
+    engine.dispose()
+
+
+def build_app(url: str, pool_size: int = 10, http_cache: bool = False):
+    """
+    加载 app.main 并把同步/异步会话依赖替换为指向基准数据库的会话
+    pool_size 应不小于并发数：在 async 路由里使用同步会话时，连接池耗尽会阻塞事件循环，归还连接的清理代码也就无法执行
+    读接口的 HTTP 缓存默认关闭，否则重复请求同一地址测到的只是缓存
+    """
+    import logging
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    from app.http_cache import configure_http_cache
+    from app.main import app
+    from app.routers import follow_up
+
+
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    sync_engine = create_configured_engine(url, name="benchmark", pool_size=pool_size)
+    SyncSession = sessionmaker(bind=sync_engine, autoflush=False)
+    async_engine = create_configured_async_engine(to_async_url(url), name="benchmark_async", pool_size=pool_size)
+    AsyncSession = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+    configure_http_cache(enabled=http_cache, bind=sync_engine)
+
+    def get_db():
+        db = SyncSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def get_async_db():
+        async with AsyncSession() as db:
+            yield db
+
+    app.dependency_overrides[follow_up.get_db] = get_db
+    app.dependency_overrides[follow_up.get_async_db] = get_async_db
+    return app
+
+
+async def run_load(client, path: str, clients: int, total: int, headers: dict = None):
+    """clients 个并发客户端共发出 total 个请求，返回 (请求/秒, p50毫秒, p95毫秒)"""
+    latencies = []
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            if response.is_error:
+                response.raise_for_status()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return total / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+
+def bench_async(args, url: str):
+    """对比：原生异步会话的列表接口 vs 在 async 路由中直接调用同步会话（旧写法）"""
+    import httpx
+    from fastapi import Depends
+
+    from app import crud
+    from app.routers.follow_up import get_db
+
+    app = build_app(url, pool_size=args.clients)
+
+    @app.get("/benchmark/legacy-follow-ups")
+    async def legacy_follow_ups(page: int = 1, per_page: int = 20, db=Depends(get_db)):
+        result = crud.get_follow_ups_paginated(db, page=page, per_page=per_page)
+        return {"total": result["total"], "items": [item.id for item in result["items"]]}
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for label, path in (
+                ("async  /api/v1/follow-ups", "/api/v1/follow-ups?page=50&per_page=20"),
+                ("legacy sync-in-async", "/benchmark/legacy-follow-ups?page=50&per_page=20"),
+            ):
+                await client.get(path)  # 预热
+                rps, p50, p95 = await run_load(client, path, args.clients, args.requests)
+                print(f"{label:<28} {rps:8.1f} req/s  p50 {p50:7.2f} ms  p95 {p95:7.2f} ms")
+
+    asyncio.run(main())
+
+
+def bench_export(args, url: str):
+    """导出吞吐：直接驱动 exports.iter_export，统计 行/秒 和输出字节数"""
+    from app import exports
+
+    engine = create_engine(url)
+    Session = sessionmaker(bind=engine)
+    field_sets = (
+        ("全部字段", None),
+        ("常用指标", "systolic_blood_pressure,diastolic_blood_pressure,blood_glucose,bmi,heart_rate,blood_oxygen"),
+    )
+    for field_label, fields in field_sets:
+        columns = exports.parse_export_columns(fields)
+        stmt = exports.build_export_statement(columns).order_by(models.FollowUp.id)
+        for export_format in (exports.EXPORT_FORMAT_CSV, exports.EXPORT_FORMAT_NDJSON):
+            for compress in (False, True):
+                with Session() as db:
+                    started = time.perf_counter()
+                    size = sum(len(chunk) for chunk in exports.iter_export(db, stmt, columns, export_format, compress))
+                    elapsed = time.perf_counter() - started
+                label = f"{field_label} {export_format}{'+gzip' if compress else ''}"
+                print(f"{label:<20} {args.rows / elapsed:10.0f} 行/秒  {size / 1024 / 1024:8.1f} MB  {elapsed:6.2f} 秒")
+
+
+def bench_search(args, url: str):
+    """姓名搜索：n-gram 索引 (crud.get_elderlies) vs 原来的全表 ILIKE，统计单次查询延迟"""
+    from sqlalchemy import select
+
+    from app import crud
+
+    engine = create_engine(url)
+    Session = sessionmaker(bind=engine)
+    rng = random.Random(11)
+    with Session() as db:
+        sample_ids = [rng.randint(1, args.elderly) for _ in range(200)]
+        names = [db.get(models.Elderly, elderly_id).name for elderly_id in sample_ids]
+    query_sets = (
+        ("完整姓名", names),
+        ("名字(两字)", [name[1:3] if len(name) > 2 else name for name in names]),
+        ("姓氏(单字)", [name[0] for name in names]),
+        ("不存在", [f"{name}无" for name in names]),
+    )
+
+    def legacy(db, term):
+        return db.execute(
+            select(models.Elderly).where(models.Elderly.name.ilike(f"%{term}%"))
+            .order_by(models.Elderly.id).limit(100)
+        ).scalars().all()
+
+    def indexed(db, term):
+        return crud.get_elderlies(db, limit=100, search=term)
+
+    for query_label, terms in query_sets:
+        for method_label, lookup in (("索引", indexed), ("ILIKE", legacy)):
+            latencies = []
+            with Session() as db:
+                lookup(db, terms[0])  # 预热
+                for term in terms:
+                    started = time.perf_counter()
+                    lookup(db, term)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    db.expunge_all()
+            latencies.sort()
+            label = f"{query_label} {method_label}"
+            print(f"{label:<18} p50 {statistics.median(latencies):8.2f} ms  "
+                  f"p95 {latencies[int(len(latencies) * 0.95) - 1]:8.2f} ms")
+
+
+def bench_analytics(args, url: str):
+    """统计分析：NumPy 向量化聚合 vs 逐条加载 ORM 对象计算（后者只跑前 20 万行后按比例折算）"""
+    from app import analytics
+
+    engine = create_engine(url)
+    Session = sessionmaker(bind=engine)
+    cases = (
+        ("血压达标率(按医生)", lambda db: analytics.bp_control_by_doctor(db)),
+        ("BMI 分布(按年龄段)", lambda db: analytics.bmi_distribution_by_age(db)),
+        ("尿常规异常率", lambda db: analytics.urine_abnormal_prevalence(db)),
+        ("收缩压分位数(按医生)", lambda db: analytics.metric_summary(db, "systolic_blood_pressure", "doctor")),
+    )
+    for label, run in cases:
+        with Session() as db:
+            started = time.perf_counter()
+            run(db)
+            elapsed = time.perf_counter() - started
+        print(f"{label:<16} {elapsed:7.2f} 秒  {args.rows / elapsed:12.0f} 行/秒")
+
+    sample = min(args.rows, 200000)
+    with Session() as db:
+        started = time.perf_counter()
+        totals = {}
+        for follow_up in db.query(models.FollowUp).limit(sample).yield_per(5000):
+            if follow_up.systolic_blood_pressure is None or follow_up.diastolic_blood_pressure is None:
+                continue
+            total = totals.setdefault(follow_up.doctor_id, [0, 0])
+            total[0] += 1
+            total[1] += follow_up.systolic_blood_pressure < 140 and follow_up.diastolic_blood_pressure < 90
+        elapsed = (time.perf_counter() - started) * args.rows / sample
+    print(f"{'ORM 逐条(折算)':<16} {elapsed:7.2f} 秒  {args.rows / elapsed:12.0f} 行/秒")
+
+
+def bench_worklist(args, url: str):
+    """医生随访待办接口：各紧急程度分页的请求延迟（含各类人数统计）"""
+    import httpx
+
+    app = build_app(url, pool_size=args.clients)
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            first = (await client.get("/api/v1/doctors/1/worklist")).json()
+            print(f"医生1 待办人数: {first['counts']}")
+            for bucket, page in (("all", 1), ("overdue", 1), ("overdue", 50), ("today", 1), ("week", 1)):
+                path = f"/api/v1/doctors/{random.randint(1, 20)}/worklist?bucket={bucket}&page={page}&per_page=20"
+                _, single_p50, single_p95 = await run_load(client, path, 1, 200)
+                rps, p50, p95 = await run_load(client, path, args.clients, args.requests)
+                label = f"{bucket} 第{page}页"
+                print(f"{label:<14} 单请求 p50 {single_p50:6.2f} ms  p95 {single_p95:6.2f} ms  |  "
+                      f"{args.clients} 并发 {rps:7.1f} req/s  p50 {p50:7.2f} ms  p95 {p95:7.2f} ms")
+
+    asyncio.run(main())
+
+
+def _row_bytes(row) -> int:
+    """按值的文本长度估算一行从数据库传回的字节数"""
+    return sum(len(str(value)) for value in row if value is not None)
+
+
+def bench_projection(args, url: str):
+    """
+    列表投影：整行加载 FollowUp 实体（含关联老人/医生）再由 FollowUpSimple 丢弃 vs 只查询所需列
+    分别统计从数据库读取的字节数（估算）、读取+序列化的 行/秒，以及列表接口的响应大小和 req/s
+    """
+    import httpx
+    from fastapi import Depends
+    from sqlalchemy import select
+
+    from app import crud, schemas
+    from app.projections import follow_up_projection
+    from app.routers.follow_up import get_db
+
+    engine = create_engine(url)
+    Session = sessionmaker(bind=engine)
+    sample = min(args.rows, 200000)
+    full_columns = [models.FollowUp.__table__, models.Elderly.__table__, models.Doctor.__table__]
+    full_stmt = select(*full_columns) \
+        .join_from(models.FollowUp, models.Elderly, models.Elderly.id == models.FollowUp.elderly_id, isouter=True) \
+        .join_from(models.FollowUp, models.Doctor, models.Doctor.id == models.FollowUp.doctor_id, isouter=True)
+
+    def legacy(db):
+        rows = db.execute(select(models.FollowUp).limit(sample).execution_options(yield_per=2000)).scalars()
+        return sum(1 for row in rows if schemas.FollowUpSimple.model_validate(row).model_dump(mode="json"))
+
+    def projected(fields):
+        projection = follow_up_projection(fields)
+
+        def run(db):
+            result = db.execute(projection.statement(select(models.FollowUp)).limit(sample)
+                                .execution_options(yield_per=2000))
+            count = 0
+            for rows in result.partitions():
+                for item in projection.to_dicts(rows):
+                    schemas.FollowUpListItem.model_validate(item).model_dump(mode="json", exclude_unset=True)
+                    count += 1
+            return count
+        return run, projection
+
+    slim_fields = "id,followup_date,systolic_blood_pressure,diastolic_blood_pressure"
+    default_run, default_projection = projected(None)
+    slim_run, slim_projection = projected(slim_fields)
+    with Session() as db:
+        byte_counts = (
+            ("整行实体", full_stmt),
+            ("默认投影", default_projection.statement(select(models.FollowUp))),
+            ("fields 4列", slim_projection.statement(select(models.FollowUp))),
+        )
+        for label, stmt in byte_counts:
+            total = sum(_row_bytes(row) for row in db.execute(stmt.limit(sample).execution_options(yield_per=5000)))
+            print(f"{label:<12} 读取 {total / sample:7.1f} 字节/行")
+
+    for label, run in (("整行实体", legacy), ("默认投影", default_run), ("fields 4列", slim_run)):
+        with Session() as db:
+            started = time.perf_counter()
+            count = run(db)
+            elapsed = time.perf_counter() - started
+        print(f"{label:<12} {count / elapsed:10.0f} 行/秒（读取+序列化 {count} 行）")
+
+    app = build_app(url, pool_size=args.clients)
+
+    @app.get("/benchmark/legacy-follow-ups")
+    def legacy_follow_ups(page: int = 1, per_page: int = 20, db=Depends(get_db)):
+        result = crud.get_follow_ups_paginated(db, page=page, per_page=per_page)
+        return dict(result, items=[schemas.FollowUpSimple.model_validate(item) for item in result["items"]])
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for label, path in (
+                ("整行实体", "/benchmark/legacy-follow-ups?page=50&per_page=100"),
+                ("默认投影", "/api/v1/follow-ups?page=50&per_page=100"),
+                ("fields 4列", f"/api/v1/follow-ups?page=50&per_page=100&fields={slim_fields}"),
+            ):
+                size = len((await client.get(path)).content)
+                rps, p50, p95 = await run_load(client, path, args.clients, args.requests)
+                print(f"{label:<12} 响应 {size / 1024:6.1f} KB  {rps:8.1f} req/s  p50 {p50:7.2f} ms  p95 {p95:7.2f} ms")
+
+    asyncio.run(main())
+
+
+def bench_serialization(args, url: str):
+    """
+    列表响应序列化：一页 100 行、全部指标列都有值
+    ORM 实体 + from_attributes 校验、投影字典 + 响应模型校验、
+    投影字典直接编码（标准库 json / FastJSONResponse）的 页/秒，以及列表接口两种输出方式的 req/s
+    """
+    import json
+    from typing import List
+
+    import httpx
+    from fastapi import Depends
+    from pydantic import ConfigDict, TypeAdapter
+    from sqlalchemy import select, update
+
+    from app import crud, crud_async, schemas
+    from app.pagination import order_newest_first
+    from app.projections import SCALAR_FIELDS, follow_up_projection
+    from app.responses import dumps, json_default
+    from app.routers.follow_up import get_async_db
+
+    per_page = 100
+    all_fields = ",".join(SCALAR_FIELDS + ["elderly", "doctor"])
+    projection = follow_up_projection(all_fields)
+    engine = create_engine(url)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        # 种子数据只填了部分指标，给第一页的记录补齐全部数值指标
+        page_ids = db.execute(order_newest_first(select(models.FollowUp.id)).limit(per_page)).scalars().all()
+        metrics = [name for name, field in schemas.FollowUpBase.model_fields.items()
+                   if name not in ("elderly_id", "doctor_id") and field.annotation in (Optional[float], Optional[int])]
+        table = models.FollowUp.__table__
+        db.execute(update(table).where(table.c.id.in_(page_ids)).values({
+            name: func.coalesce(table.c[name], 1 + table.c.id % 90) for name in metrics
+        }))
+        db.commit()
+
+        entities = db.query(models.FollowUp).options(*crud.FOLLOW_UP_DETAIL_OPTIONS) \
+            .filter(models.FollowUp.id.in_(page_ids)).all()
+        rows = db.execute(order_newest_first(projection.statement(
+            select(models.FollowUp).where(models.FollowUp.id.in_(page_ids))
+        ))).all()
+        items = projection.to_dicts(rows)
+    page = {"items": items, "total": args.rows, "page": 1, "per_page": per_page,
+            "total_pages": (args.rows + per_page - 1) // per_page, "next_cursor": None, "prev_cursor": None,
+            "total_is_estimate": False}
+    print(f"每行 {len(items[0])} 个字段（{len(metrics)} 个数值指标）")
+
+    class FullFollowUp(schemas.FollowUpBase):
+        """整行随访记录（全部指标 + 老人/医生），按 from_attributes 从实体校验"""
+        model_config = ConfigDict(from_attributes=True)
+        id: int
+        elderly: schemas.Elderly
+        doctor: schemas.Doctor
+
+    entity_adapter = TypeAdapter(List[FullFollowUp])
+    encoders = (
+        ("ORM实体+校验", lambda: entity_adapter.dump_json(entity_adapter.validate_python(entities, from_attributes=True))),
+        ("字典+响应模型", lambda: schemas.FollowUpListResponse.model_validate(page)
+            .model_dump_json(exclude_unset=True)),
+        ("字典+json", lambda: json.dumps(page, ensure_ascii=False, default=json_default).encode("utf-8")),
+        ("字典+快速路径", lambda: dumps(page)),
+    )
+    for label, encode in encoders:
+        size = len(encode())
+        started = time.perf_counter()
+        for _ in range(args.requests):
+            encode()
+        elapsed = time.perf_counter() - started
+        print(f"{label:<14} {args.requests / elapsed:9.0f} 页/秒  {args.requests * per_page / elapsed:10.0f} 行/秒  "
+              f"{size / 1024:6.1f} KB")
+
+    app = build_app(url, pool_size=args.clients)
+
+    @app.get("/benchmark/validated-follow-ups", response_model=schemas.FollowUpListResponse,
+             response_model_exclude_unset=True)
+    async def validated_follow_ups(per_page: int = 20, fields: str = None, db=Depends(get_async_db)):
+        return await crud_async.get_follow_ups_paginated(db, page=1, per_page=per_page, fields=fields)
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for label, path in (
+                ("响应模型校验", f"/benchmark/validated-follow-ups?per_page={per_page}&fields={all_fields}"),
+                ("快速路径", f"/api/v1/follow-ups?per_page={per_page}&fields={all_fields}"),
+            ):
+                await client.get(path)  # 预热
+                rps, p50, p95 = await run_load(client, path, args.clients, args.requests)
+                print(f"{label:<14} {rps:8.1f} req/s  p50 {p50:7.2f} ms  p95 {p95:7.2f} ms")
+
+    asyncio.run(main())
+
+
+def bench_columnar(args, url: str):
+    """
+    列式二进制输出 vs JSON：单个老人的全部随访（全部指标列）、100 行列表页、不降采样的时间序列
+    比较响应大小、接口延迟（单客户端顺序请求）和客户端解析耗时
+    """
+    import json
+
+    import httpx
+    import msgpack
+    import pyarrow.ipc
+
+    from app.columnar import ARROW_STREAM_MEDIA_TYPE, MSGPACK_MEDIA_TYPE
+    from app.projections import SCALAR_FIELDS
+    from app.timeseries import METRIC_COLUMNS
+
+    all_fields = ",".join(SCALAR_FIELDS)
+    formats = (
+        ("JSON", "application/json", json.loads),
+        ("MessagePack", MSGPACK_MEDIA_TYPE, msgpack.unpackb),
+        ("Arrow", ARROW_STREAM_MEDIA_TYPE, lambda body: pyarrow.ipc.open_stream(body).read_all()),
+    )
+    app = build_app(url, pool_size=4)
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            records = len((await client.get(f"/api/v1/elderly/1/follow-ups?fields=id")).json())
+            for title, path in (
+                (f"单个老人全部随访（{records} 行）", f"/api/v1/elderly/1/follow-ups?fields={all_fields}"),
+                ("列表页 100 行", f"/api/v1/follow-ups?page=5&per_page=100&fields={all_fields},elderly,doctor"),
+                (f"时间序列 {len(METRIC_COLUMNS)} 个指标",
+                 f"/api/v1/elderly/1/timeseries?downsample=none&metrics={','.join(METRIC_COLUMNS)}"),
+            ):
+                print(title)
+                for label, media_type, decode in formats:
+                    headers = {"Accept": media_type}
+                    body = (await client.get(path, headers=headers)).content
+                    rps, p50, p95 = await run_load(client, path, 1, args.requests, headers=headers)
+                    started = time.perf_counter()
+                    for _ in range(args.requests):
+                        decode(body)
+                    decode_ms = (time.perf_counter() - started) / args.requests * 1000
+                    print(f"  {label:<12} {len(body) / 1024:8.1f} KB  p50 {p50:7.2f} ms  p95 {p95:7.2f} ms  "
+                          f"客户端解析 {decode_ms:7.2f} ms")
+
+    asyncio.run(main())
+
+
+def bench_http_cache(args, url: str):
+    """
+    读接口 HTTP 缓存：关闭缓存 vs 命中响应体缓存 vs If-None-Match 返回 304，
+    并验证写操作后 ETag 变化、旧 ETag 不再返回 304
+    """
+    import httpx
+
+    from app.http_cache import configure_http_cache, get_http_cache
+    from app.query_counter import QueryCounter
+
+    app = build_app(url, pool_size=args.clients, http_cache=True)
+    paths = (
+        ("随访列表第 5 页", "/api/v1/follow-ups?page=5&per_page=20"),
+        ("随访列表按姓氏过滤", "/api/v1/follow-ups?per_page=20&elderly_name=王"),
+        ("老人列表", "/api/v1/elderly?limit=100"),
+    )
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for title, path in paths:
+                print(title)
+                configure_http_cache(enabled=False)
+                rps, p50, p95 = await run_load(client, path, args.clients, args.requests)
+                print(f"  {'关闭缓存':<10} {rps:8.1f} req/s  p50 {p50:7.2f} ms  p95 {p95:7.2f} ms")
+
+                configure_http_cache(enabled=True)
+                etag = (await client.get(path)).headers["etag"]
+                with QueryCounter() as counter:
+                    rps, p50, p95 = await run_load(client, path, args.clients, args.requests)
+                print(f"  {'响应体缓存':<10} {rps:8.1f} req/s  p50 {p50:7.2f} ms  p95 {p95:7.2f} ms  "
+                      f"SQL {counter.count} 条")
+                with QueryCounter() as counter:
+                    rps, p50, p95 = await run_load(client, path, args.clients, args.requests,
+                                                   headers={"If-None-Match": etag})
+                print(f"  {'304':<10} {rps:8.1f} req/s  p50 {p50:7.2f} ms  p95 {p95:7.2f} ms  "
+                      f"SQL {counter.count} 条")
+
+            path = paths[0][1]
+            etag = (await client.get(path)).headers["etag"]
+            response = await client.put("/api/v1/follow-ups/1", json={
+                "elderly_id": 1, "doctor_id": 1, "follow_up_date": "2024-01-01 09:00:00", "content": "复诊",
+            })
+            response.raise_for_status()
+            revalidated = await client.get(path, headers={"If-None-Match": etag})
+            print(f"写操作后旧 ETag 条件请求返回 {revalidated.status_code}，"
+                  f"ETag {'已变化' if revalidated.headers['etag'] != etag else '未变化'}")
+            print(f"缓存统计 {get_http_cache().stats()}")
+
+    asyncio.run(main())
+
+
+COMMANDS = {
+    "analytics": bench_analytics,
+    "async": bench_async,
+    "columnar": bench_columnar,
+    "export": bench_export,
+    "http_cache": bench_http_cache,
+    "projection": bench_projection,
+    "search": bench_search,
+    "serialization": bench_serialization,
+    "worklist": bench_worklist,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="随访系统性能基准")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    parser.add_argument("--rows", type=int, default=20000, help="随访记录条数")
+    parser.add_argument("--elderly", type=int, default=1000, help="老人数")
+    parser.add_argument("--clients", type=int, default=50, help="并发客户端数")
+    parser.add_argument("--requests", type=int, default=2000, help="总请求数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        url = f"sqlite:///{os.path.join(workdir, 'benchmark.db')}"
+        started = time.perf_counter()
+        seed_database(url, elderly=args.elderly, rows=args.rows)
+        print(f"已生成 {args.rows} 条随访记录，耗时 {time.perf_counter() - started:.1f} 秒")
+        COMMANDS[args.command](args, url)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Optional
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, Numeric
+
+try:
+    import pyarrow  # 可选依赖，Arrow IPC 输出
+except ImportError:
+    pyarrow = None
+
+try:
+    import msgpack  # 可选依赖，MessagePack 输出
+except ImportError:
+    msgpack = None
+
+from .responses import dumps
+
+# 批量读取指标的列式二进制输出（Arrow IPC stream / MessagePack）
+# 图表、分析类客户端一次拉取成千上万条随访记录时，JSON 中每行重复的键名（urine_specific_gravity 等）和
+# 文本数值的解析占了大部分时间。按 Accept 协商输出格式：列名只出现一次，每列一个数组，
+# 数组直接由查询结果按列转置得到，不构造逐行字典。
+#   Arrow：每列带类型（整数/浮点/时间戳/日期/字符串），分页等信息放在 schema 元数据 "meta"（JSON）中；
+#   MessagePack：{"meta": {...}, "columns": {列名: [值...]}}，时间为 ISO 字符串（与 JSON 输出一致）。
+
+FORMAT_JSON = "json"
+FORMAT_ARROW = "arrow"
+FORMAT_MSGPACK = "msgpack"
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+MEDIA_TYPE_FORMATS = {
+    ARROW_STREAM_MEDIA_TYPE: FORMAT_ARROW,
+    MSGPACK_MEDIA_TYPE: FORMAT_MSGPACK,
+    "application/x-msgpack": FORMAT_MSGPACK,
+    "application/json": FORMAT_JSON,
+    "application/*": FORMAT_JSON,
+    "*/*": FORMAT_JSON,
+}
+
+# 接口文档中列出的可选响应格式
+COLUMNAR_RESPONSES = {
+    200: {"content": {"application/json": {}, ARROW_STREAM_MEDIA_TYPE: {}, MSGPACK_MEDIA_TYPE: {}}}
+}
+
+# 输出格式随 Accept 变化，缓存须按 Accept 区分
+VARY_HEADERS = {"Vary": "Accept"}
+
+
+def _available(fmt: str) -> bool:
+    if fmt == FORMAT_ARROW:
+        return pyarrow is not None
+    if fmt == FORMAT_MSGPACK:
+        return msgpack is not None
+    return True
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """按 Accept 头（含 q 值）选择输出格式；未指定或不认识的类型返回 JSON"""
+    if not accept:
+        return FORMAT_JSON
+    ranges = []
+    for position, part in enumerate(accept.split(",")):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if quality > 0 and media_type.lower() in MEDIA_TYPE_FORMATS:
+            ranges.append((-quality, position, MEDIA_TYPE_FORMATS[media_type.lower()]))
+    unavailable = []
+    for _, _, fmt in sorted(ranges):
+        if _available(fmt):
+            return fmt
+        unavailable.append(fmt)
+    if unavailable:
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail=f"服务器未安装 {'/'.join(dict.fromkeys(unavailable))} 输出所需的依赖，请改用 application/json"
+        )
+    return FORMAT_JSON
+
+
+def _arrow_type(sql_type):
+    if isinstance(sql_type, Boolean):
+        return pyarrow.bool_()
+    if isinstance(sql_type, Integer):
+        return pyarrow.int64()
+    if isinstance(sql_type, (Numeric, Float)):
+        return pyarrow.float64()
+    if isinstance(sql_type, DateTime):
+        return pyarrow.timestamp("us")
+    if isinstance(sql_type, Date):
+        return pyarrow.date32()
+    return pyarrow.string()
+
+
+def _arrow_stream(batch) -> bytes:
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def _msgpack_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"无法序列化的类型: {type(value).__name__}")
+
+
+def encode_columns(fmt: str, columns: Dict[str, list], column_types: Dict[str, object], meta: dict) -> bytes:
+    """columns 为 {列名: 值列表}，column_types 为对应的 SQLAlchemy 类型"""
+    if fmt == FORMAT_ARROW:
+        schema = pyarrow.schema(
+            [(name, _arrow_type(column_types[name])) for name in columns],
+            metadata={"meta": dumps(meta)}
+        )
+        arrays = [pyarrow.array(values, type=field.type) for values, field in zip(columns.values(), schema)]
+        return _arrow_stream(pyarrow.record_batch(arrays, schema=schema))
+    return msgpack.packb({"meta": meta, "columns": columns}, default=_msgpack_default)
+
+
+def columns_response(fmt: str, columns: Dict[str, list], column_types: Dict[str, object], meta: dict) -> Response:
+    media_type = ARROW_STREAM_MEDIA_TYPE if fmt == FORMAT_ARROW else MSGPACK_MEDIA_TYPE
+    return Response(content=encode_columns(fmt, columns, column_types, meta), media_type=media_type,
+                    headers=VARY_HEADERS)
+
+
+def timeseries_response(fmt: str, data: dict) -> Response:
+    """
+    时间序列（timeseries.get_elderly_timeseries 的结果）
+    Arrow 为长表：metric（字典编码）、t（UTC 毫秒时间戳）、v，各指标的 raw_points 等放在元数据中；
+    MessagePack 与 JSON 结构相同（本身已是列式数组）
+    """
+    if fmt == FORMAT_MSGPACK:
+        return Response(content=msgpack.packb(data), media_type=MSGPACK_MEDIA_TYPE, headers=VARY_HEADERS)
+    series = data["series"]
+    meta = {key: value for key, value in data.items() if key != "series"}
+    meta["raw_points"] = {name: item["raw_points"] for name, item in series.items()}
+    names = list(series)
+    lengths = [len(series[name]["t"]) for name in names]
+    schema = pyarrow.schema(
+        [("metric", pyarrow.dictionary(pyarrow.int32(), pyarrow.string())),
+         ("t", pyarrow.timestamp("ms", tz="UTC")),
+         ("v", pyarrow.float64())],
+        metadata={"meta": dumps(meta)}
+    )
+    indices = pyarrow.array([i for i, length in enumerate(lengths) for _ in range(length)], type=pyarrow.int32())
+    batch = pyarrow.record_batch([
+        pyarrow.DictionaryArray.from_arrays(indices, pyarrow.array(names, type=pyarrow.string())),
+        pyarrow.array([t for name in names for t in series[name]["t"]], type=pyarrow.timestamp("ms", tz="UTC")),
+        pyarrow.array([v for name in names for v in series[name]["v"]], type=pyarrow.float64()),
+    ], schema=schema)
+    return Response(content=_arrow_stream(batch), media_type=ARROW_STREAM_MEDIA_TYPE, headers=VARY_HEADERS)
@@ -0,0 +1,150 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from . import models
+from .table_versions import TABLE_DOCTORS, TABLE_ELDERLY, TABLE_FOLLOW_UPS, read_table_versions
+
+logger = logging.getLogger(__name__)
+
+# 列表查询总数缓存
+# 分页接口每次都要对完整的过滤/关联查询执行 COUNT，这一步往往比取一页数据还慢。
+# 这里按“过滤条件签名”缓存精确总数（带 TTL），另外提供估算模式：无过滤条件时直接读取表统计信息，不扫描表。
+# 缓存键包含 table_versions 中随访/老人/医生三张表的版本号（与本页数据在同一事务中读取），
+# 任何进程（其他 API 工作进程、后台任务进程）的写入提交后版本号变化，旧的总数不再命中；
+# 本进程写入后的 invalidate_follow_up_counts() 只是提前清空缓存。
+
+COUNT_MODE_EXACT = "exact"
+COUNT_MODE_ESTIMATE = "estimate"
+
+COUNT_CACHE_TTL = 30  # 精确总数缓存有效期(秒)
+COUNT_CACHE_MAX_ENTRIES = 1024  # 最多缓存的过滤条件组合数
+COUNT_TABLES = (TABLE_FOLLOW_UPS, TABLE_ELDERLY, TABLE_DOCTORS)  # 过滤条件涉及的表（按老人/医生姓名过滤）
+
+
+class CountCache:
+    """线程安全的总数缓存，按过滤条件签名存储 (总数, 过期时间)"""
+
+    def __init__(self, ttl: float = COUNT_CACHE_TTL, max_entries: int = COUNT_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[int, float]]" = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[int]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            total, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return total
+
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def set(self, key: Hashable, total: int, generation: int):
+        """写入缓存；若计数期间发生过失效（generation 变化），丢弃这次结果"""
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (total, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+follow_up_count_cache = CountCache()
+
+
+def invalidate_follow_up_counts():
+    """随访记录（或其关联的老人/医生姓名）发生变化时调用"""
+    follow_up_count_cache.invalidate()
+
+
+def versioned_signature(connection, signature: Tuple) -> Tuple:
+    """在过滤条件签名前加上相关表的当前版本号；connection 为 Connection 或 Session"""
+    versions = read_table_versions(connection)
+    return tuple(versions.get(table, 0) for table in COUNT_TABLES), signature
+
+
+def estimate_table_rows(db: Session, table_name: str) -> Optional[int]:
+    """读取数据库统计信息中的表行数估算值，不支持的数据库返回 None"""
+    dialect = db.bind.dialect.name
+    try:
+        if dialect == "mysql":
+            return db.execute(
+                text(
+                    "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table_name"
+                ),
+                {"table_name": table_name}
+            ).scalar()
+        if dialect == "postgresql":
+            return db.execute(
+                text("SELECT reltuples::bigint FROM pg_class WHERE relname = :table_name"),
+                {"table_name": table_name}
+            ).scalar()
+    except Exception as e:
+        logger.warning(f"读取表统计信息失败 {table_name}: {str(e)}")
+    return None
+
+
+def count_follow_ups(query, signature: Tuple, mode: str = COUNT_MODE_EXACT) -> Tuple[int, bool]:
+    """
+    返回 (总数, 是否为估算值)
+    query 为已加好过滤/关联条件的随访查询，signature 为这些过滤条件组成的元组
+    """
+    has_filters = any(value not in (None, "") for value in signature)
+
+    if mode == COUNT_MODE_ESTIMATE and not has_filters:
+        estimated = estimate_table_rows(query.session, models.FollowUp.__tablename__)
+        if estimated is not None:
+            return int(estimated), True
+
+    key = versioned_signature(query.session, signature)
+    cached = follow_up_count_cache.get(key)
+    if cached is not None:
+        return cached, False
+
+    generation = follow_up_count_cache.generation()
+    # 只对主键计数，不携带排序和预加载的 JOIN
+    total = query.with_entities(func.count(models.FollowUp.id)).order_by(None).scalar() or 0
+    follow_up_count_cache.set(key, total, generation)
+    return total, False
+
+
+async def count_follow_ups_async(db, stmt, signature: Tuple, mode: str = COUNT_MODE_EXACT) -> Tuple[int, bool]:
+    """count_follow_ups 的异步版本，stmt 为 select(FollowUp) 语句，与同步版本共用缓存"""
+    has_filters = any(value not in (None, "") for value in signature)
+
+    if mode == COUNT_MODE_ESTIMATE and not has_filters:
+        estimated = await db.run_sync(estimate_table_rows, models.FollowUp.__tablename__)
+        if estimated is not None:
+            return int(estimated), True
+
+    key = await db.run_sync(versioned_signature, signature)
+    cached = follow_up_count_cache.get(key)
+    if cached is not None:
+        return cached, False
+
+    generation = follow_up_count_cache.generation()
+    count_stmt = stmt.with_only_columns(func.count(models.FollowUp.id)).order_by(None)
+    total = (await db.execute(count_stmt)).scalar() or 0
+    follow_up_count_cache.set(key, total, generation)
+    return total, False
@@ -1,18 +1,33 @@
 from datetime import datetime, timezone,timedelta
-from typing import Optional
+from typing import Callable, Optional
 
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
+from pydantic import ValidationError
 from fastapi import HTTPException, status
 from . import models, schemas
 import logging
+import time
 from contextlib import contextmanager
+from sqlalchemy import and_, func, insert, or_, select
 from sqlalchemy.orm import joinedload
 
 from .schemas import Elderly
+from .counts import COUNT_MODE_EXACT, count_follow_ups, invalidate_follow_up_counts
+from .reports import build_report_data, invalidate_report
+from .pagination import fetch_keyset_page, order_newest_first, page_cursors
+from .search_index import ENTITY_DOCTOR, ENTITY_ELDERLY, index_name, name_filter, remove_name
+from . import suggest
+from .latest_follow_ups import refresh_latest, remove_latest
+from .projections import follow_up_projection
+from .alerts import delete_follow_up_alerts, evaluate_follow_up, insert_follow_ups_with_alerts
+from .table_versions import TABLE_DOCTORS, TABLE_ELDERLY, TABLE_FOLLOW_UPS, bump_table_versions
 
 logger = logging.getLogger(__name__)
 
+# 需要展示老人/医生信息时的关联加载方式（单条记录用 JOIN 一次取回）
+FOLLOW_UP_DETAIL_OPTIONS = (joinedload(models.FollowUp.elderly), joinedload(models.FollowUp.doctor))
+
 @contextmanager
 def db_session_scope(db: Session):
     """提供数据库会话作用域管理"""
@@ -28,9 +43,10 @@ def db_session_scope(db: Session):
         )
 
 def get_follow_up(db: Session, follow_up_id: int):
-    """获取单个随访记录"""
+    """获取单个随访记录（含老人和医生信息）"""
     try:
-        return db.query(models.FollowUp).filter(models.FollowUp.id == follow_up_id).first()
+        return db.query(models.FollowUp).options(*FOLLOW_UP_DETAIL_OPTIONS) \
+            .filter(models.FollowUp.id == follow_up_id).first()
     except SQLAlchemyError as e:
         logger.error(f"获取随访记录失败 ID:{follow_up_id}, 错误: {str(e)}")
         raise HTTPException(
@@ -40,32 +56,76 @@ def get_follow_up(db: Session, follow_up_id: int):
 
 
 
-# crud.py 的get_follow_ups方法
-# crud.py
+def apply_follow_up_filters(query, elderly_id: int = None, doctor_id: int = None, elderly_name: str = None,
+                            doctor_name: str = None, start_date: str = None, end_date: str = None):
+    """随访列表的公共过滤条件，Query 和 select() 均可使用"""
+    if elderly_id:
+        query = query.filter(models.FollowUp.elderly_id == elderly_id)
+    elif elderly_name:
+        # 先经姓名索引得到老人ID，再按 elderly_id 过滤，无需 join 全表 ilike
+        query = query.filter(models.FollowUp.elderly_id.in_(
+            select(models.Elderly.id).where(name_filter(ENTITY_ELDERLY, elderly_name))
+        ))
+
+    if doctor_id:
+        query = query.filter(models.FollowUp.doctor_id == doctor_id)
+    elif doctor_name:
+        query = query.filter(models.FollowUp.doctor_id.in_(
+            select(models.Doctor.id).where(name_filter(ENTITY_DOCTOR, doctor_name))
+        ))
+
+    if start_date and end_date:
+        start = datetime.strptime(start_date, "%Y-%m-%d")
+        end = datetime.strptime(end_date, "%Y-%m-%d")
+        query = query.filter(
+            models.FollowUp.followup_date.between(start, end)
+        )
+    return query
+
+
+def get_follow_ups(db: Session, elderly_id: int, fields: str = None, columnar: bool = False):
+    """
+    获取某个老人的全部随访记录（按随访时间排序），只查询 fields 指定的列，返回字典列表；
+    columnar=True 时返回 (列名->值列表, 列名->SQL 类型)
+    """
+    projection = follow_up_projection(fields)
+    try:
+        stmt = projection.statement(select(models.FollowUp).where(models.FollowUp.elderly_id == elderly_id))
+        rows = db.execute(stmt.order_by(models.FollowUp.followup_date, models.FollowUp.id)).all()
+        if columnar:
+            return projection.to_columns(rows), projection.column_types
+        return projection.to_dicts(rows)
+    except SQLAlchemyError as e:
+        logger.error(f"获取老人随访记录失败 ID:{elderly_id}, 错误: {str(e)}")
+        raise HTTPException(status_code=500, detail="获取老人随访记录失败")
+
+
 # 在crud.py中的get_follow_ups_paginated方法
-def get_follow_ups_paginated(db: Session, page: int, per_page: int, elderly_id: int = None, doctor_id: int = None):
+def get_follow_ups_paginated(db: Session, page: int, per_page: int, elderly_id: int = None, doctor_id: int = None,
+                             cursor: str = None, count_mode: str = COUNT_MODE_EXACT):
     try:
-        query = db.query(models.FollowUp).options(
-            joinedload(models.FollowUp.elderly),
-            joinedload(models.FollowUp.doctor)
-        )
+        query = db.query(models.FollowUp).options(*FOLLOW_UP_DETAIL_OPTIONS)
 
-        if elderly_id:
-            query = query.filter(models.FollowUp.elderly_id == elderly_id)
-        if doctor_id:
-            query = query.filter(models.FollowUp.doctor_id == doctor_id)
+        query = apply_follow_up_filters(query, elderly_id=elderly_id, doctor_id=doctor_id)
 
-        total = query.count()
-        items = query.order_by(
-            models.FollowUp.followup_date.desc()
-        ).offset((page - 1) * per_page).limit(per_page).all()
+        total, total_is_estimate = count_follow_ups(
+            query, (elderly_id, doctor_id, None, None, None, None), mode=count_mode
+        )
+        if cursor:
+            items, next_cursor, prev_cursor = fetch_keyset_page(query, per_page, cursor)
+        else:
+            items = order_newest_first(query).offset((page - 1) * per_page).limit(per_page).all()
+            next_cursor, prev_cursor = page_cursors(items, page, per_page, total)
 
         return {
             "items": items,
             "total": total,
             "page": page,
             "per_page": per_page,
-            "total_pages": (total + per_page - 1) // per_page
+            "total_pages": (total + per_page - 1) // per_page,
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
+            "total_is_estimate": total_is_estimate
         }
     except SQLAlchemyError as e:
         logger.error(f"分页查询失败: {str(e)}")
@@ -74,15 +134,13 @@ def get_follow_ups_paginated(db: Session, page: int, per_page: int, elderly_id:
 
 def create_follow_up(db: Session, follow_up: schemas.FollowUpCreate):
     try:
-        # 转换日期格式
+        # 转换日期格式（schema 校验器已把字符串解析为 datetime）
         follow_up_data = follow_up.dict()
-        follow_up_data['followup_date'] = datetime.strptime(follow_up_data['follow_up_date'], "%Y-%m-%d %H:%M:%S")
+        follow_up_data['followup_date'] = _to_datetime(follow_up_data['follow_up_date'])
 
         # 处理下次随访日期
         if follow_up_data['next_follow_up_date']:
-            follow_up_data['next_follow_up_date'] = datetime.strptime(
-                follow_up_data['next_follow_up_date'], "%Y-%m-%d %H:%M:%S"
-            )
+            follow_up_data['next_follow_up_date'] = _to_datetime(follow_up_data['next_follow_up_date'])
 
         # 移除前端使用的字段名，使用数据库字段名
         follow_up_data.pop('follow_up_date', None)
@@ -90,87 +148,110 @@ def create_follow_up(db: Session, follow_up: schemas.FollowUpCreate):
         # 创建随访记录
         db_follow_up = models.FollowUp(**follow_up_data)
         db.add(db_follow_up)
+        db.flush()
+        evaluate_follow_up(db, db_follow_up)
+        refresh_latest(db, [db_follow_up.elderly_id])
+        follow_up_id = db_follow_up.id
+        bump_table_versions(db, TABLE_FOLLOW_UPS)
         db.commit()
-        db.refresh(db_follow_up)
-        return db_follow_up
+        invalidate_follow_up_counts()
+        # 返回值包含老人和医生信息，提交后连同关联一次查回
+        return get_follow_up(db, follow_up_id)
     except Exception as e:
         db.rollback()
         logger.error(f"创建随访记录失败: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
 
+BULK_CHUNK_SIZE = 1000  # 批量导入每批插入/提交的记录数
+BULK_MAX_ROWS = 50000  # 单次请求最多导入的记录数
+
+
+def _to_datetime(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+
+
+def bulk_create_follow_ups(db: Session, payloads: list, chunk_size: int = BULK_CHUNK_SIZE):
+    """
+    批量导入随访记录
+    1. 逐条做 schema 校验，再一次性核对涉及的老人/医生ID是否存在
+    2. 按 chunk_size 批量插入，每批一个事务；某批失败时回滚并逐条重试，定位出错记录
+    单条记录出错不影响其他记录，返回 schemas.BulkIngestResult 结构
+    """
+    errors = []
+    valid = []  # (序号, 行数据)
+    columns = set(models.FollowUp.__table__.columns.keys())
+
+    for index, payload in enumerate(payloads):
+        try:
+            follow_up = schemas.FollowUpCreate.model_validate(payload)
+            data = follow_up.model_dump()
+            data["followup_date"] = _to_datetime(data.pop("follow_up_date"))
+            data["next_follow_up_date"] = _to_datetime(data.get("next_follow_up_date"))
+            valid.append((index, {key: value for key, value in data.items() if key in columns}))
+        except ValidationError as e:
+            errors.append({"index": index, "error": "; ".join(
+                f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors()
+            )})
+        except (ValueError, TypeError) as e:
+            errors.append({"index": index, "error": str(e)})
+
+    # 外键批量核对，避免整批插入因个别记录失败
+    if valid:
+        elderly_ids = {row["elderly_id"] for _, row in valid}
+        doctor_ids = {row["doctor_id"] for _, row in valid}
+        existing_elderly = {row[0] for row in db.query(models.Elderly.id).filter(models.Elderly.id.in_(elderly_ids))}
+        existing_doctors = {row[0] for row in db.query(models.Doctor.id).filter(models.Doctor.id.in_(doctor_ids))}
+        checked = []
+        for index, row in valid:
+            if row["elderly_id"] not in existing_elderly:
+                errors.append({"index": index, "error": f"老人信息不存在 ID:{row['elderly_id']}"})
+            elif row["doctor_id"] not in existing_doctors:
+                errors.append({"index": index, "error": f"医生信息不存在 ID:{row['doctor_id']}"})
+            else:
+                checked.append((index, row))
+        valid = checked
+
+    created = 0
+    for offset in range(0, len(valid), chunk_size):
+        chunk = valid[offset:offset + chunk_size]
+        try:
+            insert_follow_ups_with_alerts(db, [row for _, row in chunk])
+            refresh_latest(db, [row["elderly_id"] for _, row in chunk])
+            bump_table_versions(db, TABLE_FOLLOW_UPS)
+            db.commit()
+            created += len(chunk)
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.warning(f"批量导入第 {offset // chunk_size + 1} 批失败，改为逐条写入: {str(e)}")
+            for index, row in chunk:
+                try:
+                    insert_follow_ups_with_alerts(db, [row])
+                    refresh_latest(db, [row["elderly_id"]])
+                    bump_table_versions(db, TABLE_FOLLOW_UPS)
+                    db.commit()
+                    created += 1
+                except SQLAlchemyError as row_error:
+                    db.rollback()
+                    errors.append({"index": index, "error": str(getattr(row_error, "orig", None) or row_error)})
+
+    if created:
+        invalidate_follow_up_counts()
+
+    errors.sort(key=lambda item: item["index"])
+    logger.info(f"批量导入随访记录: 收到 {len(payloads)} 条, 成功 {created} 条, 失败 {len(errors)} 条")
+    return {"received": len(payloads), "created": created, "failed": len(errors), "errors": errors}
+
+
 def get_follow_up_report_data(db: Session, follow_up_id: int):
     """生成报告所需数据（包含所有健康指标）"""
     try:
-        follow_up = db.query(models.FollowUp).filter(models.FollowUp.id == follow_up_id).first()
+        follow_up = get_follow_up(db, follow_up_id)
         if not follow_up:
             raise HTTPException(status_code=404, detail="随访记录不存在")
 
-        # 处理 next_follow_up_date（兼容空值）
-        next_follow_up_str = None
-        if hasattr(follow_up, 'next_follow_up_date') and follow_up.next_follow_up_date:
-            next_follow_up_str = follow_up.next_follow_up_date.strftime("%Y-%m-%d %H:%M")
-
-
-        return {
-            # 基本信息
-            "elderly_name": follow_up.elderly.name if follow_up.elderly else "",
-            "doctor_name": follow_up.doctor.name if follow_up.doctor else "",
-            "followup_date": follow_up.followup_date.strftime("%Y-%m-%d %H:%M") if follow_up.followup_date else "",
-            "content": follow_up.content or "",
-            "next_follow_up_date": next_follow_up_str,  # 使用处理后的值
-            "medication_warning": follow_up.medication_warning or "无特殊用药禁忌",
-
-            # 体格检查
-            "height": follow_up.height,
-            "weight": follow_up.weight,
-            "bmi": follow_up.bmi,
-            "waist_circumference": follow_up.waist_circumference,
-            "hip_circumference": follow_up.hip_circumference,
-            "waist_hip_ratio": follow_up.waist_hip_ratio,
-            "temperature": follow_up.temperature,
-
-            # 生命体征
-            "systolic_blood_pressure": follow_up.systolic_blood_pressure,
-            "diastolic_blood_pressure": follow_up.diastolic_blood_pressure,
-            "blood_oxygen": follow_up.blood_oxygen,
-            "pulse_rate": follow_up.pulse_rate,
-            "heart_rate": follow_up.heart_rate,
-            "respiration": follow_up.respiration,
-
-            # 血液检查
-            "blood_glucose": follow_up.blood_glucose,
-            "uric_acid": follow_up.uric_acid,
-            "hemoglobin": follow_up.hemoglobin,
-            "total_cholesterol": follow_up.total_cholesterol,
-            "triglycerides": follow_up.triglycerides,
-            "hdl_cholesterol": follow_up.hdl_cholesterol,
-            "ldl_cholesterol": follow_up.ldl_cholesterol,
-
-            # 其他检查
-            "fat": follow_up.fat,
-            "water_content": follow_up.water_content,
-            "bmr": follow_up.bmr,
-            "bone_density": follow_up.bone_density,
-            "fvc": follow_up.fvc,
-            "ecg": follow_up.ecg,
-            "total_sleep_time": follow_up.total_sleep_time,
-
-            # 尿常规
-            "urine_wbc": follow_up.urine_wbc,
-            "urine_nitrite": follow_up.urine_nitrite,
-            "urine_urobilinogen": follow_up.urine_urobilinogen,
-            "urine_protein": follow_up.urine_protein,
-            "urine_ph": follow_up.urine_ph,
-            "urine_blood": follow_up.urine_blood,
-            "urine_specific_gravity": follow_up.urine_specific_gravity,
-            "urine_ketone": follow_up.urine_ketone,
-            "urine_bilirubin": follow_up.urine_bilirubin,
-            "urine_glucose": follow_up.urine_glucose,
-            "urine_vitamin_c": follow_up.urine_vitamin_c,
-
-            # 其他
-            "cholesterol": follow_up.cholesterol
-        }
+        return build_report_data(follow_up)
     except Exception as e:
         logger.error(f"生成报告数据失败: {str(e)}")
         raise HTTPException(status_code=500, detail="生成报告数据失败")
@@ -186,8 +267,13 @@ def delete_follow_up(db: Session, follow_up_id: int):
                 detail="随访记录不存在"
             )
 
+        delete_follow_up_alerts(db, follow_up_id)
         db.delete(follow_up)
+        refresh_latest(db, [follow_up.elderly_id], may_remove=True)
+        bump_table_versions(db, TABLE_FOLLOW_UPS)
         db.commit()
+        invalidate_follow_up_counts()
+        invalidate_report(follow_up_id)
         return {"message": "随访记录删除成功"}
     except SQLAlchemyError as e:
         db.rollback()
@@ -206,8 +292,13 @@ def delete_follow_up(db: Session, follow_up_id: int):
                 detail="随访记录不存在"
             )
 
+        delete_follow_up_alerts(db, follow_up_id)
         db.delete(follow_up)
+        refresh_latest(db, [follow_up.elderly_id], may_remove=True)
+        bump_table_versions(db, TABLE_FOLLOW_UPS)
         db.commit()
+        invalidate_follow_up_counts()
+        invalidate_report(follow_up_id)
         return {"message": "随访记录删除成功"}
     except SQLAlchemyError as e:
         db.rollback()
@@ -222,13 +313,22 @@ def update_follow_up(db: Session, follow_up_id: int, follow_up_update: schemas.F
         if not db_follow_up:
             raise HTTPException(status_code=404, detail="随访记录不存在")
 
+        previous_elderly_id = db_follow_up.elderly_id
         update_data = follow_up_update.dict(exclude_unset=True)
         for key, value in update_data.items():
             setattr(db_follow_up, key, value)
-
+        # 在数据库中递增，并发更新也不会丢失（报告版本号依赖它，updated_at 只精确到秒）
+        db_follow_up.revision = models.FollowUp.revision + 1
+        db.flush()
+        evaluate_follow_up(db, db_follow_up)
+        refresh_latest(db, [previous_elderly_id, db_follow_up.elderly_id],
+                       may_remove=previous_elderly_id != db_follow_up.elderly_id)
+
+        bump_table_versions(db, TABLE_FOLLOW_UPS)
         db.commit()
-        db.refresh(db_follow_up)
-        return db_follow_up
+        invalidate_follow_up_counts()
+        invalidate_report(follow_up_id)
+        return get_follow_up(db, follow_up_id)
     except Exception as e:
         db.rollback()
         logger.error(f"更新随访记录失败: {str(e)}")
@@ -286,8 +386,12 @@ def create_elderly(db: Session, elderly: schemas.ElderlyCreate):
             occupation=elderly.occupation
         )
         db.add(db_elderly)
+        db.flush()
+        index_name(db, ENTITY_ELDERLY, db_elderly.id, db_elderly.name)
+        bump_table_versions(db, TABLE_ELDERLY)
         db.commit()
         db.refresh(db_elderly)
+        suggest.sync_elderly(db_elderly)
         return db_elderly
     except Exception as e:
         db.rollback()
@@ -305,8 +409,13 @@ def delete_elderly(db: Session, elderly_id: int):
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="老人信息不存在"
             )
+        remove_name(db, ENTITY_ELDERLY, elderly_id)
+        remove_latest(db, elderly_id)
         db.delete(elderly)
+        bump_table_versions(db, TABLE_ELDERLY, TABLE_FOLLOW_UPS)
         db.commit()
+        suggest.remove_entity(ENTITY_ELDERLY, elderly_id)
+        invalidate_follow_up_counts()
         return {"message": "老人信息删除成功"}
     except Exception as e:
         db.rollback()
@@ -330,9 +439,14 @@ def update_elderly(db: Session, elderly_id: int, elderly_update: schemas.Elderly
         update_data = elderly_update.dict(exclude_unset=True)
         for key, value in update_data.items():
             setattr(db_elderly, key, value)
+        if "name" in update_data:
+            index_name(db, ENTITY_ELDERLY, db_elderly.id, db_elderly.name)
 
+        bump_table_versions(db, TABLE_ELDERLY)
         db.commit()
+        invalidate_follow_up_counts()
         db.refresh(db_elderly)
+        suggest.sync_elderly(db_elderly)
         return db_elderly
     except Exception as e:
         db.rollback()
@@ -351,8 +465,12 @@ def create_doctor(db: Session, doctor: schemas.DoctorCreate):
             contact=doctor.contact
         )
         db.add(db_doctor)
+        db.flush()
+        index_name(db, ENTITY_DOCTOR, db_doctor.id, db_doctor.name)
+        bump_table_versions(db, TABLE_DOCTORS)
         db.commit()
         db.refresh(db_doctor)
+        suggest.sync_doctor(db_doctor)
         return db_doctor
     except Exception as e:
         db.rollback()
@@ -370,8 +488,12 @@ def delete_doctor(db: Session, doctor_id: int):
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="医生信息不存在"
             )
+        remove_name(db, ENTITY_DOCTOR, doctor_id)
         db.delete(doctor)
+        bump_table_versions(db, TABLE_DOCTORS, TABLE_FOLLOW_UPS)
         db.commit()
+        suggest.remove_entity(ENTITY_DOCTOR, doctor_id)
+        invalidate_follow_up_counts()
         return {"message": "医生信息删除成功"}
     except Exception as e:
         db.rollback()
@@ -395,9 +517,14 @@ def update_doctor(db: Session, doctor_id: int, doctor_update: schemas.DoctorUpda
         update_data = doctor_update.dict(exclude_unset=True)
         for key, value in update_data.items():
             setattr(db_doctor, key, value)
+        if "name" in update_data:
+            index_name(db, ENTITY_DOCTOR, db_doctor.id, db_doctor.name)
 
+        bump_table_versions(db, TABLE_DOCTORS)
         db.commit()
+        invalidate_follow_up_counts()
         db.refresh(db_doctor)
+        suggest.sync_doctor(db_doctor)
         return db_doctor
     except Exception as e:
         db.rollback()
@@ -415,7 +542,7 @@ def get_doctors(db: Session, skip: int = 0, limit: int = 100, name: str = None):
         query = db.query(models.Doctor)
         # 仅当 name 有值时才过滤（避免 name 为 None 时的无效过滤）
         if name is not None and name.strip() != "":
-            query = query.filter(models.Doctor.name.ilike(f"%{name}%"))
+            query = query.filter(name_filter(ENTITY_DOCTOR, name))
         # 执行查询并返回结果（即使无过滤条件，也返回所有医生）
         return query.offset(skip).limit(limit).all()
     except Exception as e:
@@ -431,44 +558,170 @@ from sqlalchemy import cast, String
 # 修改app/crud.py中的get_elderlies方法
 def get_elderlies(db: Session, skip: int = 0, limit: int = 100, search: str = None):
     try:
-        query = db.query(models.Elderly)
+        query = db.query(models.Elderly).options(joinedload(models.Elderly.latest_follow_up))
         if search:
-            query = query.filter(models.Elderly.name.ilike(f"%{search}%"))
+            query = query.filter(name_filter(ENTITY_ELDERLY, search))
         return query.order_by(models.Elderly.id).offset(skip).limit(limit).all()
     except SQLAlchemyError as e:
         logger.error(f"获取老人列表失败: {str(e)}")
         raise HTTPException(status_code=500, detail="获取老人数据失败")
 
-def schedule_follow_up_automation(db: Session):
-    """自动为需要随访的老人生成随访计划"""
+SCHEDULE_CHUNK_SIZE = 1000  # 自动排期每批插入/提交的记录数
+
+
+def schedule_follow_up_automation(db: Session, chunk_size: int = SCHEDULE_CHUNK_SIZE,
+                                  interval_days: int = 30, doctor_id: int = 1,
+                                  progress: Callable[[int, int], None] = None, raise_errors: bool = False):
+    """
+    自动为需要随访的老人生成随访计划
+    从最近随访汇总表找出超过 interval_days 天未随访（或从未随访）的老人，再按 chunk_size 分批批量插入，每批一个事务。
+    progress(已生成数, 总数) 在每批提交后调用；raise_errors=True 时失败抛出异常（后台任务据此重试，已提交的批次不会重复生成）
+    返回 {"created": 新建计划数, "elapsed_seconds": 耗时}
+    """
+    started = time.perf_counter()
+    created = 0
     try:
-        # 1. 获取所有需要随访的老人（例如：上次随访超过30天的老人）
-        elderly_list = db.query(models.Elderly).all()
-
-        for elderly in elderly_list:
-            last_follow_up = db.query(models.FollowUp) \
-                .filter(models.FollowUp.elderly_id == elderly.id) \
-                .order_by(models.FollowUp.follow_up_date.desc()) \
-                .first()
-
-            # 2. 判断是否需要新随访（示例：超过30天未随访）
-            if last_follow_up:
-                days_since_last = (datetime.now() - last_follow_up.follow_up_date).days
-                if days_since_last < 30:
-                    continue
+        now = datetime.now()
+        cutoff = now - timedelta(days=interval_days)
+
+        # 1. 老人表左连接最近随访汇总表，筛出超期未随访（或从未随访）的老人
+        latest = models.ElderlyLatestFollowUp
+        elderly_ids = [
+            row[0] for row in db.query(models.Elderly.id)
+            .outerjoin(latest, latest.elderly_id == models.Elderly.id)
+            .filter(or_(latest.last_followup_date.is_(None), latest.last_followup_date <= cutoff))
+            .order_by(models.Elderly.id)
+            .all()
+        ]
+
+        # 2. 分批批量插入随访计划，每批一次提交
+        planned_date = now + timedelta(days=1)  # 默认明天
+        for offset in range(0, len(elderly_ids), chunk_size):
+            rows = [
+                {
+                    "elderly_id": elderly_id,
+                    "doctor_id": doctor_id,  # 默认分配ID为1的医生
+                    "followup_date": planned_date,
+                    "content": "系统自动生成的随访计划",
+                    "schedule_strategy": "automated",
+                }
+                for elderly_id in elderly_ids[offset:offset + chunk_size]
+            ]
+            db.execute(insert(models.FollowUp), rows)
+            refresh_latest(db, [row["elderly_id"] for row in rows])
+            bump_table_versions(db, TABLE_FOLLOW_UPS)
+            db.commit()
+            created += len(rows)
+            invalidate_follow_up_counts()
+            if progress is not None:
+                progress(created, len(elderly_ids))
 
-            # 3. 自动创建随访记录
-            new_follow_up = models.FollowUp(
-                elderly_id=elderly.id,
-                doctor_id=1,  # 默认分配ID为1的医生
-                follow_up_date=datetime.now() + timedelta(days=1),  # 默认明天
-                content="系统自动生成的随访计划"
+    except Exception as e:
+        db.rollback()
+        logger.error(f"自动排期失败: {str(e)}")
+        if raise_errors:
+            raise
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"自动排期完成: 新建随访计划 {created} 条, 耗时 {elapsed:.2f} 秒")
+    return {"created": created, "elapsed_seconds": round(elapsed, 3)}
+
+
+RECURRING_SCHEDULER_NAME = "recurring_follow_ups"
+RECURRING_BATCH_SIZE = 500  # 每批处理的到期定期随访数
+RECURRING_LOOKBACK_DAYS = 7  # 每次从水位线往前回看的天数，补上到期日早于水位线才录入/修改的记录
+DEFAULT_SCHEDULE_INTERVAL = 30  # 未设置间隔时的默认随访间隔(天)
+
+
+def schedule_recurring_follow_ups(db: Session, batch_size: int = RECURRING_BATCH_SIZE, now: datetime = None,
+                                  lookback_days: Optional[int] = RECURRING_LOOKBACK_DAYS, raise_errors: bool = False):
+    """
+    增量生成定期随访
+    扫描 now 之前到期的 is_recurring 记录（走 idx_recurring_next 索引），按 (next_follow_up_date, id) 顺序分批，
+    从高水位线往前 lookback_days 天开始：下午录入的当天上午到期的记录等到期日早于水位线的记录也会被处理。
+    是否已生成以 recurrence_source_id（唯一索引）为准，回看窗口内已生成过的来源记录直接跳过，重复扫描不会重复生成；
+    水位线只用于限定扫描范围。lookback_days=None 时从头扫描全部到期记录。
+    每批插入下一次随访并推进水位线，二者在同一事务中提交。
+    raise_errors=True 时失败抛出异常（后台任务据此重试）
+    返回 {"processed": 扫描的到期记录数, "created": 新建随访数, "elapsed_seconds": 耗时}
+    """
+    started = time.perf_counter()
+    now = now or datetime.now()
+    processed = created = 0
+    try:
+        state = db.query(models.SchedulerState).filter(
+            models.SchedulerState.name == RECURRING_SCHEDULER_NAME
+        ).first()
+        if state is None:
+            state = models.SchedulerState(name=RECURRING_SCHEDULER_NAME)
+            db.add(state)
+            db.flush()
+
+        next_date = models.FollowUp.next_follow_up_date
+        cursor = None
+        if state.watermark_date is not None and lookback_days is not None:
+            cursor = (state.watermark_date - timedelta(days=lookback_days), 0)
+        while True:
+            query = db.query(models.FollowUp).filter(
+                models.FollowUp.is_recurring == True,
+                next_date <= now
             )
-            db.add(new_follow_up)
+            if cursor is not None:
+                query = query.filter(or_(
+                    next_date > cursor[0],
+                    and_(next_date == cursor[0], models.FollowUp.id > cursor[1])
+                ))
+            batch = query.order_by(next_date, models.FollowUp.id).limit(batch_size).all()
+            if not batch:
+                break
+            cursor = (batch[-1].next_follow_up_date, batch[-1].id)
+
+            # 已生成过的来源记录直接跳过（回看窗口内再次扫描到的，或上次运行中断的情况）
+            already_generated = {
+                row[0] for row in db.query(models.FollowUp.recurrence_source_id).filter(
+                    models.FollowUp.recurrence_source_id.in_([follow.id for follow in batch])
+                )
+            }
+            rows = []
+            for follow in batch:
+                if follow.id in already_generated:
+                    continue
+                interval = follow.schedule_interval if follow.schedule_interval and follow.schedule_interval > 0 \
+                    else DEFAULT_SCHEDULE_INTERVAL
+                rows.append({
+                    "elderly_id": follow.elderly_id,
+                    "doctor_id": follow.doctor_id,
+                    "followup_date": follow.next_follow_up_date,
+                    "next_follow_up_date": follow.next_follow_up_date + timedelta(days=interval),
+                    "content": "系统自动生成的定期随访",
+                    "medication_warning": follow.medication_warning,
+                    "schedule_strategy": follow.schedule_strategy,
+                    "schedule_interval": follow.schedule_interval,
+                    "is_recurring": True,
+                    "recurrence_source_id": follow.id,
+                })
+            if rows:
+                db.execute(insert(models.FollowUp), rows)
+                refresh_latest(db, [row["elderly_id"] for row in rows])
+                bump_table_versions(db, TABLE_FOLLOW_UPS)
+
+            if state.watermark_date is None or cursor[0] > state.watermark_date:
+                state.watermark_date, state.watermark_id = cursor
             db.commit()
-
-            print(f"已为老人 {elderly.name} 创建随访计划")
+            # 释放本批对象，避免大批量积压时会话持续膨胀
+            for follow in batch:
+                db.expunge(follow)
+            processed += len(batch)
+            created += len(rows)
+            if rows:
+                invalidate_follow_up_counts()
 
     except Exception as e:
         db.rollback()
-        logger.error(f"自动排期失败: {str(e)}")
\ No newline at end of file
+        logger.error(f"定期随访排期失败: {str(e)}")
+        if raise_errors:
+            raise
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"定期随访排期完成: 处理到期记录 {processed} 条, 新建随访 {created} 条, 耗时 {elapsed:.2f} 秒")
+    return {"processed": processed, "created": created, "elapsed_seconds": round(elapsed, 3)}
@@ -0,0 +1,113 @@
+import logging
+
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from . import models
+from .counts import COUNT_MODE_EXACT, count_follow_ups_async
+from .crud import FOLLOW_UP_DETAIL_OPTIONS, apply_follow_up_filters
+from .pagination import apply_keyset, finish_keyset_page, page_cursors
+from .projections import follow_up_projection
+from .search_index import ENTITY_DOCTOR, ENTITY_ELDERLY, name_filter
+
+# crud.py 中读操作的异步版本，配合 database.get_async_sessionmaker 使用，
+# 数据库往返期间不阻塞事件循环。写操作仍走同步会话（路由以普通 def 声明，在线程池中执行）。
+
+logger = logging.getLogger(__name__)
+
+
+async def get_follow_up(db: AsyncSession, follow_up_id: int):
+    """获取单个随访记录（含老人和医生信息；异步会话不能延迟加载，关联须随查询一起取回）"""
+    try:
+        result = await db.execute(
+            select(models.FollowUp).options(*FOLLOW_UP_DETAIL_OPTIONS).where(models.FollowUp.id == follow_up_id)
+        )
+        return result.scalars().first()
+    except SQLAlchemyError as e:
+        logger.error(f"获取随访记录失败 ID:{follow_up_id}, 错误: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="获取随访记录失败"
+        )
+
+
+async def get_follow_ups_paginated(db: AsyncSession, page: int, per_page: int, elderly_id: int = None,
+                                   doctor_id: int = None, elderly_name: str = None, doctor_name: str = None,
+                                   start_date: str = None, end_date: str = None, cursor: str = None,
+                                   count_mode: str = COUNT_MODE_EXACT, fields: str = None, columnar: bool = False):
+    """
+    分页/游标查询随访记录，返回结构与 crud.get_follow_ups_paginated 相同
+    只查询 fields 指定的列（默认为列表页展示的列），items 为字典；
+    columnar=True 时不生成 items，改为 columns（{列名: 值列表}）和 column_types（列的 SQL 类型）
+    """
+    projection = follow_up_projection(fields)
+    try:
+        stmt = apply_follow_up_filters(
+            select(models.FollowUp),
+            elderly_id=elderly_id, doctor_id=doctor_id, elderly_name=elderly_name,
+            doctor_name=doctor_name, start_date=start_date, end_date=end_date
+        )
+
+        total, total_is_estimate = await count_follow_ups_async(
+            db, stmt,
+            (elderly_id, doctor_id, elderly_name, doctor_name, start_date, end_date),
+            mode=count_mode
+        )
+        projected = projection.statement(stmt)
+        if cursor:
+            page_stmt, direction = apply_keyset(projected, per_page, cursor)
+            rows = (await db.execute(page_stmt)).all()
+            rows, next_cursor, prev_cursor = finish_keyset_page(rows, per_page, direction, cursor)
+        else:
+            page_stmt = projection.offset_page_statement(stmt, (page - 1) * per_page, per_page)
+            rows = (await db.execute(page_stmt)).all()
+            next_cursor, prev_cursor = page_cursors(rows, page, per_page, total)
+
+        if columnar:
+            page_data = {"columns": projection.to_columns(rows), "column_types": projection.column_types}
+        else:
+            page_data = {"items": projection.to_dicts(rows)}
+        return {
+            **page_data,
+            "total": total,
+            "page": page,
+            "per_page": per_page,
+            "total_pages": (total + per_page - 1) // per_page,
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
+            "total_is_estimate": total_is_estimate
+        }
+    except SQLAlchemyError as e:
+        logger.error(f"分页查询失败: {str(e)}")
+        raise HTTPException(status_code=500, detail="分页查询失败")
+
+
+async def get_elderlies(db: AsyncSession, skip: int = 0, limit: int = 100, search: str = None):
+    try:
+        stmt = select(models.Elderly).options(joinedload(models.Elderly.latest_follow_up))
+        if search:
+            stmt = stmt.where(name_filter(ENTITY_ELDERLY, search))
+        result = await db.execute(stmt.order_by(models.Elderly.id).offset(skip).limit(limit))
+        return result.scalars().all()
+    except SQLAlchemyError as e:
+        logger.error(f"获取老人列表失败: {str(e)}")
+        raise HTTPException(status_code=500, detail="获取老人数据失败")
+
+
+async def get_doctors(db: AsyncSession, skip: int = 0, limit: int = 100, name: str = None):
+    try:
+        stmt = select(models.Doctor)
+        # 仅当 name 有值时才过滤
+        if name is not None and name.strip() != "":
+            stmt = stmt.where(name_filter(ENTITY_DOCTOR, name))
+        result = await db.execute(stmt.offset(skip).limit(limit))
+        return result.scalars().all()
+    except Exception as e:
+        logger.error(f"获取医生列表失败: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"获取医生数据失败: {str(e)}"
+        )
@@ -0,0 +1,134 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import select, type_coerce
+from sqlalchemy.types import NullType
+
+from . import models
+from .responses import json_default
+
+try:
+    import orjson  # 可选依赖，安装后 NDJSON 编码快数倍
+except ImportError:
+    orjson = None
+
+# 随访记录原始数据流式导出（CSV / NDJSON，可选 gzip）
+# 只查询需要的列，按批从服务端游标读取，每批编码后立即输出，内存占用与导出行数无关。
+
+EXPORT_FORMAT_CSV = "csv"
+EXPORT_FORMAT_NDJSON = "ndjson"
+EXPORT_BATCH_SIZE = 5000  # 每批从游标读取的行数
+EXPORT_GZIP_LEVEL = 1  # 流式导出优先吞吐，低压缩级别对这类重复度高的文本已足够
+
+# 始终导出的基础列
+BASE_COLUMNS = ["id", "elderly_id", "doctor_id", "followup_date"]
+# 可选择导出的列（健康指标等），默认全部导出
+OPTIONAL_COLUMNS = [
+    column.name for column in models.FollowUp.__table__.columns
+    if column.name not in BASE_COLUMNS
+]
+
+MEDIA_TYPES = {
+    EXPORT_FORMAT_CSV: "text/csv; charset=utf-8",
+    EXPORT_FORMAT_NDJSON: "application/x-ndjson",
+}
+
+
+def parse_export_columns(fields: Optional[str]) -> List[str]:
+    """解析 fields=height,weight,... 参数，返回实际导出的列名"""
+    if not fields:
+        return BASE_COLUMNS + OPTIONAL_COLUMNS
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in OPTIONAL_COLUMNS and name not in BASE_COLUMNS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"未知的导出字段: {', '.join(unknown)}"
+        )
+    return BASE_COLUMNS + [name for name in requested if name not in BASE_COLUMNS]
+
+
+def build_export_statement(columns: List[str]):
+    """
+    只选择需要的列，不构造 ORM 对象
+    列类型强制为 NullType，跳过 SQLAlchemy 的结果类型转换，直接输出驱动返回的值
+    """
+    table = models.FollowUp.__table__
+    return select(*[type_coerce(table.c[name], NullType()).label(name) for name in columns])
+
+
+def _encode_csv(columns: List[str]):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def header() -> bytes:
+        writer.writerow(columns)
+        return _drain(buffer)
+
+    def encode(rows) -> bytes:
+        writer.writerows(rows)
+        return _drain(buffer)
+
+    return header, encode
+
+
+def _encode_ndjson(columns: List[str]):
+    if orjson is not None:
+        def encode(rows) -> bytes:
+            lines = [orjson.dumps(dict(zip(columns, row)), default=json_default) for row in rows]
+            lines.append(b"")
+            return b"\n".join(lines)
+    else:
+        dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=json_default).encode
+
+        def encode(rows) -> bytes:
+            lines = [dumps(dict(zip(columns, row))) for row in rows]
+            lines.append("")
+            return "\n".join(lines).encode("utf-8")
+
+    return (lambda: b""), encode
+
+
+def _drain(buffer: io.StringIO) -> bytes:
+    text = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate(0)
+    return text.encode("utf-8")
+
+
+def iter_export(db, stmt, columns: List[str], export_format: str = EXPORT_FORMAT_CSV,
+                compress: bool = False, batch_size: int = EXPORT_BATCH_SIZE):
+    """执行 stmt 并按批编码输出字节块"""
+    if export_format == EXPORT_FORMAT_CSV:
+        header, encode = _encode_csv(columns)
+    else:
+        header, encode = _encode_ndjson(columns)
+    # wbits=31 生成带 gzip 头的流
+    compressor = zlib.compressobj(EXPORT_GZIP_LEVEL, zlib.DEFLATED, 31) if compress else None
+
+    def emit(data: bytes) -> bytes:
+        return compressor.compress(data) if compressor else data
+
+    chunk = emit(header())
+    if chunk:
+        yield chunk
+
+    # 直接在连接上执行核心查询，绕过 ORM 结果加载
+    result = db.connection().execute(stmt.execution_options(stream_results=True, yield_per=batch_size))
+    for rows in result.partitions():
+        chunk = emit(encode(rows))
+        if chunk:
+            yield chunk
+
+    if compressor:
+        yield compressor.flush()
+
+
+def export_filename(export_format: str, compress: bool) -> str:
+    suffix = f".{export_format}.gz" if compress else f".{export_format}"
+    return f"follow_ups_{datetime.now().strftime('%Y%m%d%H%M%S')}{suffix}"
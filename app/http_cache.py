@@ -0,0 +1,285 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from .reports import etag_matches
+from .settings import get_settings
+from .table_versions import TABLE_DOCTORS, TABLE_ELDERLY, TABLE_FOLLOW_UPS, TableVersionReader
+
+try:
+    import redis  # 可选依赖，多进程部署时共享版本号和缓存
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# 读接口的 HTTP 缓存（ETag + 条件请求）
+# 前端列表页翻页、搜索、打开对话框都会请求 /elderly、/doctors、/follow-ups。ETag 由 路径+查询参数+Accept+
+# 相关表版本号 计算，版本号存放在数据库 table_versions 表中（见 table_versions 模块），由 crud 的写操作在同一事务中递增，
+# 所有进程（多个 API 工作进程、后台任务进程）看到的是同一份版本号。每个请求只读取这张很小的表，不执行列表查询：
+#   If-None-Match 命中时直接返回 304；否则按 ETag 查找已序列化的响应体，仍未命中才执行路由并保存结果。
+# 版本变化后 ETag 随之变化，旧条目不再被命中，由 LRU 自然淘汰，无需逐条失效。
+# 绕过 crud 的写入（迁移脚本等）最多在 http_cache_ttl 秒后生效：ETag 中含有按 TTL 划分的时间段。
+# 响应体默认缓存在进程内；配置 http_cache_url（Redis 兼容存储）时各进程共享响应体。
+
+# 缓存的接口（GET，路径精确匹配）及其结果依赖的表
+CACHED_ROUTES = {
+    "/api/v1/elderly": (TABLE_ELDERLY, TABLE_FOLLOW_UPS),  # 含最近一次随访汇总
+    "/api/v1/doctors": (TABLE_DOCTORS,),
+    "/api/v1/follow-ups": (TABLE_FOLLOW_UPS, TABLE_ELDERLY, TABLE_DOCTORS),  # 含老人/医生信息，可按姓名过滤
+}
+
+# 浏览器可以缓存，但每次使用前须带 If-None-Match 向服务器校验
+CACHE_CONTROL = b"private, no-cache"
+
+
+class CachedResponse(NamedTuple):
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+
+
+class CacheBackend(ABC):
+    """缓存后端：按 ETag 存取序列化后的响应"""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """按 ETag 读取，不存在或已过期时返回 None"""
+
+    @abstractmethod
+    def set(self, key: str, response: CachedResponse, ttl: int):
+        """保存响应，ttl 秒后过期"""
+
+    @abstractmethod
+    def clear(self):
+        """清空全部响应"""
+
+    def stats(self) -> dict:
+        return {}
+
+
+class MemoryBackend(CacheBackend):
+    """进程内 LRU，同时限制条数和总字节数"""
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[CachedResponse, float]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] < time.monotonic():
+                self._discard(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: str, response: CachedResponse, ttl: int):
+        if len(response.body) > self.max_bytes:
+            return
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (response, time.monotonic() + ttl)
+            self._size += len(response.body)
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._size -= len(evicted.body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._size}
+
+    def _discard(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[0].body)
+
+
+class RedisBackend(CacheBackend):
+    """Redis 兼容存储：响应体带过期时间保存，所有进程共享"""
+
+    def __init__(self, url: str, prefix: str = "http_cache:"):
+        if redis is None:
+            raise RuntimeError("未安装 redis 包，无法使用 Redis 缓存后端（pip install redis）")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        raw = self.client.get(f"{self.prefix}body:{key}")
+        if raw is None:
+            return None
+        head, body = raw.split(b"\n", 1)
+        status, headers = json.loads(head)
+        return CachedResponse(status, [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers],
+                              body)
+
+    def set(self, key: str, response: CachedResponse, ttl: int):
+        head = json.dumps([response.status, [(name.decode("latin-1"), value.decode("latin-1"))
+                                             for name, value in response.headers]])
+        self.client.set(f"{self.prefix}body:{key}", head.encode("latin-1") + b"\n" + response.body, ex=ttl)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(f"{self.prefix}body:*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+class HTTPCache:
+    def __init__(self, backend: CacheBackend, versions: TableVersionReader, ttl: int = 60,
+                 max_body: int = 2 * 1024 * 1024):
+        self.backend = backend
+        self.versions = versions
+        self.ttl = ttl
+        self.max_body = max_body
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.not_modified = 0
+
+    def etag(self, path: str, query_string: bytes, accept: str, tables: Tuple[str, ...]) -> str:
+        versions = self.versions.get(tables)
+        period = int(time.time() // self.ttl)
+        raw = f"{path}?{query_string.decode('latin-1')}|{accept}|{versions}|{period}"
+        return f'"{hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]}"'
+
+    def lookup(self, etag: str) -> Optional[CachedResponse]:
+        try:
+            return self.backend.get(etag)
+        except Exception as e:
+            logger.error(f"读取缓存失败: {str(e)}")
+            return None
+
+    def store(self, etag: str, response: CachedResponse):
+        try:
+            self.backend.set(etag, response, self.ttl)
+        except Exception as e:
+            logger.error(f"写入缓存失败: {str(e)}")
+
+    def count(self, outcome: str):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def clear(self):
+        self.backend.clear()
+        with self._lock:
+            self.hits = self.misses = self.not_modified = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = {"hits": self.hits, "misses": self.misses, "not_modified": self.not_modified}
+        return dict(counters, backend=self.backend.__class__.__name__, ttl=self.ttl,
+                    versions=self.versions.snapshot(), **self.backend.stats())
+
+
+_http_cache: Optional[HTTPCache] = None
+_configured = False
+_bind = None
+
+
+def configure_http_cache(enabled: bool = None, backend: CacheBackend = None, ttl: int = None,
+                         max_body: int = None, bind=None) -> Optional[HTTPCache]:
+    """
+    按配置创建缓存（参数覆盖配置项）；enabled=False 时关闭
+    bind 为读取表版本号的引擎，默认使用应用的数据库引擎，指定后之后的重新配置沿用
+    """
+    global _http_cache, _configured, _bind
+    settings = get_settings()
+    if bind is not None:
+        _bind = bind
+    enabled = settings.http_cache_enabled if enabled is None else enabled
+    if not enabled:
+        _http_cache = None
+    else:
+        if backend is None:
+            if settings.http_cache_url:
+                backend = RedisBackend(settings.http_cache_url)
+            else:
+                backend = MemoryBackend(settings.http_cache_max_entries, settings.http_cache_max_bytes)
+        if _bind is None:
+            from .database import engine
+            _bind = engine
+        versions = TableVersionReader(_bind, settings.http_cache_version_check_ms / 1000)
+        _http_cache = HTTPCache(backend, versions, ttl=ttl or settings.http_cache_ttl,
+                                max_body=max_body or settings.http_cache_max_body)
+    _configured = True
+    return _http_cache
+
+
+def get_http_cache() -> Optional[HTTPCache]:
+    if not _configured:
+        configure_http_cache()
+    return _http_cache
+
+
+class HTTPCacheMiddleware:
+    """ASGI 中间件，只处理 CACHED_ROUTES 中的 GET 请求；须放在 CORS 中间件内层，缓存内容不含跨域头"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        cache = get_http_cache()
+        tables = CACHED_ROUTES.get(scope.get("path")) if scope["type"] == "http" else None
+        if cache is None or tables is None or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = {name.decode("latin-1"): value.decode("latin-1") for name, value in scope["headers"]}
+        try:
+            etag = await run_in_threadpool(cache.etag, scope["path"], scope["query_string"],
+                                           request_headers.get("accept", ""), tables)
+        except Exception as e:
+            logger.error(f"读取缓存版本号失败，跳过缓存: {str(e)}")
+            await self.app(scope, receive, send)
+            return
+        validators = [(b"etag", etag.encode("latin-1")), (b"cache-control", CACHE_CONTROL)]
+
+        if etag_matches(request_headers.get("if-none-match"), etag):
+            cache.count("not_modified")
+            await send({"type": "http.response.start", "status": 304, "headers": validators})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        cached = cache.lookup(etag)
+        if cached is not None:
+            cache.count("hits")
+            await send({"type": "http.response.start", "status": cached.status,
+                        "headers": cached.headers + validators})
+            await send({"type": "http.response.body", "body": cached.body})
+            return
+
+        cache.count("misses")
+        start = {}
+        chunks = []
+        size = 0
+
+        async def send_and_store(message):
+            nonlocal size
+            if message["type"] == "http.response.start":
+                start.update(message)
+                if message["status"] == 200:
+                    message = dict(message, headers=list(message.get("headers", [])) + validators)
+            elif message["type"] == "http.response.body" and start.get("status") == 200 and size <= cache.max_body:
+                body = message.get("body", b"")
+                chunks.append(body)
+                size += len(body)
+                if not message.get("more_body", False) and size <= cache.max_body:
+                    cache.store(etag, CachedResponse(200, list(start.get("headers", [])), b"".join(chunks)))
+            await send(message)
+
+        await self.app(scope, receive, send_and_store)
@@ -1,5 +1,17 @@
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import mysql.connector
 from mysql.connector import Error
+from sqlalchemy import create_engine
+from sqlalchemy.engine import URL
+
+from app import models
+from app.alerts import alerts_for_follow_ups, get_rule_set
+from app.database import Base
+from app.schema_upgrade import upgrade_schema
 
 # 数据库配置信息，根据实际情况修改
 config = {
@@ -19,204 +31,298 @@ def get_db_connection():
         print(f"数据库连接失败: {e}")
         return None
 
+def get_engine():
+    """与 config 指向同一数据库的 SQLAlchemy 引擎，用于按模型建表/删表"""
+    return create_engine(URL.create(
+        "mysql+mysqlconnector",
+        username=config["user"],
+        password=config["password"],
+        host=config["host"],
+        database=config["database"],
+    ))
+
+
+# follow_ups 及引用它的表：follow_up_alerts 有指向 follow_ups 的外键，elderly_latest_follow_ups 保存随访ID，
+# 重建 follow_ups 时须一起删除（否则 MySQL 拒绝删除 follow_ups，或汇总/告警指向不存在的随访）
+MIGRATION_TABLES = [models.FollowUp.__table__, models.FollowUpAlert.__table__,
+                    models.ElderlyLatestFollowUp.__table__]
+
+
 def drop_follow_ups_table():
-    """删除现有 follow_ups 表"""
+    """删除 follow_ups 及依赖它的表；失败时抛出异常，由调用方中止 --reset"""
+    engine = get_engine()
+    try:
+        Base.metadata.drop_all(bind=engine, tables=MIGRATION_TABLES)
+        print(f"{', '.join(table.name for table in MIGRATION_TABLES)} 表已删除")
+    finally:
+        engine.dispose()
+
+def create_follow_ups_table():
+    """
+    按模型（models.FollowUp 等）创建 follow_ups 及依赖它的表，表结构与应用保持一致；
+    已存在的表保留原表和数据，只补充缺失的列和索引
+    """
+    engine = get_engine()
+    try:
+        Base.metadata.create_all(bind=engine, tables=MIGRATION_TABLES)
+        upgrade_schema(engine)
+        print("follow_ups 表已就绪")
+    finally:
+        engine.dispose()
+
+# 迁移的目标列，与 SOURCE_COLUMNS_SQL 的顺序一致
+TARGET_COLUMNS = [
+    "elderly_id", "doctor_id", "followup_date", "content",
+    "height", "weight", "bmi", "waist_circumference", "hip_circumference", "waist_hip_ratio",
+    "systolic_blood_pressure", "diastolic_blood_pressure", "blood_oxygen", "blood_glucose",
+    "pulse_rate", "fat", "cholesterol", "fvc", "uric_acid", "bone_density", "total_sleep_time",
+    "heart_rate", "ecg", "water_content", "bmr", "temperature", "hemoglobin",
+    "total_cholesterol", "triglycerides", "hdl_cholesterol", "ldl_cholesterol",
+    "urine_wbc", "urine_nitrite", "urine_urobilinogen", "urine_protein", "urine_ph",
+    "urine_blood", "urine_specific_gravity", "urine_ketone", "urine_bilirubin",
+    "urine_glucose", "urine_vitamin_c", "respiration",
+]
+
+# table_generated_data 中无 followup_date 和 content，用当前时间和默认内容替代
+SOURCE_COLUMNS_SQL = """
+    e.id AS elderly_id,
+    1 AS doctor_id,  -- 强制关联医生ID=1
+    NOW() AS followup_date,  -- 用当前时间作为随访日期
+    CONCAT('自动导入的健康记录：', t.record_id) AS content,  -- 生成默认内容
+""" + ",\n".join(f"    t.{column}" for column in TARGET_COLUMNS[4:])
+
+# 按 record_id 键集分页读取源数据：每次只取 record_id 大于检查点的一批，不会一次性读入全表
+SELECT_CHUNK_SQL = f"""
+SELECT
+    t.record_id,{SOURCE_COLUMNS_SQL}
+FROM table_generated_data t
+JOIN elderly e
+  ON t.name = e.name
+ AND t.birth_date = e.birth_date  -- 通过姓名+出生日期关联
+WHERE t.record_id > %s AND t.record_id <= %s
+ORDER BY t.record_id
+LIMIT %s
+"""
+
+INSERT_SQL = f"""
+INSERT INTO follow_ups ({", ".join(TARGET_COLUMNS)})
+VALUES ({", ".join(["%s"] * len(TARGET_COLUMNS))})
+"""
+
+# 告警表的写入列，与 alerts.alerts_for_follow_ups 返回的键一致；(随访, 规则) 已有告警时跳过
+ALERT_COLUMNS = ["follow_up_id", "elderly_id", "doctor_id", "rule", "metric", "value", "severity", "message", "status"]
+INSERT_ALERTS_SQL = f"""
+INSERT IGNORE INTO follow_up_alerts ({", ".join(ALERT_COLUMNS)})
+VALUES ({", ".join(["%s"] * len(ALERT_COLUMNS))})
+"""
+
+CHECKPOINT_JOB = "table_generated_data->follow_ups"
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def create_checkpoint_table():
+    """创建迁移检查点表：每个分区记录已迁移到的 record_id，重跑时从这里继续"""
     connection = get_db_connection()
     if not connection:
         return
     cursor = connection.cursor()
     try:
-        cursor.execute("DROP TABLE IF EXISTS follow_ups")
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS etl_checkpoint (
+            job VARCHAR(100) NOT NULL COMMENT '迁移任务名',
+            range_start BIGINT NOT NULL COMMENT '分区起点(不含)',
+            range_end BIGINT NOT NULL COMMENT '分区终点(含)',
+            last_source_id BIGINT NOT NULL COMMENT '已迁移到的 record_id',
+            rows_migrated BIGINT NOT NULL DEFAULT 0 COMMENT '已迁移行数',
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            PRIMARY KEY (job, range_start)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+        """)
         connection.commit()
-        print("follow_ups 表已删除")
     except Error as e:
-        print(f"删除 follow_ups 表失败: {e}")
+        print(f"创建 etl_checkpoint 表失败: {e}")
     finally:
         cursor.close()
         connection.close()
 
-def create_follow_ups_table():
-    """创建新的 follow_ups 表"""
+
+def reset_checkpoints():
+    """清空本任务的检查点（配合重建 follow_ups 表使用）"""
     connection = get_db_connection()
     if not connection:
         return
     cursor = connection.cursor()
     try:
-        create_table_sql = """
-        CREATE TABLE follow_ups (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            elderly_id INT NOT NULL COMMENT '老人ID',
-            doctor_id INT NOT NULL DEFAULT 1 COMMENT '默认医生ID=1',
-            followup_date DATETIME NOT NULL COMMENT '随访日期',
-            content TEXT COMMENT '随访内容',
-            height DECIMAL(6,2) COMMENT '身高',
-            weight DECIMAL(6,2) COMMENT '体重',
-            bmi DECIMAL(6,2) COMMENT 'bmi指数',
-            waist_circumference DECIMAL(6,2) COMMENT '腰围',
-            hip_circumference DECIMAL(6,2) COMMENT '臀围',
-            waist_hip_ratio DECIMAL(6,2) COMMENT '腰臀比',
-            systolic_blood_pressure INT COMMENT '收缩压(血压)',
-            diastolic_blood_pressure INT COMMENT '舒张压(血压)',
-            blood_oxygen INT COMMENT '血氧(%)',
-            blood_glucose DECIMAL(6,2) COMMENT '血糖(mmol/L)',
-            pulse_rate INT COMMENT '脉率',
-            fat DECIMAL(6,2) COMMENT '脂肪',
-            cholesterol DECIMAL(6,2) COMMENT '胆固醇',
-            fvc DECIMAL(6,2) COMMENT '用力肺活量(L)(肺功能)',
-            uric_acid INT COMMENT '尿酸',
-            bone_density DECIMAL(6,2) COMMENT '骨密度',
-            total_sleep_time DECIMAL(6,2) COMMENT '睡眠总时长',
-            heart_rate INT COMMENT '心率',
-            ecg VARCHAR(10) COMMENT '心电',
-            water_content DECIMAL(6,2) COMMENT '水分含量',
-            bmr INT COMMENT '基础代谢率',
-            temperature DECIMAL(6,2) COMMENT '体温',
-            hemoglobin DECIMAL(6,2) COMMENT '血红蛋白',
-            total_cholesterol DECIMAL(6,2) COMMENT '总胆固醇(血脂)',
-            triglycerides DECIMAL(6,2) COMMENT '甘油三酯(血脂)',
-            hdl_cholesterol DECIMAL(6,2) COMMENT '高密度脂蛋白胆固醇(血脂)',
-            ldl_cholesterol DECIMAL(6,2) COMMENT '低密度脂蛋白胆固醇(血脂)',
-            urine_wbc DECIMAL(6,2) COMMENT '白细胞(尿常规)',
-            urine_nitrite DECIMAL(6,2) COMMENT '亚硝酸盐(尿常规)',
-            urine_urobilinogen DECIMAL(6,2) COMMENT '尿胆原(尿常规)',
-            urine_protein DECIMAL(6,2) COMMENT '蛋白质(尿常规)',
-            urine_ph DECIMAL(6,2) COMMENT 'PH值(尿常规)',
-            urine_blood DECIMAL(6,2) COMMENT '潜血(尿常规)',
-            urine_specific_gravity DECIMAL(6,2) COMMENT '比重(尿常规)',
-            urine_ketone DECIMAL(6,2) COMMENT '酮体(尿常规)',
-            urine_bilirubin DECIMAL(6,2) COMMENT '胆红素(尿常规)',
-            urine_glucose DECIMAL(6,2) COMMENT '葡萄糖(尿常规)',
-            urine_vitamin_c DECIMAL(6,2) COMMENT '维生素C(尿常规)',
-            respiration INT COMMENT '呼吸',
-            schedule_strategy VARCHAR(50) DEFAULT 'automated' COMMENT '随访策略',
-            is_recurring BOOLEAN DEFAULT FALSE COMMENT '是否定期随访',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-            FOREIGN KEY (elderly_id) REFERENCES elderly(id) ON DELETE CASCADE,
-            FOREIGN KEY (doctor_id) REFERENCES doctors(id)
-        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-        """
-        cursor.execute(create_table_sql)
+        cursor.execute("DELETE FROM etl_checkpoint WHERE job = %s", (CHECKPOINT_JOB,))
         connection.commit()
-        print("follow_ups 表创建成功！")
-    except Error as e:
-        print(f"创建 follow_ups 表失败: {e}")
     finally:
         cursor.close()
         connection.close()
 
-def migrate_data_to_follow_ups():
-    """迁移数据，增加详细调试输出"""
+
+def plan_partitions(workers: int):
+    """
+    返回分区列表 [(range_start, range_end, last_source_id, rows_migrated)]
+    已有检查点时沿用上次的分区划分；否则按源表 record_id 范围均分为 workers 段
+    """
     connection = get_db_connection()
     if not connection:
-        return
+        return []
     cursor = connection.cursor()
     try:
-        # 1. 先检查 table_generated_data 和 elderly 表是否有数据
-        cursor.execute("SELECT COUNT(*) FROM table_generated_data")
-        t_count = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM elderly")
-        e_count = cursor.fetchone()[0]
-        print(f"调试：table_generated_data 有 {t_count} 条数据，elderly 表有 {e_count} 条数据")
-        if t_count == 0 or e_count == 0:
-            print("错误：源表或目标关联表无数据，无法迁移")
-            return
-
-        # 2. 调整查询：使用实际存在的字段（关键修复）
-        # 假设 table_generated_data 中无 followup_date 和 content，用当前时间和默认内容替代
-        select_query = """
-        SELECT 
-            e.id AS elderly_id,
-            1 AS doctor_id,  -- 强制关联医生ID=1
-            NOW() AS followup_date,  -- 用当前时间作为随访日期
-            CONCAT('自动导入的健康记录：', t.record_id) AS content,  -- 生成默认内容
-            t.height,
-            t.weight,
-            t.bmi,
-            t.waist_circumference,
-            t.hip_circumference,
-            t.waist_hip_ratio,
-            t.systolic_blood_pressure,
-            t.diastolic_blood_pressure,
-            t.blood_oxygen,
-            t.blood_glucose,
-            t.pulse_rate,
-            t.fat,
-            t.cholesterol,
-            t.fvc,
-            t.uric_acid,
-            t.bone_density,
-            t.total_sleep_time,
-            t.heart_rate,
-            t.ecg,
-            t.water_content,
-            t.bmr,
-            t.temperature,
-            t.hemoglobin,
-            t.total_cholesterol,
-            t.triglycerides,
-            t.hdl_cholesterol,
-            t.ldl_cholesterol,
-            t.urine_wbc,
-            t.urine_nitrite,
-            t.urine_urobilinogen,
-            t.urine_protein,
-            t.urine_ph,
-            t.urine_blood,
-            t.urine_specific_gravity,
-            t.urine_ketone,
-            t.urine_bilirubin,
-            t.urine_glucose,
-            t.urine_vitamin_c,
-            t.respiration
-        FROM table_generated_data t
-        JOIN elderly e 
-          ON t.name = e.name 
-         AND t.birth_date = e.birth_date  -- 通过姓名+出生日期关联
-        """
-        print("调试：执行查询语句：", select_query)
-        cursor.execute(select_query)
-        rows = cursor.fetchall()
-
-        # 3. 检查查询结果
-        if not rows:
-            print("警告：查询未返回任何匹配数据，可能关联条件不匹配")
-            # 打印样本数据辅助排查
-            cursor.execute("SELECT name, birth_date FROM table_generated_data LIMIT 5")
-            print("调试：table_generated_data 前5条样本：", cursor.fetchall())
-            cursor.execute("SELECT name, birth_date FROM elderly LIMIT 5")
-            print("调试：elderly 表前5条样本：", cursor.fetchall())
-            return
-
-        # 4. 插入数据
-        insert_query = """
-        INSERT INTO follow_ups (
-            elderly_id, doctor_id, followup_date, content,
-            height, weight, bmi, waist_circumference, hip_circumference, waist_hip_ratio,
-            systolic_blood_pressure, diastolic_blood_pressure, blood_oxygen, blood_glucose,
-            pulse_rate, fat, cholesterol, fvc, uric_acid, bone_density, total_sleep_time,
-            heart_rate, ecg, water_content, bmr, temperature, hemoglobin,
-            total_cholesterol, triglycerides, hdl_cholesterol, ldl_cholesterol,
-            urine_wbc, urine_nitrite, urine_urobilinogen, urine_protein, urine_ph,
-            urine_blood, urine_specific_gravity, urine_ketone, urine_bilirubin,
-            urine_glucose, urine_vitamin_c, respiration
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                  %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                  %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                  %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        cursor.executemany(insert_query, rows)
+        cursor.execute(
+            "SELECT range_start, range_end, last_source_id, rows_migrated FROM etl_checkpoint "
+            "WHERE job = %s ORDER BY range_start",
+            (CHECKPOINT_JOB,)
+        )
+        partitions = cursor.fetchall()
+        if partitions:
+            print(f"发现 {len(partitions)} 个分区的检查点，从上次进度继续")
+            return partitions
+
+        cursor.execute("SELECT MIN(record_id), MAX(record_id), COUNT(*) FROM table_generated_data")
+        min_id, max_id, total = cursor.fetchone()
+        if not total:
+            print("错误：源表无数据，无法迁移")
+            return []
+
+        start = min_id - 1
+        step = max((max_id - start + workers - 1) // workers, 1)
+        partitions = []
+        while start < max_id:
+            end = min(start + step, max_id)
+            partitions.append((start, end, start, 0))
+            start = end
+        cursor.executemany(
+            "INSERT INTO etl_checkpoint (job, range_start, range_end, last_source_id, rows_migrated) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            [(CHECKPOINT_JOB,) + partition for partition in partitions]
+        )
         connection.commit()
-        print(f"成功迁移 {cursor.rowcount} 条记录到 follow_ups 表")
+        print(f"源表共 {total} 条数据，record_id {min_id}~{max_id}，划分为 {len(partitions)} 个分区")
+        return partitions
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def write_chunk_alerts(cursor, before_id):
+    """
+    为本批插入的随访（id > before_id）求值体征告警规则并写入，不提交，与随访数据、检查点在同一事务中提交
+    可重复读隔离级别下只会读到本事务插入的行；读到其他分区已提交的行时告警由唯一索引去重
+    """
+    metrics = get_rule_set().metrics
+    if not metrics:
+        return 0
+    cursor.execute(
+        f"SELECT id, elderly_id, doctor_id, {', '.join(metrics)} FROM follow_ups WHERE id > %s",
+        (before_id,)
+    )
+    names = [description[0] for description in cursor.description]
+    alert_rows = alerts_for_follow_ups(dict(zip(names, values)) for values in cursor.fetchall())
+    if alert_rows:
+        cursor.executemany(INSERT_ALERTS_SQL, [[row[column] for column in ALERT_COLUMNS] for row in alert_rows])
+    return len(alert_rows)
+
 
+def migrate_partition(range_start, range_end, last_source_id, rows_migrated, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    迁移一个 record_id 分区 (range_start, range_end]
+    每批读取 chunk_size 行，插入数据、生成告警与推进检查点在同一事务中提交，失败后重跑不会重复也不会遗漏
+    """
+    connection = get_db_connection()
+    if not connection:
+        return 0
+    read_cursor = connection.cursor()
+    write_cursor = connection.cursor()
+    migrated = 0
+    alerts_created = 0
+    started = time.perf_counter()
+    try:
+        while last_source_id < range_end:
+            read_cursor.execute(SELECT_CHUNK_SQL, (last_source_id, range_end, chunk_size))
+            rows = read_cursor.fetchall()
+            if not rows:
+                break
+            write_cursor.execute("SELECT COALESCE(MAX(id), 0) FROM follow_ups")
+            before_id = write_cursor.fetchone()[0]
+            write_cursor.executemany(INSERT_SQL, [row[1:] for row in rows])
+            alerts_created += write_chunk_alerts(write_cursor, before_id)
+            last_source_id = rows[-1][0]
+            rows_migrated += len(rows)
+            write_cursor.execute(
+                "UPDATE etl_checkpoint SET last_source_id = %s, rows_migrated = %s "
+                "WHERE job = %s AND range_start = %s",
+                (last_source_id, rows_migrated, CHECKPOINT_JOB, range_start)
+            )
+            connection.commit()
+            migrated += len(rows)
+            elapsed = time.perf_counter() - started
+            print(f"分区 ({range_start}, {range_end}]: 已迁移到 record_id {last_source_id}，"
+                  f"本次 {migrated} 条，生成告警 {alerts_created} 条，{migrated / elapsed:.0f} 行/秒")
+            if len(rows) < chunk_size:
+                break
+        # 分区内剩余的源数据都没有匹配的老人，直接标记完成
+        write_cursor.execute(
+            "UPDATE etl_checkpoint SET last_source_id = %s WHERE job = %s AND range_start = %s",
+            (range_end, CHECKPOINT_JOB, range_start)
+        )
+        connection.commit()
     except Error as e:
-        print(f"数据迁移失败: {e}")
+        print(f"分区 ({range_start}, {range_end}] 迁移失败，已提交的批次保留，重跑将从 record_id {last_source_id} 继续: {e}")
         connection.rollback()
+        raise
     finally:
-        cursor.close()
+        read_cursor.close()
+        write_cursor.close()
         connection.close()
+    return migrated
+
+
+def migrate_data_to_follow_ups(chunk_size=DEFAULT_CHUNK_SIZE, workers=1):
+    """分批、可续跑地迁移数据；workers > 1 时按 record_id 范围分区并行"""
+    create_checkpoint_table()
+    partitions = [p for p in plan_partitions(workers) if p[2] < p[1]]
+    if not partitions:
+        print("没有待迁移的数据")
+        return
+
+    started = time.perf_counter()
+    migrated = 0
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        futures = [executor.submit(migrate_partition, *partition, chunk_size=chunk_size) for partition in partitions]
+        for future in as_completed(futures):
+            try:
+                migrated += future.result()
+            except Error:
+                failed += 1
+
+    elapsed = time.perf_counter() - started
+    print(f"成功迁移 {migrated} 条记录到 follow_ups 表，耗时 {elapsed:.1f} 秒，"
+          f"平均 {migrated / elapsed if elapsed else 0:.0f} 行/秒")
+    if failed:
+        print(f"{failed} 个分区迁移失败，重新运行本脚本即可从检查点继续")
+    else:
+        print("迁移完成后请运行 python -m app.latest_follow_ups 重建最近随访汇总表")
+
 
 if __name__ == "__main__":
-    drop_follow_ups_table()
+    # 在项目根目录运行: python -m app.jianbiao [--reset] [--workers N]
+    parser = argparse.ArgumentParser(description="table_generated_data -> follow_ups 数据迁移")
+    parser.add_argument("--reset", action="store_true", help="删除并重建 follow_ups 表，从头迁移")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="每批迁移的行数")
+    parser.add_argument("--workers", type=int, default=1, help="并行迁移的分区数")
+    args = parser.parse_args()
+
+    if args.reset:
+        # 删表失败时不能继续清空检查点，否则会把全部源数据再迁移一遍到旧表中
+        try:
+            drop_follow_ups_table()
+        except Exception as e:
+            print(f"删除 follow_ups 表失败，已中止 --reset: {e}")
+            sys.exit(1)
+        create_checkpoint_table()
+        reset_checkpoints()
     create_follow_ups_table()
-    migrate_data_to_follow_ups()
\ No newline at end of file
+    migrate_data_to_follow_ups(chunk_size=args.chunk_size, workers=args.workers)
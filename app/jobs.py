@@ -0,0 +1,344 @@
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+
+from . import models
+from .database import create_configured_engine
+from .settings import get_settings
+from .crud import schedule_follow_up_automation, schedule_recurring_follow_ups
+
+# 后台任务队列
+# 任务持久化在 jobs 表中，由独立的工作进程轮询领取执行，不占用处理请求的进程，也不依赖请求的数据库会话。
+# 领取：先查出候选任务，再用 UPDATE ... WHERE status='queued' 抢占，影响行数为 1 才算领到（SQLite/MySQL 通用）。
+# 执行中的任务持有租约（locked_until），心跳线程定期续约；工作进程退出后租约过期，任务会被重新排队。
+# 去重：带 dedup_key 的任务在排队/执行期间占用 active_key 唯一索引，重复提交返回已有任务。
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+JOB_FOLLOW_UP_SCHEDULING = "follow_up_scheduling"
+JOB_RECURRING_FOLLOW_UPS = "recurring_follow_ups"
+
+DEFAULT_MAX_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 30  # 第 n 次失败后等待 30 * 2^(n-1) 秒再重试
+JOB_LEASE_SECONDS = 120
+HEARTBEAT_SECONDS = 30
+POLL_INTERVAL_SECONDS = 2.0
+CLAIM_CANDIDATES = 5  # 每次领取时尝试抢占的候选任务数
+JOB_WORKERS_ENV = "JOB_WORKERS"  # Web 进程启动时拉起的工作进程数，0 表示由 python -m app.jobs 单独运行
+
+JobHandler = Callable[[Session, dict, "JobContext"], Optional[dict]]
+JOB_HANDLERS: Dict[str, JobHandler] = {}
+
+
+def job_handler(kind: str):
+    """注册任务类型的处理函数：handler(db, payload, context) -> 结果字典"""
+    def register(func: JobHandler) -> JobHandler:
+        JOB_HANDLERS[kind] = func
+        return func
+    return register
+
+
+@job_handler(JOB_FOLLOW_UP_SCHEDULING)
+def run_follow_up_scheduling(db: Session, payload: dict, context: "JobContext") -> dict:
+    def progress(done: int, total: int):
+        context.progress(done * 100 // total if total else 100, f"已生成 {done}/{total} 条随访计划")
+
+    return schedule_follow_up_automation(db, progress=progress, raise_errors=True, **payload)
+
+
+@job_handler(JOB_RECURRING_FOLLOW_UPS)
+def run_recurring_follow_ups(db: Session, payload: dict, context: "JobContext") -> dict:
+    return schedule_recurring_follow_ups(db, raise_errors=True, **payload)
+
+
+class JobContext:
+    """传给处理函数：上报进度（使用独立会话，处理函数的事务提交前也能查询到）"""
+
+    def __init__(self, session_factory: sessionmaker, job_id: int, worker_id: str):
+        self.session_factory = session_factory
+        self.job_id = job_id
+        self.worker_id = worker_id
+
+    def progress(self, percent: int, message: str = None):
+        with self.session_factory() as db:
+            db.execute(
+                update(models.Job)
+                .where(models.Job.id == self.job_id, models.Job.locked_by == self.worker_id)
+                .values(progress=max(0, min(100, percent)), progress_message=message,
+                        locked_until=datetime.now() + timedelta(seconds=JOB_LEASE_SECONDS))
+            )
+            db.commit()
+
+
+def enqueue_job(db: Session, kind: str, payload: dict = None, dedup_key: str = None,
+                max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> Tuple[models.Job, bool]:
+    """
+    提交任务，返回 (任务, 是否新建)
+    同一 dedup_key 已有排队中/执行中的任务时不再新建，直接返回该任务
+    """
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"未知的任务类型: {kind}")
+    for _ in range(3):
+        job = models.Job(
+            kind=kind,
+            status=JOB_QUEUED,
+            dedup_key=dedup_key,
+            active_key=dedup_key,
+            payload=json.dumps(payload or {}, ensure_ascii=False),
+            max_attempts=max_attempts,
+            run_after=datetime.now(),
+        )
+        db.add(job)
+        try:
+            db.commit()
+            db.refresh(job)
+            return job, True
+        except IntegrityError:
+            db.rollback()
+        existing = db.query(models.Job).filter(models.Job.active_key == dedup_key).first()
+        if existing is not None:
+            return existing, False
+        # 已有任务恰好在此期间结束，重新提交
+    raise RuntimeError(f"提交任务失败: {kind} ({dedup_key})")
+
+
+def _requeue_expired(db: Session, now: datetime):
+    """租约过期的执行中任务：还有重试次数的重新排队，否则标记失败"""
+    expired = (models.Job.status == JOB_RUNNING, models.Job.locked_until < now)
+    db.execute(
+        update(models.Job)
+        .where(*expired, models.Job.attempts >= models.Job.max_attempts)
+        .values(status=JOB_FAILED, active_key=None, locked_by=None, locked_until=None,
+                error="工作进程租约过期", finished_at=now)
+    )
+    db.execute(
+        update(models.Job)
+        .where(*expired)
+        .values(status=JOB_QUEUED, locked_by=None, locked_until=None, run_after=now)
+    )
+    db.commit()
+
+
+def claim_next_job(db: Session, worker_id: str, now: datetime = None) -> Optional[models.Job]:
+    """领取一个到期的排队任务，没有时返回 None"""
+    now = now or datetime.now()
+    _requeue_expired(db, now)
+    candidates = db.execute(
+        select(models.Job.id)
+        .where(models.Job.status == JOB_QUEUED, models.Job.run_after <= now)
+        .order_by(models.Job.run_after, models.Job.id)
+        .limit(CLAIM_CANDIDATES)
+    ).scalars().all()
+    for job_id in candidates:
+        claimed = db.execute(
+            update(models.Job)
+            .where(models.Job.id == job_id, models.Job.status == JOB_QUEUED)
+            .values(status=JOB_RUNNING, locked_by=worker_id, attempts=models.Job.attempts + 1,
+                    locked_until=now + timedelta(seconds=JOB_LEASE_SECONDS), started_at=now,
+                    progress=0, progress_message=None)
+        ).rowcount
+        db.commit()
+        if claimed == 1:
+            return db.get(models.Job, job_id)
+    return None
+
+
+def _finish_job(db: Session, job: models.Job, worker_id: str, result: dict = None, error: str = None):
+    """记录执行结果；失败且还有重试次数时按退避时间重新排队。租约已被其他进程接管时不覆盖"""
+    now = datetime.now()
+    if error is None:
+        values = dict(status=JOB_SUCCEEDED, progress=100, finished_at=now, active_key=None,
+                      result=json.dumps(result, ensure_ascii=False, default=str) if result is not None else None)
+    elif job.attempts < job.max_attempts:
+        delay = RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1)
+        values = dict(status=JOB_QUEUED, error=error, run_after=now + timedelta(seconds=delay))
+    else:
+        values = dict(status=JOB_FAILED, error=error, finished_at=now, active_key=None)
+    db.execute(
+        update(models.Job)
+        .where(models.Job.id == job.id, models.Job.locked_by == worker_id)
+        .values(locked_by=None, locked_until=None, **values)
+    )
+    db.commit()
+
+
+def _heartbeat(session_factory: sessionmaker, job_id: int, worker_id: str, stop: threading.Event):
+    """任务执行期间定期续约，避免长任务被当作工作进程退出"""
+    while not stop.wait(HEARTBEAT_SECONDS):
+        try:
+            with session_factory() as db:
+                db.execute(
+                    update(models.Job)
+                    .where(models.Job.id == job_id, models.Job.locked_by == worker_id)
+                    .values(locked_until=datetime.now() + timedelta(seconds=JOB_LEASE_SECONDS))
+                )
+                db.commit()
+        except Exception as e:
+            logger.error(f"任务 {job_id} 续约失败: {str(e)}")
+
+
+def run_job(session_factory: sessionmaker, job: models.Job, worker_id: str):
+    """执行已领取的任务"""
+    handler = JOB_HANDLERS.get(job.kind)
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(session_factory, job.id, worker_id, stop), daemon=True)
+    heartbeat.start()
+    result = error = None
+    try:
+        if handler is None:
+            raise ValueError(f"未知的任务类型: {job.kind}")
+        with session_factory() as db:
+            result = handler(db, json.loads(job.payload or "{}"), JobContext(session_factory, job.id, worker_id))
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        logger.error(f"任务 {job.id}（{job.kind}）第 {job.attempts} 次执行失败: {error}")
+    finally:
+        stop.set()
+        heartbeat.join()
+    with session_factory() as db:
+        _finish_job(db, job, worker_id, result=result, error=error)
+
+
+def run_worker(url: str, stop_event=None, poll_interval: float = POLL_INTERVAL_SECONDS, once: bool = False):
+    """工作进程主循环：领取并执行任务，队列为空时等待 poll_interval 秒；once=True 时执行完当前队列即返回"""
+    # 工作进程串行执行任务，只需少量连接（任务会话 + 心跳/进度会话）
+    engine = create_configured_engine(url, name="jobs", pool_size=2, max_overflow=2)
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+    stop_event = stop_event or threading.Event()
+    logger.info(f"任务工作进程启动: {worker_id}")
+    try:
+        while not stop_event.is_set():
+            try:
+                with session_factory() as db:
+                    job = claim_next_job(db, worker_id)
+                    if job is not None:
+                        db.expunge(job)
+            except Exception as e:
+                logger.error(f"领取任务失败: {str(e)}")
+                job = None
+            if job is not None:
+                run_job(session_factory, job, worker_id)
+            elif once:
+                break
+            else:
+                stop_event.wait(poll_interval)
+    finally:
+        engine.dispose()
+        logger.info(f"任务工作进程退出: {worker_id}")
+
+
+def _worker_main(url: str, stop_event, poll_interval: float):
+    logging.basicConfig(level=get_settings().log_level)
+    run_worker(url, stop_event, poll_interval)
+
+
+class WorkerPool:
+    """以独立进程（spawn）运行的工作进程池"""
+
+    def __init__(self, url: str, workers: int, poll_interval: float = POLL_INTERVAL_SECONDS):
+        self.url = url
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._context = multiprocessing.get_context("spawn")
+        self._stop = self._context.Event()
+        self._processes: List[multiprocessing.Process] = []
+
+    def start(self):
+        for index in range(self.workers):
+            process = self._context.Process(
+                target=_worker_main, args=(self.url, self._stop, self.poll_interval),
+                name=f"job-worker-{index}", daemon=True
+            )
+            process.start()
+            self._processes.append(process)
+        return self
+
+    def request_stop(self):
+        """通知工作进程在当前任务结束后退出"""
+        self._stop.set()
+
+    def join(self):
+        for process in self._processes:
+            process.join()
+
+    def stop(self, timeout: float = 30):
+        """请求退出并等待，超时仍未退出的强制结束（任务会在租约过期后重新排队）"""
+        self.request_stop()
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+
+
+def start_worker_pool(url: str, workers: int = None) -> Optional[WorkerPool]:
+    """Web 进程启动时调用，工作进程数取 JOB_WORKERS 环境变量（默认 1）"""
+    workers = int(os.getenv(JOB_WORKERS_ENV, "1")) if workers is None else workers
+    if workers <= 0:
+        return None
+    return WorkerPool(url, workers).start()
+
+
+def get_job(db: Session, job_id: int) -> models.Job:
+    job = db.query(models.Job).filter(models.Job.id == job_id).first()
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="任务不存在")
+    return job
+
+
+def list_jobs(db: Session, kind: str = None, job_status: str = None, page: int = 1, per_page: int = 20) -> dict:
+    """按ID倒序分页列出任务"""
+    query = db.query(models.Job)
+    if kind:
+        query = query.filter(models.Job.kind == kind)
+    if job_status:
+        query = query.filter(models.Job.status == job_status)
+    total = query.with_entities(func.count(models.Job.id)).scalar() or 0
+    items = query.order_by(models.Job.id.desc()).offset((page - 1) * per_page).limit(per_page).all()
+    return {
+        "items": items,
+        "total": total,
+        "page": page,
+        "per_page": per_page,
+        "total_pages": (total + per_page - 1) // per_page,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import signal
+
+    from .database import SQLALCHEMY_DATABASE_URL, Base
+
+    parser = argparse.ArgumentParser(description="后台任务工作进程")
+    parser.add_argument("--url", default=SQLALCHEMY_DATABASE_URL, help="数据库连接串")
+    parser.add_argument("--workers", type=int, default=2, help="工作进程数")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL_SECONDS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=get_settings().log_level)
+    Base.metadata.create_all(bind=create_configured_engine(args.url, name="jobs"), tables=[models.Job.__table__])
+    pool = WorkerPool(args.url, args.workers, args.poll_interval).start()
+    signal.signal(signal.SIGTERM, lambda *_: pool.request_stop())
+    try:
+        pool.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.stop()
@@ -0,0 +1,142 @@
+import logging
+from typing import Iterable
+
+from sqlalchemy import and_, delete, exists, func, insert, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from . import models
+
+# 每位老人最近一次随访的汇总表（elderly_latest_follow_ups）
+# 自动排期的 30 天规则、老人列表和逾期列表都需要“每位老人最近一次随访”，
+# 原来要么逐个老人 order_by(desc).first()，要么对随访全表 GROUP BY。
+# 这里在随访新增/修改/删除的同一事务中重算受影响老人的汇总行，查询时只需按主键/索引读取。
+# 最近一次的定义与原来的 max(followup_date) 一致，同一时间有多条时取ID最大的一条。
+
+logger = logging.getLogger(__name__)
+
+REBUILD_CHUNK_SIZE = 1000  # 重建时每批处理的老人数
+
+# 汇总表列 -> 随访表列
+SUMMARY_COLUMNS = {
+    "elderly_id": "elderly_id",
+    "last_followup_id": "id",
+    "last_followup_date": "followup_date",
+    "next_follow_up_date": "next_follow_up_date",
+    "doctor_id": "doctor_id",
+    "systolic_blood_pressure": "systolic_blood_pressure",
+    "diastolic_blood_pressure": "diastolic_blood_pressure",
+    "heart_rate": "heart_rate",
+    "blood_glucose": "blood_glucose",
+    "bmi": "bmi",
+    "weight": "weight",
+}
+
+
+def _latest_rows(elderly_ids):
+    """指定老人的最近一次随访（select 语句，列顺序与 SUMMARY_COLUMNS 一致）"""
+    follow_ups = models.FollowUp.__table__
+    last_date = select(
+        follow_ups.c.elderly_id,
+        func.max(follow_ups.c.followup_date).label("last_date")
+    ).where(follow_ups.c.elderly_id.in_(elderly_ids)) \
+        .group_by(follow_ups.c.elderly_id).subquery()
+    latest_id = select(func.max(follow_ups.c.id)).select_from(follow_ups) \
+        .join(last_date, and_(
+            follow_ups.c.elderly_id == last_date.c.elderly_id,
+            follow_ups.c.followup_date == last_date.c.last_date
+        )).group_by(follow_ups.c.elderly_id)
+    return select(*[follow_ups.c[column] for column in SUMMARY_COLUMNS.values()]) \
+        .where(follow_ups.c.id.in_(latest_id))
+
+
+def _upsert_from_select(db: Session, elderly_ids):
+    """INSERT ... SELECT 最近一次随访，汇总行已存在时就地更新"""
+    summary = models.ElderlyLatestFollowUp.__table__
+    columns = list(SUMMARY_COLUMNS)
+    updated = [column for column in columns if column != "elderly_id"]
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        stmt = mysql_insert(summary).from_select(columns, _latest_rows(elderly_ids))
+        stmt = stmt.on_duplicate_key_update({column: stmt.inserted[column] for column in updated})
+    elif dialect in ("sqlite", "postgresql"):
+        upsert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+        stmt = upsert(summary).from_select(columns, _latest_rows(elderly_ids))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[summary.c.elderly_id],
+            set_={column: stmt.excluded[column] for column in updated}
+        )
+    else:
+        db.execute(delete(summary).where(summary.c.elderly_id.in_(elderly_ids)))
+        stmt = insert(summary).from_select(columns, _latest_rows(elderly_ids))
+    db.execute(stmt)
+
+
+def refresh_latest(db: Session, elderly_ids: Iterable[int], may_remove: bool = False):
+    """
+    重算指定老人的汇总行，不提交事务，由调用方与随访数据一起提交
+    用一条 upsert（INSERT ... SELECT ... ON DUPLICATE KEY UPDATE / ON CONFLICT）写入：
+    原来的先删除再插入在汇总行尚不存在时会对不存在的主键加间隙锁，InnoDB 可重复读下相邻老人的并发首次随访互相等待
+    对方的间隙锁而死锁；upsert 对已存在的行只加记录锁，同一老人的并发写入仍在汇总行上串行。
+    may_remove=True（删除随访、随访改到其他老人名下）时删除已没有任何随访的老人的汇总行
+    """
+    elderly_ids = sorted({elderly_id for elderly_id in elderly_ids if elderly_id is not None})
+    if not elderly_ids:
+        return
+    db.flush()
+    _upsert_from_select(db, elderly_ids)
+    if may_remove:
+        summary = models.ElderlyLatestFollowUp.__table__
+        follow_ups = models.FollowUp.__table__
+        db.execute(delete(summary).where(
+            summary.c.elderly_id.in_(elderly_ids),
+            ~exists().where(follow_ups.c.elderly_id == summary.c.elderly_id)
+        ))
+
+
+def remove_latest(db: Session, elderly_id: int):
+    """删除老人时调用"""
+    summary = models.ElderlyLatestFollowUp.__table__
+    db.execute(delete(summary).where(summary.c.elderly_id == elderly_id))
+
+
+def rebuild_latest_follow_ups(db: Session, chunk_size: int = REBUILD_CHUNK_SIZE) -> int:
+    """按老人ID分批全量重建汇总表，每批一个事务，返回汇总行数"""
+    db.execute(delete(models.ElderlyLatestFollowUp.__table__))
+    db.commit()
+    last_id = 0
+    while True:
+        elderly_ids = [
+            row[0] for row in db.execute(
+                select(models.Elderly.id).where(models.Elderly.id > last_id)
+                .order_by(models.Elderly.id).limit(chunk_size)
+            )
+        ]
+        if not elderly_ids:
+            break
+        refresh_latest(db, elderly_ids)
+        db.commit()
+        last_id = elderly_ids[-1]
+    total = db.query(func.count(models.ElderlyLatestFollowUp.elderly_id)).scalar()
+    logger.info(f"最近随访汇总表重建完成，共 {total} 位老人")
+    return total
+
+
+def ensure_latest_follow_ups(db: Session):
+    """启动时检查：汇总表为空而已有随访记录时（首次部署）全量构建，避免自动排期把所有老人当作从未随访"""
+    if db.execute(select(models.ElderlyLatestFollowUp.elderly_id).limit(1)).first() is not None:
+        return
+    if db.execute(select(models.FollowUp.id).limit(1)).first() is not None:
+        logger.info("最近随访汇总表为空，开始全量构建")
+        rebuild_latest_follow_ups(db)
+
+
+if __name__ == "__main__":
+    from .database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine, tables=[models.ElderlyLatestFollowUp.__table__])
+    with SessionLocal() as session:
+        count = rebuild_latest_follow_ups(session)
+        print(f"最近随访汇总表重建完成，共 {count} 位老人")
@@ -1,7 +1,7 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, BackgroundTasks
 
-from app import models
+from app import models, alerts, crud, jobs, latest_follow_ups, scheduler, schema_upgrade, search_index, suggest
 from app.routers.follow_up import trigger_follow_up_scheduling
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy import inspect
@@ -9,13 +9,12 @@ import os
 from pathlib import Path
 from app.crud import schedule_follow_up_automation
 from fastapi.middleware.cors import CORSMiddleware
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 
-from app.database import Base, engine, SessionLocal
-from app.routers import follow_up
+from app.database import Base, engine, SessionLocal, SQLALCHEMY_DATABASE_URL, POOL_METRICS, pool_status, settings
+from app.routers import analytics, follow_up, jobs as jobs_router
+from app.http_cache import HTTPCacheMiddleware, get_http_cache
 import logging
 
 from app.routers.follow_up import get_db
@@ -36,9 +35,8 @@ import os
 project_root = Path(__file__).parent.parent
 os.chdir(project_root)
 print(f"当前工作目录: {os.getcwd()}")
-# 启用SQLAlchemy调试日志
-logging.basicConfig()
-logging.getLogger('sqlalchemy.engine').setLevel(logging.INFO)
+# 日志级别由配置决定；SQL 只记录慢查询（DB_SLOW_QUERY_MS），需要全部 SQL 时设置 DB_ECHO=1
+logging.basicConfig(level=settings.log_level)
 
 # 显示所有SQL查询和参数
 app = FastAPI()
@@ -52,58 +50,31 @@ os.makedirs(static_dir, exist_ok=True)
 # 在 lifespan 中初始化调度器
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # 初始化数据库
-    with engine.connect() as connection:
-        inspector = inspect(connection)
-        if not inspector.has_table("elderly"):
-            Base.metadata.create_all(bind=engine)
-
-    # 初始化 APScheduler
-    scheduler = AsyncIOScheduler()
-    scheduler.start()
-
-    # 添加测试任务（每分钟执行一次）
-    scheduler.add_job(
-        test_scheduled_task,
-        CronTrigger(second="*/10"),  # 每10秒触发一次（测试用）
-        id="test_task"
-    )
-
-    # 添加随访排期任务（每天上午9点执行）
-    scheduler.add_job(
-        schedule_follow_ups,
-        CronTrigger(hour=9, minute=0),  # 每天9:00 AM
-        id="follow_up_scheduler"
-    )
+    # 初始化数据库（create_all 只创建缺失的表，已有表不受影响）
+    Base.metadata.create_all(bind=engine)
+    # 已有表补充新增的列和索引（create_all 不修改已存在的表）
+    schema_upgrade.upgrade_schema(engine)
+    # 编译体征告警规则（配置有误时启动失败）
+    alerts.configure_rules()
+    # 首次部署时为已有的老人/医生构建姓名搜索索引
+    with SessionLocal() as db:
+        search_index.ensure_search_index(db)
+        suggest.build_suggest_indexes(db)
+        latest_follow_ups.ensure_latest_follow_ups(db)
 
-    yield
+    # 后台任务工作进程（JOB_WORKERS=0 时由 python -m app.jobs 单独运行）
+    worker_pool = jobs.start_worker_pool(SQLALCHEMY_DATABASE_URL)
 
-    # 关闭时清理调度器
-    scheduler.shutdown()
+    # 定时任务调度：多个进程中只有抢到调度锁的主节点运行调度器（每天9:00 提交定期随访排期任务）
+    cluster_scheduler = scheduler.start_cluster_scheduler(SQLALCHEMY_DATABASE_URL)
 
-# 测试任务
-def test_scheduled_task():
-    print(f"定时任务测试: {datetime.now()}")
+    yield
 
-# 随访排期任务（需实现具体逻辑）
-def schedule_follow_ups():
-    with SessionLocal() as db:
-        # 只处理自动排期的随访
-        recurring_follows = db.query(models.FollowUp).filter(
-            models.FollowUp.is_recurring == True,
-            models.FollowUp.next_follow_up_date <= datetime.now()
-        ).all()
-
-        for follow in recurring_follows:
-            new_follow = models.FollowUp(
-                elderly_id=follow.elderly_id,
-                doctor_id=follow.doctor_id,
-                follow_up_date=follow.next_follow_up_date,
-                next_follow_up_date=follow.next_follow_up_date + timedelta(days=follow.schedule_interval),
-                # ...复制其他必要字段
-            )
-            db.add(new_follow)
-        db.commit()
+    # 关闭时清理调度器和工作进程
+    if cluster_scheduler is not None:
+        cluster_scheduler.stop()
+    if worker_pool is not None:
+        worker_pool.stop()
 
 app = FastAPI(
     title="老年人健康管理平台",
@@ -114,6 +85,8 @@ app = FastAPI(
     redoc_url="/redoc",
     openapi_url="/openapi.json"
 )
+# 读接口的 ETag / 响应缓存，须先于 CORS 添加（位于 CORS 内层），缓存的响应不含跨域头
+app.add_middleware(HTTPCacheMiddleware)
 # 添加 CORS 中间件
 app.add_middleware(
     CORSMiddleware,
@@ -132,6 +105,16 @@ app.include_router(
     prefix="/api/v1",
     tags=["随访管理"]
 )
+app.include_router(
+    analytics.router,
+    prefix="/api/v1",
+    tags=["统计分析"]
+)
+app.include_router(
+    jobs_router.router,
+    prefix="/api/v1",
+    tags=["后台任务"]
+)
 
 if __name__ == "__main__":
     import uvicorn
@@ -147,10 +130,33 @@ if __name__ == "__main__":
 @app.get("/debug/db_config")
 def debug_db_config(db: Session = Depends(get_db)):
     return {
-        "db_url": str(db.bind.url),  # 显示实际连接字符串
-        "pool_size": db.bind.pool.size()
+        "db_url": db.bind.url.render_as_string(hide_password=True),  # 显示实际连接字符串（隐藏密码）
+        "settings": settings.as_dict(),
+        "pool": pool_status(db.bind)
     }
 
+
+@app.get("/debug/db_pool")
+def debug_db_pool(reset: bool = False):
+    """连接池占用情况与取连接等待时间统计，reset=true 时返回后清零"""
+    result = {"pool": pool_status(engine), "checkout_wait": {name: m.snapshot() for name, m in POOL_METRICS.items()}}
+    if reset:
+        for metrics in POOL_METRICS.values():
+            metrics.reset()
+    return result
+
+
+@app.get("/debug/http_cache")
+def debug_http_cache(clear: bool = False):
+    """读接口缓存的命中统计，clear=true 时返回后清空缓存和统计"""
+    cache = get_http_cache()
+    if cache is None:
+        return {"enabled": False}
+    result = dict(cache.stats(), enabled=True)
+    if clear:
+        cache.clear()
+    return result
+
 @app.get("/migrate")
 def migrate_db():
     Base.metadata.drop_all(bind=engine)  # 删除旧表
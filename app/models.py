@@ -20,6 +20,8 @@ class Elderly(Base):
     education = Column(String(50))  # 添加教育程度字段
     occupation = Column(String(50))  # 添加职业字段
     follow_ups = relationship("FollowUp", back_populates="elderly")
+    # 最近一次随访汇总，只在显式 joinedload 时加载
+    latest_follow_up = relationship("ElderlyLatestFollowUp", uselist=False, lazy="raise", viewonly=True)
 
 class Doctor(Base):
     __tablename__ = "doctors"
@@ -37,15 +39,20 @@ class FollowUp(Base):
     __table_args__ = (
         Index('idx_followup_date', 'followup_date'),  # 按日期查询的索引
         Index('idx_elderly_doctor', 'elderly_id', 'doctor_id'),  # 联合索引
-        Index('idx_pagination', 'followup_date', 'id')  # 分页专用索引
+        Index('idx_elderly_followup_date', 'elderly_id', 'followup_date'),  # 单个老人的随访历史/指标趋势
+        Index('idx_pagination', 'followup_date', 'id'),  # 分页专用索引
+        Index('idx_recurring_next', 'is_recurring', 'next_follow_up_date'),  # 定期随访增量排期索引
+        Index('uq_recurrence_source', 'recurrence_source_id', unique=True)  # 每条定期随访只生成一次下一次随访
     )
 
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     elderly_id = Column(Integer, ForeignKey("elderly.id"))
     doctor_id = Column(Integer, ForeignKey("doctors.id"))
-    doctor = relationship("Doctor", back_populates="follow_ups", lazy="joined")
-    elderly = relationship("Elderly", back_populates="follow_ups", lazy="joined")
+    # 默认不加载关联对象（访问未加载的关联会报错），需要姓名等信息的查询须显式 joinedload/selectinload，
+    # 避免删除、更新、计数、排期扫描等查询都带上两个不需要的 LEFT OUTER JOIN
+    doctor = relationship("Doctor", back_populates="follow_ups", lazy="raise")
+    elderly = relationship("Elderly", back_populates="follow_ups", lazy="raise")
     followup_date = Column(DateTime(timezone=True), default=datetime.now)
     next_follow_up_date = Column(DateTime(timezone=True), nullable=True, comment="下次随访日期")
     content = Column(Text, nullable=True)
@@ -91,9 +98,124 @@ class FollowUp(Base):
     respiration = Column(Integer, nullable=True)
     schedule_strategy = Column(String(50), default='automated')
     is_recurring = Column(Boolean, default=False)
+    schedule_interval = Column(Integer, nullable=True, comment="定期随访间隔(天)")
+    recurrence_source_id = Column(Integer, nullable=True, comment="由哪条定期随访记录自动生成")
+    revision = Column(Integer, nullable=False, default=1, server_default="1", comment="修订号，每次更新加一")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     @hybrid_property
     def followup_date_utc(self):
         return self.followup_date.astimezone(timezone.utc) if self.followup_date else None
+
+
+class SchedulerState(Base):
+    """定时任务的持久化进度（高水位线），用于增量处理和中断后续跑"""
+    __tablename__ = "scheduler_state"
+
+    name = Column(String(50), primary_key=True)
+    watermark_date = Column(DateTime(timezone=True), nullable=True, comment="已处理到的 next_follow_up_date")
+    watermark_id = Column(Integer, nullable=True, comment="同一时间点已处理到的随访ID")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class TableVersion(Base):
+    """表版本号：crud 写操作在同一事务中递增，各进程据此判断缓存/内存索引是否过期"""
+    __tablename__ = "table_versions"
+
+    name = Column(String(50), primary_key=True, comment="表名")
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class NameSearchGram(Base):
+    """姓名 n-gram 倒排索引（单字 + 二元组），用于老人/医生的姓名模糊搜索"""
+    __tablename__ = "name_search_grams"
+
+    entity_type = Column(String(10), primary_key=True, comment="elderly / doctor")
+    gram = Column(String(8), primary_key=True, comment="姓名中的单字或相邻两字（小写）")
+    entity_id = Column(Integer, primary_key=True, comment="老人或医生ID")
+
+
+class ElderlyLatestFollowUp(Base):
+    """每位老人最近一次随访的汇总表，由 latest_follow_ups 模块在随访写入的同一事务中维护"""
+    __tablename__ = "elderly_latest_follow_ups"
+    __table_args__ = (
+        Index('idx_latest_followup_date', 'last_followup_date'),
+        Index('idx_latest_next_date', 'next_follow_up_date'),
+        Index('idx_latest_doctor_next', 'doctor_id', 'next_follow_up_date'),  # 医生随访待办列表
+    )
+
+    elderly_id = Column(Integer, ForeignKey("elderly.id"), primary_key=True)
+    last_followup_id = Column(Integer, nullable=False, comment="最近一次随访ID")
+    last_followup_date = Column(DateTime(timezone=True), nullable=True, comment="最近一次随访日期")
+    next_follow_up_date = Column(DateTime(timezone=True), nullable=True, comment="最近一次随访约定的下次随访日期")
+    doctor_id = Column(Integer, nullable=True)
+    # 最近一次的关键体征
+    systolic_blood_pressure = Column(Integer, nullable=True)
+    diastolic_blood_pressure = Column(Integer, nullable=True)
+    heart_rate = Column(Integer, nullable=True)
+    blood_glucose = Column(DECIMAL(6,2), nullable=True)
+    bmi = Column(DECIMAL(6,2), nullable=True)
+    weight = Column(DECIMAL(6,2), nullable=True)
+
+
+class FollowUpAlert(Base):
+    """随访体征异常告警，由 alerts 模块在随访写入时生成"""
+    __tablename__ = "follow_up_alerts"
+    __table_args__ = (
+        Index('idx_alert_doctor_status', 'doctor_id', 'status', 'id'),  # 医生的未处理告警
+        Index('uq_alert_follow_up_rule', 'follow_up_id', 'rule', unique=True),  # 每条随访每条规则最多一条告警
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    follow_up_id = Column(Integer, ForeignKey("follow_ups.id"), nullable=False)
+    elderly_id = Column(Integer, nullable=True)
+    doctor_id = Column(Integer, nullable=True)
+    rule = Column(String(50), nullable=False, comment="规则名称")
+    metric = Column(String(50), nullable=False, comment="指标列名")
+    value = Column(DECIMAL(10,2), nullable=True, comment="触发告警的指标值")
+    severity = Column(String(10), nullable=False, comment="warning / critical")
+    message = Column(String(200), nullable=True)
+    status = Column(String(10), nullable=False, default="open", comment="open / resolved")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    resolved_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class Job(Base):
+    """后台任务队列（由 jobs 模块的工作进程领取执行）"""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index('idx_job_status_run_after', 'status', 'run_after', 'id'),  # 工作进程领取待执行任务
+        # 排队中/执行中的任务才填 active_key（结束时置空），唯一索引保证同一去重键同时只有一个活动任务
+        Index('uq_job_active_key', 'active_key', unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String(50), nullable=False, comment="任务类型")
+    status = Column(String(20), nullable=False, default="queued", comment="queued / running / succeeded / failed")
+    dedup_key = Column(String(100), nullable=True, comment="去重键")
+    active_key = Column(String(100), nullable=True)
+    payload = Column(Text, nullable=True, comment="任务参数（JSON）")
+    result = Column(Text, nullable=True, comment="执行结果（JSON）")
+    error = Column(Text, nullable=True, comment="最近一次失败原因")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    progress = Column(Integer, nullable=False, default=0, comment="进度 0-100")
+    progress_message = Column(String(200), nullable=True)
+    run_after = Column(DateTime, nullable=False, default=datetime.now, comment="最早执行时间（重试退避）")
+    locked_by = Column(String(100), nullable=True, comment="执行中的工作进程")
+    locked_until = Column(DateTime, nullable=True, comment="租约到期时间，过期视为工作进程已退出")
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class SchedulerLock(Base):
+    """定时任务调度的主节点锁（带租约），多个 Web 进程/节点中只有持有者运行调度器"""
+    __tablename__ = "scheduler_locks"
+
+    name = Column(String(50), primary_key=True)
+    owner = Column(String(100), nullable=True, comment="持有者（主机:进程）")
+    locked_until = Column(DateTime, nullable=True, comment="租约到期时间，过期后其他进程可接管")
+    acquired_at = Column(DateTime, nullable=True)
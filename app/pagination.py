@@ -0,0 +1,130 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, or_
+
+from . import models
+
+# 游标分页（keyset/seek）工具
+# 排序固定为 (followup_date DESC, id DESC)，可直接利用 idx_pagination (followup_date, id) 索引，
+# 翻页时通过 WHERE 条件定位，而不是 OFFSET 跳过前面的行，因此深翻页的耗时不会随页码线性增长。
+# followup_date 可以为空：MySQL/SQLite 中 NULL 排在最小值位置，倒序时空日期的记录排在最后（按 id 倒序），
+# 游标中 "d" 为 null 表示定位在这一段；定位条件只用 IS NULL / 比较，仍然走 idx_pagination 索引。
+
+CURSOR_NEXT = "next"
+CURSOR_PREV = "prev"
+
+
+def encode_cursor(follow_up, direction: str = CURSOR_NEXT) -> Optional[str]:
+    """根据随访记录的 (followup_date, id) 生成不透明游标"""
+    if follow_up is None:
+        return None
+    payload = {
+        "d": follow_up.followup_date.isoformat() if follow_up.followup_date else None,
+        "i": follow_up.id,
+        "r": direction,
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int, str]:
+    """解析游标，返回 (followup_date, id, direction)，followup_date 为 None 表示空日期"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        direction = payload.get("r", CURSOR_NEXT)
+        if direction not in (CURSOR_NEXT, CURSOR_PREV):
+            raise ValueError(direction)
+        cursor_date = payload["d"]
+        return (datetime.fromisoformat(cursor_date) if cursor_date is not None else None,
+                int(payload["i"]), direction)
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="无效的分页游标"
+        )
+
+
+def order_newest_first(query):
+    """按 (followup_date DESC, id DESC) 排序，id 作为同一时间的稳定次序；空日期排在最后"""
+    return query.order_by(models.FollowUp.followup_date.desc(), models.FollowUp.id.desc())
+
+
+def apply_keyset(query, per_page: int, cursor: Optional[str] = None):
+    """
+    给查询（Query 或 select()）加上游标定位条件、排序和 LIMIT
+    返回 (query, direction)，取回结果后交给 finish_keyset_page 处理
+    """
+    followup_date = models.FollowUp.followup_date
+    follow_up_id = models.FollowUp.id
+
+    direction = CURSOR_NEXT
+    if cursor:
+        cursor_date, cursor_id, direction = decode_cursor(cursor)
+        if cursor_date is None:
+            # 游标位于末尾的空日期段：向后只剩同一段中 id 更小的记录，向前是段内 id 更大的记录和全部非空日期
+            if direction == CURSOR_NEXT:
+                query = query.filter(followup_date.is_(None), follow_up_id < cursor_id)
+            else:
+                query = query.filter(or_(
+                    followup_date.isnot(None),
+                    and_(followup_date.is_(None), follow_up_id > cursor_id)
+                ))
+        elif direction == CURSOR_NEXT:
+            query = query.filter(or_(
+                followup_date < cursor_date,
+                and_(followup_date == cursor_date, follow_up_id < cursor_id),
+                followup_date.is_(None)
+            ))
+        else:
+            query = query.filter(or_(
+                followup_date > cursor_date,
+                and_(followup_date == cursor_date, follow_up_id > cursor_id)
+            ))
+
+    if direction == CURSOR_NEXT:
+        query = order_newest_first(query)
+    else:
+        # 向前翻页时反向扫描索引（空日期段在最前），取回后再倒置为时间倒序
+        query = query.order_by(followup_date.asc(), follow_up_id.asc())
+
+    # 多取一行用于判断是否还有下一页/上一页
+    return query.limit(per_page + 1), direction
+
+
+def finish_keyset_page(rows, per_page: int, direction: str, cursor: Optional[str] = None):
+    """根据多取的一行判断翻页方向上是否还有数据，返回 (items, next_cursor, prev_cursor)"""
+    rows = list(rows)
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == CURSOR_PREV:
+        rows.reverse()
+
+    if direction == CURSOR_NEXT:
+        has_next, has_prev = has_more, bool(cursor)
+    else:
+        has_next, has_prev = True, has_more
+
+    next_cursor = encode_cursor(rows[-1], CURSOR_NEXT) if rows and has_next else None
+    prev_cursor = encode_cursor(rows[0], CURSOR_PREV) if rows and has_prev else None
+    return rows, next_cursor, prev_cursor
+
+
+def fetch_keyset_page(query, per_page: int, cursor: Optional[str] = None):
+    """
+    执行游标分页查询
+    返回 (items, next_cursor, prev_cursor)，items 始终按时间倒序
+    """
+    query, direction = apply_keyset(query, per_page, cursor)
+    return finish_keyset_page(query.all(), per_page, direction, cursor)
+
+
+def page_cursors(items, page: int, per_page: int, total: int):
+    """页码模式也返回游标，客户端可从任意一页切换到游标翻页"""
+    next_cursor = encode_cursor(items[-1], CURSOR_NEXT) if items and page * per_page < total else None
+    prev_cursor = encode_cursor(items[0], CURSOR_PREV) if items and page > 1 else None
+    return next_cursor, prev_cursor
@@ -0,0 +1,120 @@
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import DECIMAL, select
+
+from . import models
+from .pagination import order_newest_first
+
+# 列表接口的列投影
+# 列表页只需要少数几列，整行加载 FollowUp（content TEXT + 约 45 个 DECIMAL 指标列）再由响应模型丢弃既浪费
+# 数据库 I/O，也浪费 ORM 实例化开销。这里按请求的字段生成只含所需列的 select（关联的老人/医生也只取展示用的列），
+# 结果直接整理为字典，不经过 ORM 实体。fields=a,b,c 可进一步裁剪（稀疏字段集）。
+
+# 默认字段，与 schemas.FollowUpSimple 一致
+DEFAULT_LIST_FIELDS = ["id", "elderly_id", "doctor_id", "followup_date", "content", "elderly", "doctor"]
+# 游标分页依赖的字段，始终查询
+REQUIRED_FIELDS = ["id", "followup_date"]
+
+# 关联对象及其输出的列（与 schemas.Elderly / schemas.Doctor 一致）
+RELATION_COLUMNS = {
+    "elderly": (models.Elderly, models.FollowUp.elderly_id,
+                ["id", "name", "gender", "age", "contact", "address", "birth_date", "birth_place",
+                 "education", "occupation"]),
+    "doctor": (models.Doctor, models.FollowUp.doctor_id, ["id", "name", "department", "contact"]),
+}
+
+SCALAR_FIELDS = [column.name for column in models.FollowUp.__table__.columns]
+# DECIMAL 指标列输出为浮点数（与 schemas.FollowUpBase 的类型一致）
+DECIMAL_FIELDS = {column.name for column in models.FollowUp.__table__.columns if isinstance(column.type, DECIMAL)}
+SPARSE_FIELDS = SCALAR_FIELDS + list(RELATION_COLUMNS)
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """解析 fields=a,b,c 参数，未指定时返回默认字段"""
+    if not fields:
+        return list(DEFAULT_LIST_FIELDS)
+    requested = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in requested if name not in SPARSE_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"未知的字段: {', '.join(unknown)}"
+        )
+    # 列表项始终带ID
+    return requested if "id" in requested else ["id"] + requested
+
+
+class FollowUpProjection:
+    """按字段列表生成投影查询，并把结果行整理为响应字典"""
+
+    def __init__(self, fields: List[str]):
+        self.fields = fields
+        self.scalars = [name for name in fields if name in SCALAR_FIELDS]
+        self.relations = [name for name in fields if name in RELATION_COLUMNS]
+        table = models.FollowUp.__table__
+        # 游标字段缺失时补充查询（标签与字段同名，Row 可直接交给分页工具生成游标）
+        queried = self.scalars + [name for name in REQUIRED_FIELDS if name not in self.scalars]
+        self.columns = [table.c[name] for name in queried]
+        self._scalar_positions = [(name, queried.index(name)) for name in self.scalars if name not in DECIMAL_FIELDS]
+        self._decimal_positions = [(name, queried.index(name)) for name in self.scalars if name in DECIMAL_FIELDS]
+        self._relation_positions = []
+        # 列式输出的列名与 SQL 类型（关联列展开为 elderly.name 形式）
+        self.column_types = {name: table.c[name].type for name in self.scalars}
+        position = len(queried)
+        for relation in self.relations:
+            model, _, names = RELATION_COLUMNS[relation]
+            self.columns.extend(model.__table__.c[name].label(f"{relation}__{name}") for name in names)
+            self.column_types.update((f"{relation}.{name}", model.__table__.c[name].type) for name in names)
+            self._relation_positions.append((relation, names, position))
+            position += len(names)
+
+    def statement(self, filtered):
+        """filtered 为已加好过滤条件的 select(FollowUp)，返回只含所需列的语句（关联表用 LEFT JOIN）"""
+        stmt = filtered.with_only_columns(*self.columns)
+        for relation in self.relations:
+            model, foreign_key, _ = RELATION_COLUMNS[relation]
+            stmt = stmt.join_from(models.FollowUp, model, model.id == foreign_key, isouter=True)
+        return stmt
+
+    def offset_page_statement(self, filtered, offset: int, limit: int):
+        """
+        页码分页：先只在 follow_ups 上按 (followup_date, id) 定位本页的ID，再为这一页的行取列和关联（延迟关联），
+        避免 OFFSET 跳过的每一行都去关联老人/医生表
+        """
+        if not self.relations:
+            return order_newest_first(self.statement(filtered)).offset(offset).limit(limit)
+        page_ids = order_newest_first(filtered.with_only_columns(models.FollowUp.id)) \
+            .offset(offset).limit(limit).subquery()
+        page = select(models.FollowUp).join(page_ids, page_ids.c.id == models.FollowUp.id)
+        return order_newest_first(self.statement(page))
+
+    def to_dicts(self, rows) -> List[dict]:
+        items = []
+        for row in rows:
+            item = {name: row[position] for name, position in self._scalar_positions}
+            for name, position in self._decimal_positions:
+                value = row[position]
+                item[name] = None if value is None else float(value)
+            for relation, names, start in self._relation_positions:
+                # 关联记录不存在时（LEFT JOIN 的主键为空）输出 None
+                item[relation] = None if row[start] is None else {
+                    name: row[start + offset] for offset, name in enumerate(names)
+                }
+            items.append(item)
+        return items
+
+    def to_columns(self, rows) -> Dict[str, list]:
+        """列式输出：把结果行按列转置，不构造逐行字典；键与 column_types 相同"""
+        values = list(zip(*rows)) if rows else [()] * len(self.columns)
+        columns = {name: list(values[position]) for name, position in self._scalar_positions}
+        for name, position in self._decimal_positions:
+            columns[name] = [None if value is None else float(value) for value in values[position]]
+        for relation, names, start in self._relation_positions:
+            columns.update((f"{relation}.{name}", list(values[start + offset])) for offset, name in enumerate(names))
+        # 保持与请求字段相同的列顺序
+        return {name: columns[name] for name in self.column_types}
+
+
+def follow_up_projection(fields: Optional[str]) -> FollowUpProjection:
+    return FollowUpProjection(parse_fields(fields))
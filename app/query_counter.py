@@ -0,0 +1,157 @@
+"""
+SQL 查询计数与查询预算检查
+QueryCounter 统计一段代码实际发出的 SQL 语句数和 JOIN 数，超出预算时抛出 QueryBudgetExceeded，
+用于在本地发现 N+1 查询和多余的关联（例如关联关系被改回默认 JOIN 加载）。
+
+    with QueryCounter(max_queries=2, max_joins=0):
+        crud.delete_follow_up(db, follow_up_id)
+
+直接运行本模块时在临时 SQLite 数据库上逐个请求 QUERY_BUDGETS 中的接口，任一超出预算即以非零状态退出:
+    python -m app.query_counter
+    python -m app.query_counter -v    # 输出每个接口的 SQL
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import threading
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+JOIN_PATTERN = re.compile(r"\bJOIN\b", re.IGNORECASE)
+# 连接初始化、事务控制等语句不计入预算
+IGNORED_PATTERN = re.compile(r"^\s*(PRAGMA|SAVEPOINT|RELEASE|ROLLBACK|BEGIN|COMMIT|SET\b|SELECT\s+@@)", re.IGNORECASE)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCounter:
+    """统计 with 代码块内发出的 SQL；bind 为空时统计所有引擎（含异步引擎底层的同步引擎）"""
+
+    def __init__(self, bind=None, max_queries: int = None, max_joins: int = None, label: str = ""):
+        self.target = Engine if bind is None else getattr(bind, "sync_engine", bind)
+        self.max_queries = max_queries
+        self.max_joins = max_joins
+        self.label = label
+        self.statements: List[str] = []
+        self._lock = threading.Lock()
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if IGNORED_PATTERN.match(statement):
+            return
+        with self._lock:
+            self.statements.append(statement)
+
+    def __enter__(self):
+        self.statements = []
+        event.listen(self.target, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        event.remove(self.target, "before_cursor_execute", self._record)
+        if exc_type is None:
+            self.check()
+        return False
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def joins(self) -> int:
+        return sum(len(JOIN_PATTERN.findall(statement)) for statement in self.statements)
+
+    def check(self, max_queries: int = None, max_joins: int = None):
+        """超出预算时抛出异常，异常信息中列出全部 SQL；未传入的预算使用构造时的值"""
+        max_queries = self.max_queries if max_queries is None else max_queries
+        max_joins = self.max_joins if max_joins is None else max_joins
+        problems = []
+        if max_queries is not None and self.count > max_queries:
+            problems.append(f"查询 {self.count} 条，预算 {max_queries} 条")
+        if max_joins is not None and self.joins > max_joins:
+            problems.append(f"JOIN {self.joins} 个，预算 {max_joins} 个")
+        if problems:
+            listing = "\n".join(f"  [{i}] {' '.join(sql.split())}" for i, sql in enumerate(self.statements, 1))
+            raise QueryBudgetExceeded(f"{self.label or 'SQL'} 超出预算: {'，'.join(problems)}\n{listing}")
+
+
+# 接口查询预算：(方法, 路径, 最多查询数, 最多 JOIN 数)，None 表示不限。路径中的 ID 对应 seed 数据
+QUERY_BUDGETS = [
+    # 首次请求：表版本号 + COUNT + 本页（延迟关联：本页ID子查询 + 老人/医生）；总数命中缓存后不再 COUNT
+    ("GET", "/api/v1/follow-ups?page=3&per_page=20", 3, 3),
+
+    ("GET", "/api/v1/follow-ups?page=3&per_page=20&fields=id,followup_date,blood_glucose", 2, 0),
+    ("GET", "/api/v1/elderly/1/follow-ups", 1, 2),
+    ("GET", "/api/v1/elderly?limit=20", 2, 1),
+    ("GET", "/api/v1/doctors?limit=20", 2, 0),
+    ("GET", "/api/v1/follow-ups/1/report", 2, 4),  # 报告缓存校验 + 随访记录连同老人/医生
+    # 写接口：更新最近随访汇总表的语句本身带 1 个 JOIN，返回值连同老人/医生查回再加 2 个；另有 1 条递增表版本号
+    ("POST", "/api/v1/follow-ups", 6, 3),
+    ("PUT", "/api/v1/follow-ups/2", 8, 3),
+    ("DELETE", "/api/v1/follow-ups/3", 6, 1),
+]
+
+# 写接口的请求体
+REQUEST_BODIES = {
+    ("POST", "/api/v1/follow-ups"): {
+        "elderly_id": 1, "doctor_id": 1, "follow_up_date": "2024-01-01 09:00:00", "content": "常规随访",
+        "systolic_blood_pressure": 150,
+    },
+    ("PUT", "/api/v1/follow-ups/2"): {
+        "elderly_id": 1, "doctor_id": 1, "follow_up_date": "2024-01-01 09:00:00", "content": "复诊",
+        "blood_glucose": 6.1,
+    },
+}
+
+
+def check_budgets(client, verbose: bool = False) -> List[str]:
+    """逐个请求 QUERY_BUDGETS 中的接口，返回超出预算的说明"""
+    failures = []
+    for method, path, max_queries, max_joins in QUERY_BUDGETS:
+        counter = QueryCounter(label=f"{method} {path}")
+        with counter:
+            response = client.request(method, path, json=REQUEST_BODIES.get((method, path)))
+        outcome = "OK"
+        if response.status_code >= 400:
+            outcome = f"HTTP {response.status_code}"
+            failures.append(f"{method} {path} 返回 {response.status_code}: {response.text[:200]}")
+        else:
+            try:
+                counter.check(max_queries, max_joins)
+            except QueryBudgetExceeded as e:
+                outcome = "超出预算"
+                failures.append(str(e))
+        print(f"{outcome:<8} {counter.count:3d} 条查询 {counter.joins:3d} 个JOIN  {method} {path}")
+        if verbose:
+            for statement in counter.statements:
+                print(f"           {' '.join(statement.split())[:300]}")
+    return failures
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="接口 SQL 查询预算检查")
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出每个接口的 SQL")
+    parser.add_argument("--rows", type=int, default=2000, help="随访记录条数")
+    args = parser.parse_args(argv)
+
+    from fastapi.testclient import TestClient
+
+    from app.benchmark import build_app, seed_database
+
+    with tempfile.TemporaryDirectory() as workdir:
+        url = f"sqlite:///{os.path.join(workdir, 'query_budget.db')}"
+        seed_database(url, elderly=100, rows=args.rows)
+        # 不触发 lifespan（不启动调度器和任务工作进程）
+        failures = check_budgets(TestClient(build_app(url)), verbose=args.verbose)
+    for failure in failures:
+        print(f"\n{failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+import hashlib
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Tuple
+
+from fastapi.templating import Jinja2Templates
+from sqlalchemy.orm import Session
+
+from . import models
+
+# 随访报告渲染与缓存
+# 医生会反复打开同一份报告，这里缓存渲染好的 HTML 字节：
+# 版本号由修订号 revision（每次更新加一）和报告中显示的老人/医生姓名计算，命中时只需一次按主键的轻量查询，
+# 客户端带 If-None-Match 且版本未变时直接返回 304。
+# 不使用 updated_at：它只精确到秒，同一秒内的两次更新版本号相同，旧报告会被继续返回。
+
+template_dir = Path(__file__).parent / "templates"
+templates = Jinja2Templates(directory=str(template_dir))
+REPORT_TEMPLATE = "reports/follow_up_report.html"
+
+REPORT_CACHE_MAX_ENTRIES = 500  # 最多缓存的报告数
+REPORT_CACHE_MAX_BYTES = 64 * 1024 * 1024  # 缓存总大小上限(字节)
+
+EXPORT_BATCH_SIZE = 200  # 批量导出时每批从数据库游标读取的记录数
+EXPORT_WORKERS = 4  # 批量导出的渲染线程数
+
+
+def render_follow_up_report(report_data: dict, follow_up_id: int) -> bytes:
+    """把 crud.get_follow_up_report_data 的结果渲染为 HTML 字节"""
+    html = templates.get_template(REPORT_TEMPLATE).render(
+        report=report_data,
+        now=datetime.now().strftime("%Y年%m月%d日 %H:%M"),
+        title=f"随访报告 #{follow_up_id}"
+    )
+    return html.encode("utf-8")
+
+
+def build_report_data(follow_up: models.FollowUp) -> dict:
+    """把随访记录整理为报告模板所需的数据（包含所有健康指标）"""
+    # 处理 next_follow_up_date（兼容空值）
+    next_follow_up_str = None
+    if hasattr(follow_up, 'next_follow_up_date') and follow_up.next_follow_up_date:
+        next_follow_up_str = follow_up.next_follow_up_date.strftime("%Y-%m-%d %H:%M")
+
+    return {
+        # 基本信息
+        "elderly_name": follow_up.elderly.name if follow_up.elderly else "",
+        "doctor_name": follow_up.doctor.name if follow_up.doctor else "",
+        "followup_date": follow_up.followup_date.strftime("%Y-%m-%d %H:%M") if follow_up.followup_date else "",
+        "content": follow_up.content or "",
+        "next_follow_up_date": next_follow_up_str,  # 使用处理后的值
+        "medication_warning": follow_up.medication_warning or "无特殊用药禁忌",
+
+        # 体格检查
+        "height": follow_up.height,
+        "weight": follow_up.weight,
+        "bmi": follow_up.bmi,
+        "waist_circumference": follow_up.waist_circumference,
+        "hip_circumference": follow_up.hip_circumference,
+        "waist_hip_ratio": follow_up.waist_hip_ratio,
+        "temperature": follow_up.temperature,
+
+        # 生命体征
+        "systolic_blood_pressure": follow_up.systolic_blood_pressure,
+        "diastolic_blood_pressure": follow_up.diastolic_blood_pressure,
+        "blood_oxygen": follow_up.blood_oxygen,
+        "pulse_rate": follow_up.pulse_rate,
+        "heart_rate": follow_up.heart_rate,
+        "respiration": follow_up.respiration,
+
+        # 血液检查
+        "blood_glucose": follow_up.blood_glucose,
+        "uric_acid": follow_up.uric_acid,
+        "hemoglobin": follow_up.hemoglobin,
+        "total_cholesterol": follow_up.total_cholesterol,
+        "triglycerides": follow_up.triglycerides,
+        "hdl_cholesterol": follow_up.hdl_cholesterol,
+        "ldl_cholesterol": follow_up.ldl_cholesterol,
+
+        # 其他检查
+        "fat": follow_up.fat,
+        "water_content": follow_up.water_content,
+        "bmr": follow_up.bmr,
+        "bone_density": follow_up.bone_density,
+        "fvc": follow_up.fvc,
+        "ecg": follow_up.ecg,
+        "total_sleep_time": follow_up.total_sleep_time,
+
+        # 尿常规
+        "urine_wbc": follow_up.urine_wbc,
+        "urine_nitrite": follow_up.urine_nitrite,
+        "urine_urobilinogen": follow_up.urine_urobilinogen,
+        "urine_protein": follow_up.urine_protein,
+        "urine_ph": follow_up.urine_ph,
+        "urine_blood": follow_up.urine_blood,
+        "urine_specific_gravity": follow_up.urine_specific_gravity,
+        "urine_ketone": follow_up.urine_ketone,
+        "urine_bilirubin": follow_up.urine_bilirubin,
+        "urine_glucose": follow_up.urine_glucose,
+        "urine_vitamin_c": follow_up.urine_vitamin_c,
+
+        # 其他
+        "cholesterol": follow_up.cholesterol
+    }
+
+
+def get_report_version(db: Session, follow_up_id: int) -> Optional[str]:
+    """查询报告当前版本号，记录不存在时返回 None（只读主键和两个姓名字段）"""
+    row = db.query(
+        models.FollowUp.revision,
+        models.Elderly.name,
+        models.Doctor.name
+    ).select_from(models.FollowUp) \
+        .outerjoin(models.Elderly, models.Elderly.id == models.FollowUp.elderly_id) \
+        .outerjoin(models.Doctor, models.Doctor.id == models.FollowUp.doctor_id) \
+        .filter(models.FollowUp.id == follow_up_id) \
+        .first()
+    if row is None:
+        return None
+    revision, elderly_name, doctor_name = row
+    raw = f"{revision or 0}|{elderly_name or ''}|{doctor_name or ''}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def report_etag(follow_up_id: int, version: str) -> str:
+    return f'"report-{follow_up_id}-{version}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """解析 If-None-Match（可能是逗号分隔的多个值，或带 W/ 前缀）"""
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or any(value.removeprefix("W/") == etag for value in candidates)
+
+
+class ReportCache:
+    """按随访ID缓存 (版本号, HTML字节) 的 LRU，同时限制条数和总字节数"""
+
+    def __init__(self, max_entries: int = REPORT_CACHE_MAX_ENTRIES, max_bytes: int = REPORT_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[int, Tuple[str, bytes]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, follow_up_id: int, version: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(follow_up_id)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(follow_up_id)
+            return entry[1]
+
+    def set(self, follow_up_id: int, version: str, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            self._discard(follow_up_id)
+            self._entries[follow_up_id] = (version, body)
+            self._size += len(body)
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def invalidate(self, follow_up_id: int):
+        with self._lock:
+            self._discard(follow_up_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _discard(self, follow_up_id: int):
+        entry = self._entries.pop(follow_up_id, None)
+        if entry is not None:
+            self._size -= len(entry[1])
+
+
+report_cache = ReportCache()
+
+
+def invalidate_report(follow_up_id: int):
+    """随访记录更新/删除后调用"""
+    report_cache.invalidate(follow_up_id)
+
+
+# 批量导出
+# 按批从服务端游标读取记录，交给渲染线程池，同时读取下一批；渲染结果逐个写入 ZIP 并立即输出，
+# 任意时刻内存中最多只有两批报告，与导出总量无关。
+
+_export_executor = None
+_export_executor_lock = threading.Lock()
+
+
+def get_export_executor() -> ThreadPoolExecutor:
+    global _export_executor
+    with _export_executor_lock:
+        if _export_executor is None:
+            _export_executor = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="report-export")
+        return _export_executor
+
+
+class _StreamBuffer:
+    """只追加的写缓冲：zipfile 以不可 seek 的流模式写入，写入的字节随后被生成器取走输出"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def report_entry_name(follow_up: models.FollowUp) -> str:
+    """ZIP 内的文件名：日期_姓名_ID.html"""
+    date_part = follow_up.followup_date.strftime("%Y%m%d") if follow_up.followup_date else "nodate"
+    name_part = follow_up.elderly.name if follow_up.elderly else "unknown"
+    return f"{date_part}_{name_part}_{follow_up.id}.html"
+
+
+def iter_report_archive(query, batch_size: int = EXPORT_BATCH_SIZE):
+    """逐批渲染 query 中的随访报告，以 ZIP 字节块的形式边生成边输出"""
+    executor = get_export_executor()
+    buffer = _StreamBuffer()
+
+    def write_batch(archive, pending):
+        for entry_name, future in pending:
+            archive.writestr(entry_name, future.result())
+            chunk = buffer.take()
+            if chunk:
+                yield chunk
+
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        pending = []
+        batch = []
+        for follow_up in query.yield_per(batch_size):
+            batch.append((report_entry_name(follow_up), follow_up.id, build_report_data(follow_up)))
+            if len(batch) < batch_size:
+                continue
+            submitted = [
+                (entry_name, executor.submit(render_follow_up_report, data, follow_up_id))
+                for entry_name, follow_up_id, data in batch
+            ]
+            batch = []
+            # 上一批在渲染的同时已读取了本批，此时再写出上一批
+            yield from write_batch(archive, pending)
+            pending = submitted
+
+        submitted = [
+            (entry_name, executor.submit(render_follow_up_report, data, follow_up_id))
+            for entry_name, follow_up_id, data in batch
+        ]
+        yield from write_batch(archive, pending)
+        yield from write_batch(archive, submitted)
+
+    # 关闭 ZIP 时写入的中央目录
+    chunk = buffer.take()
+    if chunk:
+        yield chunk
@@ -0,0 +1,43 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson  # 可选依赖，安装后 JSON 编码快数倍
+except ImportError:
+    orjson = None
+
+# 列表/时间序列接口的 JSON 快速输出
+# 这些接口返回的是由投影查询整理好的字典（值已是 int/float/str/datetime），结构由代码保证，
+# 再按 response_model 逐行校验、转换一遍是纯开销。路由直接返回 FastJSONResponse 时 FastAPI 跳过响应模型
+# （response_model 仍保留用于接口文档），由 orjson 一次编码为字节；未安装 orjson 时退回标准库 json。
+
+
+def json_default(value):
+    """Decimal / 日期时间等转为 JSON 可表示的值（只有遇到这些类型时才会调用）"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.decode("utf-8")
+    raise TypeError(f"无法序列化的类型: {type(value).__name__}")
+
+
+if orjson is not None:
+    def dumps(content) -> bytes:
+        return orjson.dumps(content, default=json_default)
+else:
+    _encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=json_default).encode
+
+    def dumps(content) -> bytes:
+        return _encode(content).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """内容不经响应模型校验，直接编码输出；只用于结构可信的字典/列表"""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
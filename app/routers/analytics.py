@@ -0,0 +1,81 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.params import Query
+from sqlalchemy.orm import Session
+import logging
+
+from .. import analytics, schemas
+from ..timeseries import METRIC_COLUMNS
+from .follow_up import get_db
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+def analytics_filters(
+    doctor_id: Optional[int] = Query(None, description="只统计该医生的随访"),
+    start_date: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    end_date: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$")
+) -> dict:
+    """统计接口公共的过滤参数，格式与 apply_follow_up_filters 一致"""
+    return {"doctor_id": doctor_id, "start_date": start_date, "end_date": end_date}
+
+
+def _run(label: str, func, *args, **kwargs):
+    try:
+        return func(*args, **kwargs)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"{label}失败: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"{label}失败"
+        )
+
+
+@router.get(
+    "/analytics/metrics/{metric}",
+    response_model=List[schemas.MetricGroupSummary],
+    summary="指标分布统计",
+    description="单个指标的数量、均值、标准差、分位数和直方图，可按医生或年龄段分组"
+)
+def get_metric_summary(
+    metric: str,
+    group_by: str = Query(analytics.GROUP_BY_NONE, pattern="^(none|doctor|age_band)$"),
+    bins: int = Query(analytics.DEFAULT_HISTOGRAM_BINS, ge=1, le=200),
+    filters: dict = Depends(analytics_filters),
+    db: Session = Depends(get_db)
+):
+    if metric not in METRIC_COLUMNS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"未知的指标: {metric}")
+    return _run("指标统计", analytics.metric_summary, db, metric, group_by=group_by, filters=filters, bins=bins)
+
+
+@router.get(
+    "/analytics/bp-control",
+    response_model=List[schemas.BPControlGroup],
+    summary="各医生血压控制达标率"
+)
+def get_bp_control(filters: dict = Depends(analytics_filters), db: Session = Depends(get_db)):
+    return _run("血压达标率统计", analytics.bp_control_by_doctor, db, filters=filters)
+
+
+@router.get(
+    "/analytics/bmi-distribution",
+    response_model=List[schemas.BMIAgeBand],
+    summary="各年龄段 BMI 分布"
+)
+def get_bmi_distribution(filters: dict = Depends(analytics_filters), db: Session = Depends(get_db)):
+    return _run("BMI 分布统计", analytics.bmi_distribution_by_age, db, filters=filters)
+
+
+@router.get(
+    "/analytics/urine-abnormal",
+    response_model=List[schemas.UrinePrevalence],
+    summary="尿常规异常检出率"
+)
+def get_urine_abnormal(filters: dict = Depends(analytics_filters), db: Session = Depends(get_db)):
+    return _run("尿常规异常统计", analytics.urine_abnormal_prevalence, db, filters=filters)
@@ -1,24 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, status, BackgroundTasks
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
 from fastapi.params import Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, joinedload, selectinload
 from app.crud import get_doctors
 from typing import List, Optional
+import json
 import logging
-from datetime import datetime,timezone
+from datetime import date, datetime,timezone
 from pydantic import BaseModel, validator
 from app.crud import get_follow_ups_paginated
 
-from .. import schemas, crud, models
-from ..crud import schedule_follow_up_automation
-from ..database import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import alerts, columnar, schemas, crud, crud_async, exports, jobs, models, reports, suggest, timeseries, worklist
+from ..database import SessionLocal, get_async_sessionmaker
 from pathlib import Path
 
 from ..models import FollowUp
+from ..counts import COUNT_MODE_EXACT
+from ..responses import FastJSONResponse
+from ..search_index import ENTITY_DOCTOR, ENTITY_ELDERLY
 
 # 在 follow_up.py 中修改
-template_dir = Path(__file__).parent.parent / "templates"
-templates = Jinja2Templates(directory=str(template_dir))
+from ..reports import template_dir, templates
 
 import os
 print(f"模板目录绝对路径: {template_dir}")
@@ -53,6 +59,21 @@ def get_db():
     finally:
         db.close()
 
+
+async def get_async_db():
+    """异步会话依赖，用于原生 async 路由"""
+    async with get_async_sessionmaker()() as db:
+        try:
+            yield db
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"数据库连接失败: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="数据库连接失败"
+            )
+
 class FollowUpCreate(BaseModel):
     elderly_id: int
     doctor_id: int
@@ -71,7 +92,7 @@ class FollowUpCreate(BaseModel):
             raise ValueError("日期格式应为 YYYY-MM-DD HH:mm:ss")
 
 @router.post("/follow-ups")
-async def create_follow_up(
+def create_follow_up(
     follow_up: schemas.FollowUpCreate,
     db: Session = Depends(get_db)
 ):
@@ -84,11 +105,39 @@ async def create_follow_up(
     except Exception as e:
         logger.error(f"创建随访记录失败: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
+@router.post(
+    "/follow-ups/bulk",
+    response_model=schemas.BulkIngestResult,
+    summary="批量导入随访记录",
+    description="接收 FollowUpCreate 的 JSON 数组或 NDJSON（Content-Type: application/x-ndjson），分批写入并返回逐条错误"
+)
+async def bulk_create_follow_ups(request: Request, db: Session = Depends(get_db)):
+    body = await request.body()
+    try:
+        if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+            payloads = [json.loads(line) for line in body.decode("utf-8").splitlines() if line.strip()]
+        else:
+            payloads = json.loads(body)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"请求体不是合法的 JSON/NDJSON: {str(e)}")
+    if not isinstance(payloads, list):
+        raise HTTPException(status_code=400, detail="请求体应为随访记录数组")
+    if len(payloads) > crud.BULK_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"单次最多导入 {crud.BULK_MAX_ROWS} 条记录"
+        )
+    # 校验和写库都是同步操作，放到线程池中执行，避免阻塞事件循环
+    return await run_in_threadpool(crud.bulk_create_follow_ups, db, payloads)
+
 @router.get(
     "/follow-ups",
     response_model=schemas.FollowUpListResponse,
+    response_model_exclude_unset=True,
     summary="分页获取随访记录",
-    description="支持分页、过滤的随访记录查询"
+    description="支持分页、过滤的随访记录查询；fields 指定只返回的字段（逗号分隔，可含指标列和 elderly/doctor）。"
+                "Accept 为 application/vnd.apache.arrow.stream 或 application/msgpack 时返回列式二进制格式",
+    responses=columnar.COLUMNAR_RESPONSES
 )
 async def read_follow_ups(
     page: int = Query(1, ge=1),
@@ -99,50 +148,29 @@ async def read_follow_ups(
     doctor_name: Optional[str] = Query(None),
     start_date: Optional[str] = Query(None),
     end_date: Optional[str] = Query(None),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="游标分页：上一次响应中的 next_cursor/prev_cursor，传入后忽略 page"),
+    count: str = Query(COUNT_MODE_EXACT, pattern="^(exact|estimate)$", description="总数计算方式：exact 精确(带缓存)，estimate 表统计估算"),
+    fields: Optional[str] = Query(None, description="稀疏字段集，如 id,followup_date,systolic_blood_pressure,elderly"),
+    accept: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """支持多条件搜索的随访记录查询"""
     try:
-        query = db.query(models.FollowUp).options(
-            joinedload(models.FollowUp.elderly),
-            joinedload(models.FollowUp.doctor)
+        fmt = columnar.negotiate(accept)
+        result = await crud_async.get_follow_ups_paginated(
+            db, page=page, per_page=per_page,
+            elderly_id=elderly_id, doctor_id=doctor_id,
+            elderly_name=elderly_name, doctor_name=doctor_name,
+            start_date=start_date, end_date=end_date,
+            cursor=cursor, count_mode=count, fields=fields, columnar=fmt != columnar.FORMAT_JSON
         )
-
-        # 修改这里的筛选逻辑
-        if elderly_id:
-            query = query.filter(models.FollowUp.elderly_id == elderly_id)
-        elif elderly_name:
-            # 使用join和ilike进行模糊查询
-            query = query.join(models.Elderly).filter(
-                models.Elderly.name.ilike(f"%{elderly_name}%")
-            )
-
-        if doctor_id:
-            query = query.filter(models.FollowUp.doctor_id == doctor_id)
-        elif doctor_name:
-            query = query.join(models.Doctor).filter(
-                models.Doctor.name.ilike(f"%{doctor_name}%")
-            )
-
-        if start_date and end_date:
-            start = datetime.strptime(start_date, "%Y-%m-%d")
-            end = datetime.strptime(end_date, "%Y-%m-%d")
-            query = query.filter(
-                models.FollowUp.followup_date.between(start, end)
-            )
-
-        total = query.count()
-        items = query.order_by(
-            models.FollowUp.followup_date.desc()
-        ).offset((page - 1) * per_page).limit(per_page).all()
-
-        return {
-            "items": items,
-            "total": total,
-            "page": page,
-            "per_page": per_page,
-            "total_pages": (total + per_page - 1) // per_page
-        }
+        if fmt != columnar.FORMAT_JSON:
+            columns, column_types = result.pop("columns"), result.pop("column_types")
+            return columnar.columns_response(fmt, columns, column_types, meta=result)
+        # 投影查询已整理好响应字典，直接编码输出，不再按响应模型逐行校验
+        return FastJSONResponse(result, headers=columnar.VARY_HEADERS)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"查询失败: {str(e)}")
         raise HTTPException(status_code=500, detail="查询失败")
@@ -152,44 +180,138 @@ async def read_follow_ups(
     description="生成包含详细信息的HTML报告",
     responses={
         200: {"content": {"text/html": {}}},
+        304: {"description": "报告未修改（If-None-Match 命中）"},
         404: {"description": "记录不存在"},
         500: {"description": "服务器内部错误"}
     }
 )
-async def get_follow_up_report(
-        request: Request,
+def get_follow_up_report(
         follow_up_id: int,
+        if_none_match: Optional[str] = Header(None),
         db: Session = Depends(get_db)
 ):
     try:
         logger.info(f"请求报告 - ID: {follow_up_id}")
-        report_data = crud.get_follow_up_report_data(db, follow_up_id=follow_up_id)
-
-        if not report_data:
-            logger.error(f"报告数据为空 - ID: {follow_up_id}")
-            raise HTTPException(status_code=404, detail="报告数据为空")
-
-        logger.debug(f"报告数据: {report_data}")
-        return templates.TemplateResponse(
-            "reports/follow_up_report.html",
-            {
-                "request": request,
-                "report": report_data,
-                "now": datetime.now().strftime("%Y年%m月%d日 %H:%M"),
-                "title": f"随访报告 #{follow_up_id}"
-            }
-        )
+        # 只查版本号；版本未变时直接返回 304 或缓存的报告，不再加载整条记录
+        version = reports.get_report_version(db, follow_up_id)
+        if version is None:
+            raise HTTPException(status_code=404, detail="随访记录不存在")
+
+        etag = reports.report_etag(follow_up_id, version)
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if reports.etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        body = reports.report_cache.get(follow_up_id, version)
+        if body is None:
+            report_data = crud.get_follow_up_report_data(db, follow_up_id=follow_up_id)
+            if not report_data:
+                logger.error(f"报告数据为空 - ID: {follow_up_id}")
+                raise HTTPException(status_code=404, detail="报告数据为空")
+
+            logger.debug(f"报告数据: {report_data}")
+            body = reports.render_follow_up_report(report_data, follow_up_id)
+            reports.report_cache.set(follow_up_id, version, body)
+
+        return Response(content=body, media_type="text/html", headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"报告生成失败 - ID: {follow_up_id} - 错误: {str(e)}", exc_info=True)
         raise
 
+@router.get(
+    "/follow-ups/export",
+    summary="导出随访记录",
+    description="按筛选条件流式导出随访记录原始数据，支持 CSV/NDJSON、指定字段和 gzip 压缩",
+    responses={200: {"content": {"text/csv": {}, "application/x-ndjson": {}, "application/gzip": {}}}}
+)
+def export_follow_ups(
+    format: str = Query(exports.EXPORT_FORMAT_CSV, pattern="^(csv|ndjson)$", description="导出格式"),
+    fields: Optional[str] = Query(None, description="逗号分隔的指标字段，默认导出全部字段"),
+    gzip: bool = Query(False, description="是否 gzip 压缩"),
+    elderly_id: Optional[int] = Query(None),
+    doctor_id: Optional[int] = Query(None),
+    elderly_name: Optional[str] = Query(None),
+    doctor_name: Optional[str] = Query(None),
+    start_date: Optional[str] = Query(None),
+    end_date: Optional[str] = Query(None),
+    db: Session = Depends(get_db)
+):
+    columns = exports.parse_export_columns(fields)
+    stmt = crud.apply_follow_up_filters(
+        exports.build_export_statement(columns),
+        elderly_id=elderly_id, doctor_id=doctor_id, elderly_name=elderly_name,
+        doctor_name=doctor_name, start_date=start_date, end_date=end_date
+    ).order_by(models.FollowUp.id)
+
+    # 响应体在路由返回后才开始生成，使用独立会话，由生成器负责关闭
+    export_db = Session(bind=db.get_bind())
+
+    def stream():
+        try:
+            yield from exports.iter_export(export_db, stmt, columns, export_format=format, compress=gzip)
+        except Exception as e:
+            logger.error(f"导出随访记录失败: {str(e)}", exc_info=True)
+            raise
+        finally:
+            export_db.close()
+
+    return StreamingResponse(
+        stream(),
+        media_type="application/gzip" if gzip else exports.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{exports.export_filename(format, gzip)}"'}
+    )
+
+@router.get(
+    "/follow-ups/reports/export",
+    summary="批量导出随访报告",
+    description="按老人/医生/日期范围筛选，将报告打包为 ZIP 流式下载",
+    responses={200: {"content": {"application/zip": {}}}}
+)
+def export_follow_up_reports(
+    elderly_id: Optional[int] = Query(None),
+    doctor_id: Optional[int] = Query(None),
+    elderly_name: Optional[str] = Query(None),
+    doctor_name: Optional[str] = Query(None),
+    start_date: Optional[str] = Query(None),
+    end_date: Optional[str] = Query(None),
+    db: Session = Depends(get_db)
+):
+    # 响应体在路由返回后才开始生成，使用独立会话，由生成器负责关闭
+    export_db = Session(bind=db.get_bind())
+    # 报告需要老人/医生姓名：按批用 IN 查询加载关联（每批 2 条查询），不在每一行上重复关联列
+    query = crud.apply_follow_up_filters(
+        export_db.query(models.FollowUp).options(
+            selectinload(models.FollowUp.elderly), selectinload(models.FollowUp.doctor)
+        ),
+        elderly_id=elderly_id, doctor_id=doctor_id, elderly_name=elderly_name,
+        doctor_name=doctor_name, start_date=start_date, end_date=end_date
+    ).order_by(models.FollowUp.followup_date, models.FollowUp.id)
+
+    def stream():
+        try:
+            yield from reports.iter_report_archive(query)
+        except Exception as e:
+            logger.error(f"批量导出报告失败: {str(e)}", exc_info=True)
+            raise
+        finally:
+            export_db.close()
+
+    filename = f"follow_up_reports_{datetime.now().strftime('%Y%m%d%H%M%S')}.zip"
+    return StreamingResponse(
+        stream(),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @router.put(
     "/follow-ups/{follow_up_id}",
     response_model=schemas.FollowUp,
     summary="更新随访记录",
     description="根据ID更新随访记录"
 )
-async def update_follow_up(
+def update_follow_up(
     follow_up_id: int,
     follow_up_update: schemas.FollowUpCreate,
     db: Session = Depends(get_db)
@@ -208,7 +330,7 @@ async def update_follow_up(
     summary="创建老人信息",
     description="添加一个新的老人信息"
 )
-async def create_elderly(
+def create_elderly(
     elderly: schemas.ElderlyCreate,
     db: Session = Depends(get_db)
 ):
@@ -220,7 +342,7 @@ async def create_elderly(
     summary="删除老人信息",
     description="根据ID删除老人信息"
 )
-async def delete_elderly(
+def delete_elderly(
     elderly_id: int,
     db: Session = Depends(get_db)
 ):
@@ -232,7 +354,7 @@ async def delete_elderly(
     summary="更新老人信息",
     description="根据ID更新老人信息"
 )
-async def update_elderly(
+def update_elderly(
     elderly_id: int,
     elderly_update: schemas.ElderlyUpdate,
     db: Session = Depends(get_db)
@@ -247,7 +369,7 @@ async def update_elderly(
     summary="创建医生信息",
     description="添加一个新的医生信息"
 )
-async def create_doctor(
+def create_doctor(
     doctor: schemas.DoctorCreate,
     db: Session = Depends(get_db)
 ):
@@ -259,7 +381,7 @@ async def create_doctor(
     summary="删除医生信息",
     description="根据ID删除医生信息"
 )
-async def delete_doctor(
+def delete_doctor(
     doctor_id: int,
     db: Session = Depends(get_db)
 ):
@@ -271,15 +393,41 @@ async def delete_doctor(
     summary="更新医生信息",
     description="根据ID更新医生信息"
 )
-async def update_doctor(
+def update_doctor(
     doctor_id: int,
     doctor_update: schemas.DoctorUpdate,
     db: Session = Depends(get_db)
 ):
     return crud.update_doctor(db=db, doctor_id=doctor_id, doctor_update=doctor_update)
+@router.get(
+    "/elderly/suggest",
+    response_model=List[schemas.NameSuggestion],
+    summary="老人姓名输入联想",
+    description="按姓名或拼音前缀返回最多 k 个老人（只含ID、姓名和区分信息）"
+)
+async def suggest_elderlies(
+    q: str = Query(..., min_length=1, description="姓名或拼音前缀"),
+    k: int = Query(suggest.SUGGEST_DEFAULT_LIMIT, ge=1, le=suggest.SUGGEST_MAX_LIMIT)
+):
+    return suggest.suggest(ENTITY_ELDERLY, q, k)
+
+
+@router.get(
+    "/doctors/suggest",
+    response_model=List[schemas.NameSuggestion],
+    summary="医生姓名输入联想",
+    description="按姓名或拼音前缀返回最多 k 个医生（只含ID、姓名和科室）"
+)
+async def suggest_doctors(
+    q: str = Query(..., min_length=1, description="姓名或拼音前缀"),
+    k: int = Query(suggest.SUGGEST_DEFAULT_LIMIT, ge=1, le=suggest.SUGGEST_MAX_LIMIT)
+):
+    return suggest.suggest(ENTITY_DOCTOR, q, k)
+
+
 @router.get(
     "/elderly",
-    response_model=List[schemas.Elderly],
+    response_model=List[schemas.ElderlyWithLatest],
     summary="获取老人列表",
     description="获取所有老人信息列表"
 )
@@ -287,22 +435,34 @@ async def read_elderlies(
     skip: int = 0,
     limit: int = 100,
     search: str = None,  # 新增搜索参数
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    return crud.get_elderlies(db, skip=skip, limit=limit, search=search)
+    return await crud_async.get_elderlies(db, skip=skip, limit=limit, search=search)
 # 在 follow_up.py 中添加以下路由
 @router.get(
     "/elderly/{elderly_id}/follow-ups",
-    response_model=List[schemas.FollowUp],
-    summary="获取老人的随访记录"
+    response_model=List[schemas.FollowUpListItem],
+    response_model_exclude_unset=True,
+    summary="获取老人的随访记录",
+    description="fields 指定只返回的字段（逗号分隔），默认字段同随访列表；支持 Arrow / MessagePack 列式输出",
+    responses=columnar.COLUMNAR_RESPONSES
 )
-async def get_follow_ups_by_elderly(
+def get_follow_ups_by_elderly(
     elderly_id: int,
+    fields: Optional[str] = Query(None, description="稀疏字段集"),
+    accept: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     """获取特定老人的随访记录"""
     try:
-        return crud.get_follow_ups(db, elderly_id=elderly_id)
+        fmt = columnar.negotiate(accept)
+        if fmt != columnar.FORMAT_JSON:
+            columns, column_types = crud.get_follow_ups(db, elderly_id=elderly_id, fields=fields, columnar=True)
+            return columnar.columns_response(fmt, columns, column_types, meta={"elderly_id": elderly_id})
+        return FastJSONResponse(crud.get_follow_ups(db, elderly_id=elderly_id, fields=fields),
+                                headers=columnar.VARY_HEADERS)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"获取老人随访记录失败: {str(e)}")
         raise HTTPException(
@@ -311,41 +471,84 @@ async def get_follow_ups_by_elderly(
         )
 
 @router.get(
-    "/follow-ups/{follow_up_id}/report",
-    summary="生成随访报告",
-    description="生成包含详细信息的HTML报告",
-    responses={
-        200: {"content": {"text/html": {}}},
-        404: {"description": "记录不存在"},
-        500: {"description": "服务器内部错误"}
-    }
+    "/elderly/{elderly_id}/timeseries",
+    response_model=schemas.ElderlyTimeSeriesResponse,
+    summary="获取老人健康指标时间序列",
+    description="按指标返回列式的时间/数值数组，可按日期窗口过滤并在服务端降采样（lttb / bucket / none）；"
+                "支持 Arrow / MessagePack 输出",
+    responses=columnar.COLUMNAR_RESPONSES
 )
-async def get_follow_up_report(
-        request: Request,
-        follow_up_id: int,
-        db: Session = Depends(get_db)
+def get_elderly_timeseries(
+    elderly_id: int,
+    metrics: Optional[str] = Query(None, description="逗号分隔的指标列名，默认血压/血糖/BMI"),
+    # 按日期类型解析，2024-13-45 之类的无效日期直接返回 422
+    start_date: Optional[date] = Query(None, description="开始日期 YYYY-MM-DD"),
+    end_date: Optional[date] = Query(None, description="结束日期 YYYY-MM-DD（包含当天）"),
+    downsample: str = Query(timeseries.DOWNSAMPLE_LTTB, pattern="^(lttb|bucket|none)$"),
+    max_points: int = Query(timeseries.DEFAULT_MAX_POINTS, ge=3, le=5000),
+    accept: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
 ):
+    metric_names = timeseries.parse_metrics(metrics)
+    fmt = columnar.negotiate(accept)
+    if db.get(models.Elderly, elderly_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="老人信息不存在")
     try:
-        logger.info(f"请求报告 - ID: {follow_up_id}")
-        report_data = crud.get_follow_up_report_data(db, follow_up_id=follow_up_id)
-
-        if not report_data:
-            logger.error(f"报告数据为空 - ID: {follow_up_id}")
-            raise HTTPException(status_code=404, detail="报告数据为空")
-
-        logger.debug(f"报告数据: {report_data}")
-        return templates.TemplateResponse(
-            "reports/follow_up_report.html",
-            {
-                "request": request,
-                "report": report_data,
-                "now": datetime.now().strftime("%Y年%m月%d日 %H:%M"),
-                "title": f"随访报告 #{follow_up_id}"
-            }
+        data = timeseries.get_elderly_timeseries(
+            db, elderly_id, metric_names, start_date=start_date, end_date=end_date,
+            downsample=downsample, max_points=max_points
         )
+        if fmt != columnar.FORMAT_JSON:
+            return columnar.timeseries_response(fmt, data)
+        return FastJSONResponse(data, headers=columnar.VARY_HEADERS)
     except Exception as e:
-        logger.error(f"报告生成失败 - ID: {follow_up_id} - 错误: {str(e)}", exc_info=True)
-        raise
+        logger.error(f"获取指标时间序列失败 老人ID:{elderly_id}, 错误: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="获取指标时间序列失败"
+        )
+
+
+@router.get(
+    "/doctors/{doctor_id}/worklist",
+    response_model=schemas.WorklistResponse,
+    summary="医生随访待办列表",
+    description="按下次随访日期列出逾期、今天到期和一周内到期的老人，并返回各类人数"
+)
+async def get_doctor_worklist(
+    doctor_id: int,
+    bucket: str = Query(worklist.BUCKET_ALL, pattern="^(all|overdue|today|week)$"),
+    page: int = Query(1, ge=1),
+    per_page: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await worklist.get_doctor_worklist(db, doctor_id, bucket=bucket, page=page, per_page=per_page)
+
+
+@router.get(
+    "/doctors/{doctor_id}/alerts",
+    response_model=schemas.AlertListResponse,
+    summary="医生体征告警列表",
+    description="按时间倒序列出该医生名下随访产生的体征异常告警，默认只返回未处理的"
+)
+def get_doctor_alerts(
+    doctor_id: int,
+    alert_status: str = Query(alerts.ALERT_STATUS_OPEN, alias="status", pattern="^(open|resolved)$"),
+    page: int = Query(1, ge=1),
+    per_page: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    return alerts.get_doctor_alerts(db, doctor_id, alert_status=alert_status, page=page, per_page=per_page)
+
+
+@router.put(
+    "/alerts/{alert_id}/resolve",
+    response_model=schemas.FollowUpAlert,
+    summary="处理告警",
+    description="将告警标记为已处理"
+)
+def resolve_alert(alert_id: int, db: Session = Depends(get_db)):
+    return alerts.resolve_alert(db, alert_id)
 
 
 @router.get(
@@ -358,9 +561,9 @@ async def read_doctors(
     skip: int = 0,
     limit: int = 100,
     name: str = None,  # 新增搜索参数
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    return crud.get_doctors(db, skip=skip, limit=limit, name=name)
+    return await crud_async.get_doctors(db, skip=skip, limit=limit, name=name)
 
 @router.delete(
     "/follow-ups/{follow_up_id}",
@@ -368,7 +571,7 @@ async def read_doctors(
     summary="删除随访记录",
     description="根据ID删除随访记录"
 )
-async def delete_follow_up(
+def delete_follow_up(
     follow_up_id: int,
     db: Session = Depends(get_db)
 ):
@@ -385,14 +588,16 @@ async def delete_follow_up(
 
 @router.post(
     "/follow-ups/schedule",
+    response_model=schemas.JobSubmitResponse,
     summary="手动触发随访排期",
-    description="立即执行自动化随访排期任务（通常由系统定时调用）",
+    description="提交自动化随访排期任务，由后台工作进程执行；已有排期任务在排队或执行时返回该任务，可通过 /jobs/{job_id} 查询进度",
     status_code=202
 )
-async def trigger_follow_up_scheduling(
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
-):
+def trigger_follow_up_scheduling(db: Session = Depends(get_db)):
     """供外部调用的排期接口"""
-    background_tasks.add_task(schedule_follow_up_automation, db)
-    return {"message": "随访排期任务已提交后台执行"}
\ No newline at end of file
+    job, created = jobs.enqueue_job(db, jobs.JOB_FOLLOW_UP_SCHEDULING, dedup_key=jobs.JOB_FOLLOW_UP_SCHEDULING)
+    return {
+        "message": "随访排期任务已提交后台执行" if created else "已有随访排期任务在排队或执行",
+        "deduplicated": not created,
+        "job": job
+    }
\ No newline at end of file
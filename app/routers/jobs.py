@@ -0,0 +1,36 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends
+from fastapi.params import Query
+from sqlalchemy.orm import Session
+
+from .. import jobs, schemas
+from .follow_up import get_db
+
+router = APIRouter()
+
+
+@router.get(
+    "/jobs",
+    response_model=schemas.JobListResponse,
+    summary="后台任务列表",
+    description="按提交时间倒序列出后台任务，可按类型和状态过滤"
+)
+def list_jobs(
+    kind: Optional[str] = None,
+    job_status: Optional[str] = Query(None, alias="status", pattern="^(queued|running|succeeded|failed)$"),
+    page: int = Query(1, ge=1),
+    per_page: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    return jobs.list_jobs(db, kind=kind, job_status=job_status, page=page, per_page=per_page)
+
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=schemas.Job,
+    summary="后台任务状态",
+    description="查询任务状态、进度、重试次数和执行结果"
+)
+def get_job(job_id: int, db: Session = Depends(get_db)):
+    return jobs.get_job(db, job_id)
@@ -0,0 +1,177 @@
+import logging
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.cron import CronTrigger
+from sqlalchemy import case, insert, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+
+from . import jobs, models
+from .database import create_configured_engine
+
+# 多进程/多节点部署下的定时任务调度
+# 每个 Web 进程都运行选主线程，通过 scheduler_locks 表中带租约的锁行竞争主节点，只有主节点启动 APScheduler；
+# 主节点定期续约，退出或卡死导致租约过期后由其他进程接管。
+# 调度器使用数据库作业存储（apscheduler_jobs 表），接管后按 misfire_grace_time 补跑错过的触发（多次错过合并为一次）。
+# 定时任务本身只向后台任务队列提交任务（带去重键），实际执行在任务工作进程中，不占用事件循环和 Web 进程；
+# 即使主节点切换瞬间出现两个调度器，去重键也保证同一任务不会并发执行。
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_LOCK_NAME = "scheduler_leader"
+SCHEDULER_LEASE_SECONDS = 60
+SCHEDULER_RENEW_SECONDS = 15  # 续约/竞选间隔，须明显小于租约时长
+SCHEDULER_JOBSTORE_TABLE = "apscheduler_jobs"
+SCHEDULER_THREADS = 2
+SCHEDULER_ENABLED_ENV = "SCHEDULER_ENABLED"  # 设为 0 时该进程不参与调度
+
+JOB_DEFAULTS = {
+    "coalesce": True,  # 停机期间错过多次触发时只补跑一次
+    "misfire_grace_time": 3600,  # 错过触发时间 1 小时内仍补跑
+    "max_instances": 1,
+}
+
+# 定时任务定义：(作业ID, 触发器, 提交的后台任务类型)
+SCHEDULED_JOBS = [
+    ("follow_up_scheduler", CronTrigger(hour=9, minute=0), jobs.JOB_RECURRING_FOLLOW_UPS),  # 每天9:00 生成定期随访
+]
+
+_job_sessions: sessionmaker = None
+
+
+def acquire_lock(db: Session, name: str, owner: str, lease_seconds: int = SCHEDULER_LEASE_SECONDS,
+                 now: datetime = None) -> bool:
+    """获取或续约锁：锁空闲、租约已过期或本来就由 owner 持有时成功"""
+    now = now or datetime.now()
+    lock = models.SchedulerLock
+    if db.get(lock, name) is None:
+        try:
+            db.execute(insert(lock).values(name=name))
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+    acquired = db.execute(
+        update(lock)
+        .where(lock.name == name, or_(lock.owner == owner, lock.owner.is_(None), lock.locked_until < now))
+        .values(owner=owner, locked_until=now + timedelta(seconds=lease_seconds),
+                acquired_at=case((lock.owner == owner, lock.acquired_at), else_=now))
+    ).rowcount
+    db.commit()
+    return acquired == 1
+
+
+def release_lock(db: Session, name: str, owner: str):
+    lock = models.SchedulerLock
+    db.execute(
+        update(lock).where(lock.name == name, lock.owner == owner).values(owner=None, locked_until=None)
+    )
+    db.commit()
+
+
+def submit_scheduled_job(kind: str):
+    """定时触发时调用（调度器线程池中执行）：向后台任务队列提交任务，同类任务未结束时不重复提交"""
+    with _job_sessions() as db:
+        job, created = jobs.enqueue_job(db, kind, dedup_key=kind)
+    if created:
+        logger.info(f"定时任务已提交: {kind}（任务 {job.id}）")
+    else:
+        logger.info(f"定时任务 {kind} 上一次尚未结束（任务 {job.id}），本次跳过")
+
+
+class ClusterScheduler:
+    """选主 + 仅在主节点运行的 APScheduler"""
+
+    def __init__(self, url: str, owner: str = None, lease_seconds: int = SCHEDULER_LEASE_SECONDS,
+                 renew_seconds: int = SCHEDULER_RENEW_SECONDS):
+        global _job_sessions
+        self.engine = create_configured_engine(url, name="scheduler", pool_size=2, max_overflow=4)
+        self.sessions = sessionmaker(bind=self.engine, autoflush=False)
+        _job_sessions = self.sessions
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self.renew_seconds = renew_seconds
+        self._scheduler: Optional[BackgroundScheduler] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._scheduler is not None
+
+    def start(self):
+        models.SchedulerLock.__table__.create(bind=self.engine, checkfirst=True)
+        self._thread = threading.Thread(target=self._run, name="scheduler-election", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with self.sessions() as db:
+                    leader = acquire_lock(db, SCHEDULER_LOCK_NAME, self.owner, self.lease_seconds)
+            except Exception as e:
+                # 无法续约时按失去主节点处理，避免租约过期后与新主节点同时调度
+                logger.error(f"调度器选主失败: {str(e)}")
+                leader = False
+            if leader and self._scheduler is None:
+                self._start_scheduler()
+            elif not leader and self._scheduler is not None:
+                logger.warning(f"{self.owner} 失去调度主节点身份，停止调度器")
+                self._stop_scheduler()
+            self._stop.wait(self.renew_seconds)
+
+    def _start_scheduler(self):
+        scheduler = BackgroundScheduler(
+            jobstores={"default": SQLAlchemyJobStore(engine=self.engine, tablename=SCHEDULER_JOBSTORE_TABLE)},
+            executors={"default": ThreadPoolExecutor(SCHEDULER_THREADS)},
+            job_defaults=JOB_DEFAULTS,
+        )
+        scheduler.start(paused=True)
+        # 以代码中的定义为准覆盖作业存储中的同名作业（保留其下次触发时间以便补跑），并清理已删除的作业
+        defined = {job_id for job_id, _, _ in SCHEDULED_JOBS}
+        for stale in scheduler.get_jobs():
+            if stale.id not in defined:
+                scheduler.remove_job(stale.id)
+        for job_id, trigger, kind in SCHEDULED_JOBS:
+            existing = scheduler.get_job(job_id)
+            if existing is not None and str(existing.trigger) == str(trigger):
+                scheduler.modify_job(job_id, func=submit_scheduled_job, args=[kind])
+            else:
+                scheduler.add_job(submit_scheduled_job, trigger, args=[kind], id=job_id, replace_existing=True)
+        scheduler.resume()
+        self._scheduler = scheduler
+        logger.info(f"{self.owner} 成为调度主节点")
+
+    def _stop_scheduler(self):
+        scheduler, self._scheduler = self._scheduler, None
+        try:
+            scheduler.shutdown(wait=False)
+        except Exception as e:
+            logger.error(f"停止调度器失败: {str(e)}")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._scheduler is not None:
+            self._stop_scheduler()
+            try:
+                with self.sessions() as db:
+                    release_lock(db, SCHEDULER_LOCK_NAME, self.owner)
+            except Exception as e:
+                logger.error(f"释放调度锁失败: {str(e)}")
+        self.engine.dispose()
+
+
+def start_cluster_scheduler(url: str) -> Optional[ClusterScheduler]:
+    """Web 进程启动时调用；SCHEDULER_ENABLED=0 的进程不参与调度"""
+    if os.getenv(SCHEDULER_ENABLED_ENV, "1") == "0":
+        return None
+    return ClusterScheduler(url).start()
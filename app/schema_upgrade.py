@@ -0,0 +1,57 @@
+import logging
+from typing import List
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+
+from .database import Base
+
+# 已有数据库的表结构升级
+# create_all 只创建缺失的表，不会修改已存在的表：模型中为已有表（如 follow_ups）新增的列和索引
+# 不会出现在已部署的数据库中，ORM 查询会因“未知列”失败，唯一索引（uq_recurrence_source 等）提供的去重保护也不存在。
+# upgrade_schema 对照模型逐表检查，只补充缺失的列（ALTER TABLE ... ADD COLUMN）和索引（CREATE INDEX），
+# 可重复执行；启动时在 create_all 之后自动运行，也可单独执行:
+#     python -m app.schema_upgrade
+
+logger = logging.getLogger(__name__)
+
+
+def upgrade_schema(bind) -> List[str]:
+    """补充已有表缺失的列和索引，返回执行的 DDL；新增列必须可为空或带服务端默认值"""
+    executed = []
+    with bind.begin() as connection:
+        inspector = inspect(connection)
+        existing_tables = set(inspector.get_table_names())
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                spec = CreateColumn(column).compile(dialect=connection.dialect)
+                ddl = f"ALTER TABLE {connection.dialect.identifier_preparer.format_table(table)} ADD COLUMN {spec}"
+                connection.execute(text(ddl))
+                executed.append(ddl)
+
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            existing_indexes.update(
+                constraint["name"] for constraint in inspector.get_unique_constraints(table.name)
+            )
+            for index in sorted(table.indexes, key=lambda item: item.name):
+                if index.name in existing_indexes:
+                    continue
+                index.create(bind=connection)
+                executed.append(f"CREATE INDEX {index.name} ON {table.name}")
+
+    for ddl in executed:
+        logger.info(f"表结构升级: {ddl}")
+    return executed
+
+
+if __name__ == "__main__":
+    from .database import engine
+
+    logging.basicConfig(level=logging.INFO)
+    statements = upgrade_schema(engine)
+    print(f"表结构升级完成，执行 {len(statements)} 条 DDL" if statements else "表结构已是最新")
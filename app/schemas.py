@@ -1,5 +1,6 @@
-from datetime import datetime, timezone
-from typing import Optional,List,Any,ForwardRef
+import json
+from datetime import date, datetime, timezone
+from typing import Dict, Optional,List,Any,ForwardRef
 from pydantic import BaseModel, Field
 from pydantic import validator
 from sqlalchemy.dialects.postgresql import Any
@@ -30,9 +31,27 @@ class FollowUpSimple(BaseModel):
     class Config:
         from_attributes = True
 
+class FollowUpListItem(BaseModel):
+    """列表项：默认字段与 FollowUpSimple 相同；指定 fields 时只输出请求的字段（指标列等按原名输出）"""
+    id: int
+    elderly_id: Optional[int] = None
+    doctor_id: Optional[int] = None
+    followup_date: Optional[datetime] = None
+    content: Optional[str] = None
+    elderly: Optional['Elderly'] = None
+    doctor: Optional['Doctor'] = None
+
+    class Config:
+        extra = "allow"
+
 # 然后定义具体响应模型
 class FollowUpListResponse(PaginatedResponse):
-    items: List[FollowUpSimple]
+    items: List[FollowUpListItem]
+    # 游标分页：不透明游标，传给 cursor 参数即可翻到下一页/上一页
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+    # count=estimate 时 total 来自表统计信息，仅供参考
+    total_is_estimate: bool = False
 
 
 
@@ -182,6 +201,157 @@ class FollowUpCreate(BaseModel):
             raise ValueError("日期格式应为 YYYY-MM-DD HH:mm:ss")
 
 
+class BulkIngestError(BaseModel):
+    index: int = Field(..., description="出错记录在提交数据中的序号(从0开始)")
+    error: str = Field(..., description="错误原因")
+
+
+class BulkIngestResult(BaseModel):
+    received: int = Field(..., description="收到的记录数")
+    created: int = Field(..., description="成功写入的记录数")
+    failed: int = Field(..., description="失败的记录数")
+    errors: List[BulkIngestError] = Field(default_factory=list, description="逐条错误信息")
+
+
+class MetricSeries(BaseModel):
+    t: List[int] = Field(..., description="随访时间（毫秒时间戳）")
+    v: List[float] = Field(..., description="指标值")
+    raw_points: int = Field(..., description="降采样前的点数")
+
+
+class ElderlyTimeSeriesResponse(BaseModel):
+    elderly_id: int
+    downsample: str
+    max_points: int
+    records: int = Field(..., description="时间窗口内的随访记录数")
+    series: Dict[str, MetricSeries]
+
+
+class MetricHistogram(BaseModel):
+    edges: List[float] = Field(..., description="分箱边界（所有分组相同）")
+    counts: List[int]
+
+
+class MetricGroupSummary(BaseModel):
+    group: str = Field(..., description="分组名称（医生姓名/年龄段/全部）")
+    group_key: Optional[int] = None
+    count: int
+    mean: Optional[float] = None
+    std: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    percentiles: Dict[str, Optional[float]]
+    histogram: MetricHistogram
+
+
+class BPControlGroup(BaseModel):
+    doctor_id: Optional[int] = None
+    doctor_name: str
+    records: int = Field(..., description="有完整血压数据的随访记录数")
+    controlled: int = Field(..., description="血压达标(<140/90)的记录数")
+    control_rate: float
+
+
+class BMIAgeBand(BaseModel):
+    age_band: str
+    count: int
+    categories: Dict[str, int] = Field(..., description="偏瘦/正常/超重/肥胖 人次")
+    percentiles: Dict[str, Optional[float]]
+
+
+class UrinePrevalence(BaseModel):
+    item: str = Field(..., description="尿常规项目列名，any 表示任一项目异常")
+    tested: int
+    abnormal: int
+    prevalence: Optional[float] = None
+
+
+class WorklistItem(BaseModel):
+    elderly_id: int
+    elderly_name: Optional[str] = None
+    age: Optional[int] = None
+    contact: Optional[str] = None
+    last_followup_id: int
+    last_followup_date: Optional[datetime] = None
+    next_follow_up_date: datetime
+    days_overdue: int = Field(..., description="逾期天数，未逾期为0")
+    bucket: str = Field(..., description="overdue / today / week")
+    systolic_blood_pressure: Optional[int] = None
+    diastolic_blood_pressure: Optional[int] = None
+    blood_glucose: Optional[float] = None
+
+
+class WorklistResponse(PaginatedResponse):
+    doctor_id: int
+    bucket: str
+    counts: Dict[str, int] = Field(..., description="各紧急程度人数")
+    items: List[WorklistItem]
+
+
+class FollowUpAlert(BaseModel):
+    id: int
+    follow_up_id: int
+    elderly_id: int
+    doctor_id: int
+    rule: str
+    metric: str
+    value: Optional[float] = None
+    severity: str = Field(..., description="critical / warning")
+    message: str
+    status: str = Field(..., description="open / resolved")
+    created_at: Optional[datetime] = None
+    resolved_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class AlertListResponse(PaginatedResponse):
+    items: List[FollowUpAlert]
+
+
+class Job(BaseModel):
+    id: int
+    kind: str
+    status: str = Field(..., description="queued / running / succeeded / failed")
+    payload: Optional[Dict[str, Any]] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    attempts: int
+    max_attempts: int
+    progress: int = Field(..., description="进度 0-100")
+    progress_message: Optional[str] = None
+    run_after: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    @validator('payload', 'result', pre=True)
+    def parse_json(cls, value):
+        if isinstance(value, str):
+            return json.loads(value)
+        return value
+
+    class Config:
+        from_attributes = True
+
+
+class JobSubmitResponse(BaseModel):
+    message: str
+    deduplicated: bool = Field(..., description="已有相同任务在排队或执行，未重复提交")
+    job: Job
+
+
+class JobListResponse(PaginatedResponse):
+    items: List[Job]
+
+
+class NameSuggestion(BaseModel):
+    id: int
+    name: str
+    detail: str = Field("", description="用于区分同名的简短信息（老人：年龄性别，医生：科室）")
+
+
 class FollowUpReport(BaseModel):
     elderly_name: str = Field(..., description="老年人姓名")
     doctor_name: str = Field(..., description="医生姓名")
@@ -210,6 +380,8 @@ class ElderlyBase(BaseModel):
     def parse_birth_date(cls, value):
         if isinstance(value, int):
             return f"{value:08d}"[:4] + '-' + f"{value:08d}"[4:6] + '-' + f"{value:08d}"[6:8]
+        if isinstance(value, date):
+            return value.strftime("%Y-%m-%d")
         return value
 
     class Config:
@@ -269,11 +441,35 @@ class Elderly(BaseModel):
     def parse_birth_date(cls, value):
         if isinstance(value, int):
             return f"{value:08d}"[:4] + '-' + f"{value:08d}"[4:6] + '-' + f"{value:08d}"[6:8]
+        if isinstance(value, date):
+            return value.strftime("%Y-%m-%d")
         return value
 
     class Config:
         from_attributes = True
 
+
+class LatestFollowUpSummary(BaseModel):
+    last_followup_id: int
+    last_followup_date: Optional[datetime] = None
+    next_follow_up_date: Optional[datetime] = None
+    doctor_id: Optional[int] = None
+    systolic_blood_pressure: Optional[int] = None
+    diastolic_blood_pressure: Optional[int] = None
+    heart_rate: Optional[int] = None
+    blood_glucose: Optional[float] = None
+    bmi: Optional[float] = None
+    weight: Optional[float] = None
+
+    class Config:
+        from_attributes = True
+
+
+class ElderlyWithLatest(Elderly):
+    """老人列表项，附带最近一次随访汇总"""
+    latest_follow_up: Optional[LatestFollowUpSummary] = None
+
+
 class Doctor(BaseModel):
     id: int
     name: str
@@ -0,0 +1,136 @@
+import logging
+from typing import List, Set
+
+from sqlalchemy import and_, delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from . import models
+
+# 姓名搜索索引
+# 原来的 name ILIKE '%关键字%' 无法使用 name 上的 B 树索引，只能全表扫描；中文姓名也无法用前缀索引。
+# 这里把每个姓名拆成单字和相邻两字（bigram）写入 name_search_grams 倒排表：
+# 搜索时先用关键字的 bigram 在倒排表中求交集得到候选ID，再对少量候选做 ILIKE 精确确认。
+# 老人/医生的新增、改名、删除都在同一事务中同步维护索引。
+
+logger = logging.getLogger(__name__)
+
+ENTITY_ELDERLY = "elderly"
+ENTITY_DOCTOR = "doctor"
+ENTITY_MODELS = {
+    ENTITY_ELDERLY: models.Elderly,
+    ENTITY_DOCTOR: models.Doctor,
+}
+REBUILD_CHUNK_SIZE = 5000
+
+
+def _normalize(name: str) -> str:
+    return (name or "").strip().lower()
+
+
+def name_grams(name: str) -> Set[str]:
+    """姓名的全部单字和 bigram"""
+    text = _normalize(name)
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    grams.discard(" ")
+    return grams
+
+
+def query_grams(term: str) -> List[str]:
+    """搜索关键字对应的 gram：单字关键字查单字，否则查全部 bigram"""
+    text = _normalize(term)
+    if len(text) <= 1:
+        return [text] if text else []
+    return sorted({text[i:i + 2] for i in range(len(text) - 1)})
+
+
+def index_name(db: Session, entity_type: str, entity_id: int, name: str):
+    """写入（或重建）一个姓名的索引项，不提交事务，由调用方与业务数据一起提交"""
+    remove_name(db, entity_type, entity_id)
+    rows = [
+        {"entity_type": entity_type, "gram": gram, "entity_id": entity_id}
+        for gram in name_grams(name)
+    ]
+    if rows:
+        db.execute(insert(models.NameSearchGram), rows)
+
+
+def remove_name(db: Session, entity_type: str, entity_id: int):
+    db.execute(delete(models.NameSearchGram).where(
+        models.NameSearchGram.entity_type == entity_type,
+        models.NameSearchGram.entity_id == entity_id
+    ))
+
+
+def matching_ids(entity_type: str, term: str):
+    """返回候选ID的子查询：包含关键字全部 gram 的实体"""
+    grams = query_grams(term)
+    gram_table = models.NameSearchGram
+    stmt = select(gram_table.entity_id).where(gram_table.entity_type == entity_type)
+    if len(grams) == 1:
+        return stmt.where(gram_table.gram == grams[0])
+    return stmt.where(gram_table.gram.in_(grams)) \
+        .group_by(gram_table.entity_id) \
+        .having(func.count() == len(grams))
+
+
+def name_filter(entity_type: str, term: str):
+    """姓名模糊搜索条件：先走倒排索引取候选，再用 ILIKE 确认子串匹配"""
+    model = ENTITY_MODELS[entity_type]
+    if not query_grams(term):
+        return model.name.ilike(f"%{term}%")
+    return and_(
+        model.id.in_(matching_ids(entity_type, term)),
+        model.name.ilike(f"%{term.strip()}%")
+    )
+
+
+def rebuild_search_index(db: Session, entity_type: str = None, chunk_size: int = REBUILD_CHUNK_SIZE):
+    """全量重建索引（按主键分批读取，每批一个事务）"""
+    entity_types = [entity_type] if entity_type else list(ENTITY_MODELS)
+    total = 0
+    for current_type in entity_types:
+        model = ENTITY_MODELS[current_type]
+        db.execute(delete(models.NameSearchGram).where(models.NameSearchGram.entity_type == current_type))
+        db.commit()
+        last_id = 0
+        while True:
+            batch = db.execute(
+                select(model.id, model.name).where(model.id > last_id).order_by(model.id).limit(chunk_size)
+            ).all()
+            if not batch:
+                break
+            rows = [
+                {"entity_type": current_type, "gram": gram, "entity_id": entity_id}
+                for entity_id, name in batch
+                for gram in name_grams(name)
+            ]
+            if rows:
+                db.execute(insert(models.NameSearchGram), rows)
+            db.commit()
+            last_id = batch[-1][0]
+            total += len(batch)
+    logger.info(f"姓名搜索索引重建完成，共 {total} 条")
+    return total
+
+
+def ensure_search_index(db: Session):
+    """启动时检查：索引为空而老人/医生表有数据时（首次部署）自动全量构建"""
+    has_index = db.execute(select(models.NameSearchGram.entity_id).limit(1)).first() is not None
+    if has_index:
+        return
+    has_names = any(
+        db.execute(select(model.id).limit(1)).first() is not None
+        for model in ENTITY_MODELS.values()
+    )
+    if has_names:
+        logger.info("姓名搜索索引为空，开始全量构建")
+        rebuild_search_index(db)
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+
+    with SessionLocal() as session:
+        count = rebuild_search_index(session)
+        print(f"姓名搜索索引重建完成，共 {count} 条")
@@ -0,0 +1,235 @@
+import bisect
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+from .search_index import ENTITY_DOCTOR, ENTITY_ELDERLY
+from .table_versions import TABLE_DOCTORS, TABLE_ELDERLY, read_table_versions
+
+try:
+    from pypinyin import Style, lazy_pinyin  # 可选依赖，安装后支持按拼音全拼/首字母联想
+except ImportError:
+    lazy_pinyin = None
+
+# 姓名输入联想
+# 前端每次按键都请求 /elderly 或 /doctors 列表，取回最多 100 条完整记录。
+# 这里在进程内为姓名（及拼音）维护一个有序数组，前缀查询用二分定位，只返回 (id, 姓名, 简短区分信息)。
+# 启动时全量构建，之后由 crud 中老人/医生的增删改同步更新；多进程部署时每个进程各自维护一份：
+# 查询时至多每 SUGGEST_REFRESH_INTERVAL 秒检查一次 elderly/doctors 的表版本号（table_versions，
+# 任何进程的写入都会递增），与构建时不同则在后台线程重新加载该索引，其他进程的增删改因此最多延迟数秒可见。
+# 按拼音全拼/首字母联想（如 zs -> 张三）需要安装可选依赖 pypinyin（pip install pypinyin）；
+# 未安装时只按姓名文字前缀匹配，构建索引时记录一次警告。
+
+logger = logging.getLogger(__name__)
+
+SUGGEST_DEFAULT_LIMIT = 10
+SUGGEST_MAX_LIMIT = 50
+SUGGEST_BUILD_CHUNK_SIZE = 5000
+SUGGEST_REFRESH_INTERVAL = 5.0  # 检查其他进程写入的最短间隔(秒)
+
+# 索引对应的表（版本号变化时重新加载）
+ENTITY_TABLES = {ENTITY_ELDERLY: TABLE_ELDERLY, ENTITY_DOCTOR: TABLE_DOCTORS}
+
+
+def suggest_keys(name: str) -> List[str]:
+    """姓名对应的全部联想键：姓名本身，以及（安装 pypinyin 时）拼音全拼和首字母"""
+    text = (name or "").strip().lower()
+    if not text:
+        return []
+    keys = {text}
+    if lazy_pinyin is not None:
+        keys.add("".join(lazy_pinyin(text)).lower())
+        keys.add("".join(lazy_pinyin(text, style=Style.FIRST_LETTER)).lower())
+    return sorted(keys)
+
+
+class SuggestIndex:
+    """按联想键排序的数组 + 二分前缀查找，线程安全"""
+
+    def __init__(self):
+        self._keys: List[str] = []
+        self._ids: List[int] = []
+        self._entries: Dict[int, Tuple[str, str, List[str]]] = {}  # id -> (姓名, 区分信息, 联想键)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self, rows):
+        """用 (id, 姓名, 区分信息) 全量替换索引"""
+        entries = {}
+        pairs = []
+        for entity_id, name, detail in rows:
+            keys = suggest_keys(name)
+            entries[entity_id] = (name, detail, keys)
+            pairs.extend((key, entity_id) for key in keys)
+        pairs.sort()
+        with self._lock:
+            self._entries = entries
+            self._keys = [key for key, _ in pairs]
+            self._ids = [entity_id for _, entity_id in pairs]
+
+    def upsert(self, entity_id: int, name: str, detail: str):
+        keys = suggest_keys(name)
+        with self._lock:
+            self._remove_locked(entity_id)
+            self._entries[entity_id] = (name, detail, keys)
+            for key in keys:
+                position = bisect.bisect_left(self._keys, key)
+                # 同一个键按 id 排序，保证结果稳定
+                while position < len(self._keys) and self._keys[position] == key and self._ids[position] < entity_id:
+                    position += 1
+                self._keys.insert(position, key)
+                self._ids.insert(position, entity_id)
+
+    def remove(self, entity_id: int):
+        with self._lock:
+            self._remove_locked(entity_id)
+
+    def _remove_locked(self, entity_id: int):
+        entry = self._entries.pop(entity_id, None)
+        if entry is None:
+            return
+        for key in entry[2]:
+            position = bisect.bisect_left(self._keys, key)
+            while position < len(self._keys) and self._keys[position] == key:
+                if self._ids[position] == entity_id:
+                    del self._keys[position]
+                    del self._ids[position]
+                    break
+                position += 1
+
+    def search(self, prefix: str, limit: int = SUGGEST_DEFAULT_LIMIT) -> List[dict]:
+        """返回联想键以 prefix 开头的前 limit 个结果（同一实体只出现一次）"""
+        prefix = (prefix or "").strip().lower()
+        if not prefix:
+            return []
+        results = []
+        seen = set()
+        with self._lock:
+            position = bisect.bisect_left(self._keys, prefix)
+            while position < len(self._keys) and len(results) < limit:
+                if not self._keys[position].startswith(prefix):
+                    break
+                entity_id = self._ids[position]
+                position += 1
+                if entity_id in seen:
+                    continue
+                seen.add(entity_id)
+                name, detail, _ = self._entries[entity_id]
+                results.append({"id": entity_id, "name": name, "detail": detail})
+        return results
+
+
+suggest_indexes = {
+    ENTITY_ELDERLY: SuggestIndex(),
+    ENTITY_DOCTOR: SuggestIndex(),
+}
+
+
+def elderly_detail(elderly) -> str:
+    """老人的区分信息：年龄/性别"""
+    gender = {0: "女", 1: "男"}.get(elderly.gender, "")
+    return f"{elderly.age}岁 {gender}".strip() if elderly.age is not None else gender
+
+
+def doctor_detail(doctor) -> str:
+    """医生的区分信息：科室"""
+    return doctor.department or ""
+
+
+def sync_elderly(elderly):
+    """老人新增/修改后调用"""
+    suggest_indexes[ENTITY_ELDERLY].upsert(elderly.id, elderly.name, elderly_detail(elderly))
+
+
+def sync_doctor(doctor):
+    """医生新增/修改后调用"""
+    suggest_indexes[ENTITY_DOCTOR].upsert(doctor.id, doctor.name, doctor_detail(doctor))
+
+
+def remove_entity(entity_type: str, entity_id: int):
+    """老人/医生删除后调用"""
+    suggest_indexes[entity_type].remove(entity_id)
+
+
+_source_bind = None  # 构建索引时使用的数据库，后台重新加载时沿用
+_loaded_versions: Dict[str, int] = {}  # 各索引构建时对应的表版本号
+_last_check = 0.0
+_refresh_lock = threading.Lock()
+_pinyin_warned = False
+
+
+def build_suggest_indexes(db: Session, chunk_size: int = SUGGEST_BUILD_CHUNK_SIZE,
+                          entity_types: Optional[List[str]] = None):
+    """启动时全量构建（按主键分批读取，只读取所需的列）；entity_types 为空时构建全部索引"""
+    global _source_bind, _pinyin_warned
+    if lazy_pinyin is None and not _pinyin_warned:
+        logger.warning("未安装 pypinyin，姓名联想不支持拼音匹配（pip install pypinyin）")
+        _pinyin_warned = True
+    sources = (
+        (ENTITY_ELDERLY, models.Elderly,
+         (models.Elderly.id, models.Elderly.name, models.Elderly.age, models.Elderly.gender), elderly_detail),
+        (ENTITY_DOCTOR, models.Doctor,
+         (models.Doctor.id, models.Doctor.name, models.Doctor.department), doctor_detail),
+    )
+    # 先读版本号再读数据：构建期间的写入会使版本号不一致，下次检查时再加载一次
+    versions = read_table_versions(db)
+    for entity_type, model, columns, detail in sources:
+        if entity_types is not None and entity_type not in entity_types:
+            continue
+        rows = []
+        last_id = 0
+        while True:
+            batch = db.execute(
+                select(*columns).where(model.id > last_id).order_by(model.id).limit(chunk_size)
+            ).all()
+            if not batch:
+                break
+            rows.extend((row.id, row.name, detail(row)) for row in batch)
+            last_id = batch[-1].id
+        suggest_indexes[entity_type].load(rows)
+        _loaded_versions[entity_type] = versions.get(ENTITY_TABLES[entity_type], 0)
+        logger.info(f"姓名联想索引构建完成 {entity_type}: {len(rows)} 条")
+    _source_bind = db.get_bind()
+
+
+def _reload_stale_indexes():
+    try:
+        with Session(bind=_source_bind) as db:
+            versions = read_table_versions(db)
+            stale = [
+                entity_type for entity_type, table in ENTITY_TABLES.items()
+                if versions.get(table, 0) != _loaded_versions.get(entity_type)
+            ]
+            if stale:
+                build_suggest_indexes(db, entity_types=stale)
+    except Exception as e:
+        logger.error(f"重新加载姓名联想索引失败: {str(e)}")
+    finally:
+        _refresh_lock.release()
+
+
+def refresh_if_stale():
+    """
+    至多每 SUGGEST_REFRESH_INTERVAL 秒检查一次表版本号，有变化时在后台线程重新加载；
+    不阻塞查询，加载完成前仍使用旧索引。未构建过索引（如独立脚本）时不检查
+    """
+    global _last_check
+    if _source_bind is None or time.monotonic() - _last_check < SUGGEST_REFRESH_INTERVAL:
+        return
+    if not _refresh_lock.acquire(blocking=False):
+        return
+    _last_check = time.monotonic()
+    threading.Thread(target=_reload_stale_indexes, name="suggest-refresh", daemon=True).start()
+
+
+def suggest(entity_type: str, prefix: str, limit: Optional[int] = None) -> List[dict]:
+    refresh_if_stale()
+    limit = min(limit or SUGGEST_DEFAULT_LIMIT, SUGGEST_MAX_LIMIT)
+    return suggest_indexes[entity_type].search(prefix, limit)
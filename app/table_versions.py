@@ -0,0 +1,79 @@
+import threading
+import time
+from typing import Dict, Iterable, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from . import models
+
+# 表版本号（table_versions 表）
+# crud 中的写操作在提交前、同一事务中递增受影响表的版本号。API 工作进程、后台任务进程读取的是同一份版本号：
+# HTTP 缓存据此计算 ETag，姓名联想索引据此判断是否需要重新加载，任何进程的写入提交后其他进程立即可见。
+# 版本行从递增到提交一直加锁，因此递增放在提交前最后一步；一条语句按表名顺序加锁，不会互相死锁。
+
+TABLE_ELDERLY = models.Elderly.__tablename__
+TABLE_DOCTORS = models.Doctor.__tablename__
+TABLE_FOLLOW_UPS = models.FollowUp.__tablename__
+
+
+def bump_table_versions(db: Session, *tables: str):
+    """递增版本号（版本行不存在时插入），不提交事务，由调用方与数据一起提交"""
+    names = sorted(set(tables))
+    if not names:
+        return
+    table = models.TableVersion.__table__
+    rows = [{"name": name, "version": 1} for name in names]
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        stmt = mysql_insert(table).values(rows).on_duplicate_key_update(version=table.c.version + 1)
+    elif dialect in ("sqlite", "postgresql"):
+        upsert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+        stmt = upsert(table).values(rows).on_conflict_do_update(
+            index_elements=[table.c.name], set_={"version": table.c.version + 1}
+        )
+    else:
+        existing = set(db.execute(select(table.c.name).where(table.c.name.in_(names))).scalars())
+        for name in names:
+            if name in existing:
+                db.execute(table.update().where(table.c.name == name).values(version=table.c.version + 1))
+            else:
+                db.execute(table.insert().values(name=name, version=1))
+        return
+    db.execute(stmt)
+
+
+def read_table_versions(connection) -> Dict[str, int]:
+    """全部表的版本号（表很小，一次读出）；connection 为 Connection 或 Session"""
+    table = models.TableVersion.__table__
+    return {name: version for name, version in connection.execute(select(table.c.name, table.c.version))}
+
+
+class TableVersionReader:
+    """按 bind 读取版本号，check_interval 秒内复用上次读取的结果（0 表示每次都读取）"""
+
+    def __init__(self, bind, check_interval: float = 0.0):
+        self.bind = bind
+        self.check_interval = check_interval
+        self._versions: Dict[str, int] = {}
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def get(self, tables: Iterable[str]) -> Tuple[int, ...]:
+        with self._lock:
+            fresh = self._checked_at is not None and time.monotonic() - self._checked_at < self.check_interval
+            versions = self._versions
+        if not fresh:
+            with self.bind.connect() as connection:
+                versions = read_table_versions(connection)
+            with self._lock:
+                self._versions = versions
+                self._checked_at = time.monotonic()
+        return tuple(versions.get(table, 0) for table in tables)
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._versions)
@@ -0,0 +1,139 @@
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import DECIMAL, Integer, select
+from sqlalchemy.orm import Session
+
+from . import models
+
+# 单个老人的健康指标时间序列（趋势图用）
+# 只查询 followup_date 和所需指标列，走 (elderly_id, followup_date) 索引；
+# 结果按指标返回列式数组（时间戳毫秒 t[] 与数值 v[]），点数过多时在服务端降采样。
+
+DOWNSAMPLE_NONE = "none"
+DOWNSAMPLE_LTTB = "lttb"  # Largest-Triangle-Three-Buckets：保留曲线形状（峰值、拐点）
+DOWNSAMPLE_BUCKET = "bucket"  # 按等长时间段取平均值
+
+DEFAULT_MAX_POINTS = 500
+DEFAULT_METRICS = ["systolic_blood_pressure", "diastolic_blood_pressure", "blood_glucose", "bmi"]
+
+# 可查询的指标：所有数值型健康指标列
+_NON_METRIC_COLUMNS = {"id", "elderly_id", "doctor_id", "schedule_interval", "recurrence_source_id"}
+METRIC_COLUMNS = [
+    column.name for column in models.FollowUp.__table__.columns
+    if isinstance(column.type, (DECIMAL, Integer)) and column.name not in _NON_METRIC_COLUMNS
+]
+
+Point = Tuple[float, float]
+
+
+def parse_metrics(metrics: Optional[str]) -> List[str]:
+    """解析 metrics=a,b,c 参数，未指定时返回常用指标"""
+    if not metrics:
+        return list(DEFAULT_METRICS)
+    requested = list(dict.fromkeys(name.strip() for name in metrics.split(",") if name.strip()))
+    unknown = [name for name in requested if name not in METRIC_COLUMNS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"未知的指标: {', '.join(unknown)}"
+        )
+    return requested
+
+
+def _timestamp_ms(value: datetime) -> int:
+    return int(value.timestamp() * 1000)
+
+
+def lttb(points: List[Point], threshold: int) -> List[Point]:
+    """Largest-Triangle-Three-Buckets 降采样，保留首尾点，points 须按时间排序"""
+    if threshold >= len(points) or threshold < 3:
+        return points
+    sampled = [points[0]]
+    bucket_size = (len(points) - 2) / (threshold - 2)
+    previous = 0
+    for bucket in range(threshold - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+        # 下一个桶的平均点作为三角形的第三个顶点
+        next_start = end
+        next_end = min(int((bucket + 2) * bucket_size) + 1, len(points))
+        next_points = points[next_start:next_end] or [points[-1]]
+        avg_t = sum(point[0] for point in next_points) / len(next_points)
+        avg_v = sum(point[1] for point in next_points) / len(next_points)
+
+        prev_t, prev_v = points[previous]
+        best_area = -1.0
+        best_index = start
+        for index in range(start, end):
+            t, v = points[index]
+            area = abs((prev_t - avg_t) * (v - prev_v) - (prev_t - t) * (avg_v - prev_v))
+            if area > best_area:
+                best_area = area
+                best_index = index
+        sampled.append(points[best_index])
+        previous = best_index
+    sampled.append(points[-1])
+    return sampled
+
+
+def bucket_average(points: List[Point], buckets: int) -> List[Point]:
+    """把时间范围等分为 buckets 段，每段输出 (平均时间, 平均值)，空段跳过"""
+    if buckets >= len(points) or buckets < 1:
+        return points
+    first, last = points[0][0], points[-1][0]
+    width = (last - first) / buckets or 1
+    sums = {}
+    for t, v in points:
+        index = min(int((t - first) / width), buckets - 1)
+        total = sums.setdefault(index, [0.0, 0.0, 0])
+        total[0] += t
+        total[1] += v
+        total[2] += 1
+    return [(t_sum / count, v_sum / count) for _, (t_sum, v_sum, count) in sorted(sums.items())]
+
+
+DOWNSAMPLERS = {
+    DOWNSAMPLE_LTTB: lttb,
+    DOWNSAMPLE_BUCKET: bucket_average,
+}
+
+
+def get_elderly_timeseries(db: Session, elderly_id: int, metrics: List[str], start_date: date = None,
+                           end_date: date = None, downsample: str = DOWNSAMPLE_LTTB,
+                           max_points: int = DEFAULT_MAX_POINTS) -> dict:
+    """查询指定老人的指标序列，每个指标单独去掉空值并降采样"""
+    table = models.FollowUp.__table__
+    stmt = select(table.c.followup_date, *[table.c[name] for name in metrics]) \
+        .where(table.c.elderly_id == elderly_id, table.c.followup_date.isnot(None))
+    if start_date:
+        stmt = stmt.where(table.c.followup_date >= datetime.combine(start_date, datetime.min.time()))
+    if end_date:
+        # 结束日期包含当天
+        stmt = stmt.where(table.c.followup_date < datetime.combine(end_date, datetime.min.time()) + timedelta(days=1))
+    rows = db.execute(stmt.order_by(table.c.followup_date)).all()
+
+    reduce = DOWNSAMPLERS.get(downsample)
+    series = {}
+    for position, name in enumerate(metrics, start=1):
+        points = [
+            (_timestamp_ms(row[0]), float(row[position]))
+            for row in rows if row[position] is not None
+        ]
+        raw_points = len(points)
+        if reduce is not None:
+            points = reduce(points, max_points)
+        series[name] = {
+            "t": [int(t) for t, _ in points],
+            "v": [round(v, 4) for _, v in points],
+            "raw_points": raw_points
+        }
+
+    return {
+        "elderly_id": elderly_id,
+        "downsample": downsample,
+        "max_points": max_points,
+        "records": len(rows),
+        "series": series
+    }
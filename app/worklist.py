@@ -0,0 +1,114 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, func, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+
+# 医生随访待办（到期/逾期）列表
+# 以每位老人最近一次随访约定的下次随访日期为准（elderly_latest_follow_ups 汇总表），
+# 历史随访上的旧 next_follow_up_date 不会被误当作逾期。
+# 所有查询都是 (doctor_id, next_follow_up_date) 索引上的范围扫描。
+
+logger = logging.getLogger(__name__)
+
+BUCKET_OVERDUE = "overdue"  # 今天之前
+BUCKET_TODAY = "today"  # 今天
+BUCKET_WEEK = "week"  # 明天起 7 天内
+BUCKET_ALL = "all"  # 以上全部
+BUCKETS = [BUCKET_OVERDUE, BUCKET_TODAY, BUCKET_WEEK]
+
+
+def bucket_ranges(now: datetime) -> Dict[str, Tuple[datetime, datetime]]:
+    """各紧急程度对应的 [起, 止) 时间范围，起为 None 表示不设下限"""
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    tomorrow = today + timedelta(days=1)
+    return {
+        BUCKET_OVERDUE: (None, today),
+        BUCKET_TODAY: (today, tomorrow),
+        BUCKET_WEEK: (tomorrow, tomorrow + timedelta(days=7)),
+        BUCKET_ALL: (None, tomorrow + timedelta(days=7)),
+    }
+
+
+def _in_range(column, start, end):
+    if start is None:
+        return and_(column.isnot(None), column < end)
+    return and_(column >= start, column < end)
+
+
+def bucket_of(due: datetime, ranges) -> str:
+    for bucket in BUCKETS:
+        start, end = ranges[bucket]
+        if (start is None or due >= start) and due < end:
+            return bucket
+    return BUCKET_ALL
+
+
+async def get_doctor_worklist(db: AsyncSession, doctor_id: int, bucket: str = BUCKET_ALL,
+                              page: int = 1, per_page: int = 20, now: datetime = None) -> dict:
+    """分页返回指定医生名下到期/逾期的老人，并给出各紧急程度的人数"""
+    try:
+        now = now or datetime.now()
+        ranges = bucket_ranges(now)
+        latest = models.ElderlyLatestFollowUp
+        due = latest.next_follow_up_date
+
+        counts = {}
+        for name in BUCKETS:
+            start, end = ranges[name]
+            counts[name] = (await db.execute(
+                select(func.count()).select_from(latest)
+                .where(latest.doctor_id == doctor_id, _in_range(due, start, end))
+            )).scalar() or 0
+        total = sum(counts.values()) if bucket == BUCKET_ALL else counts[bucket]
+
+        start, end = ranges[bucket]
+        rows = (await db.execute(
+            select(
+                latest.elderly_id, models.Elderly.name, models.Elderly.age, models.Elderly.contact,
+                latest.last_followup_id, latest.last_followup_date, due,
+                latest.systolic_blood_pressure, latest.diastolic_blood_pressure, latest.blood_glucose
+            )
+            .join(models.Elderly, models.Elderly.id == latest.elderly_id)
+            .where(latest.doctor_id == doctor_id, _in_range(due, start, end))
+            .order_by(due, latest.elderly_id)
+            .offset((page - 1) * per_page).limit(per_page)
+        )).all()
+
+        today = ranges[BUCKET_TODAY][0]
+        items = [
+            {
+                "elderly_id": row.elderly_id,
+                "elderly_name": row.name,
+                "age": row.age,
+                "contact": row.contact,
+                "last_followup_id": row.last_followup_id,
+                "last_followup_date": row.last_followup_date,
+                "next_follow_up_date": row.next_follow_up_date,
+                "days_overdue": max((today - row.next_follow_up_date.replace(
+                    hour=0, minute=0, second=0, microsecond=0)).days, 0),
+                "bucket": bucket_of(row.next_follow_up_date, ranges),
+                "systolic_blood_pressure": row.systolic_blood_pressure,
+                "diastolic_blood_pressure": row.diastolic_blood_pressure,
+                "blood_glucose": row.blood_glucose,
+            }
+            for row in rows
+        ]
+        return {
+            "doctor_id": doctor_id,
+            "bucket": bucket,
+            "counts": counts,
+            "items": items,
+            "total": total,
+            "page": page,
+            "per_page": per_page,
+            "total_pages": (total + per_page - 1) // per_page,
+        }
+    except SQLAlchemyError as e:
+        logger.error(f"获取随访待办失败 医生ID:{doctor_id}, 错误: {str(e)}")
+        raise HTTPException(status_code=500, detail="获取随访待办失败")
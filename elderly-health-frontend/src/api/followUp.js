@@ -18,6 +18,9 @@ api.interceptors.response.use(response => {
 
 // 老人管理
 export const getElderlies = (params) => api.get('/elderly', { params })
+// 姓名输入联想：只返回 id、姓名和区分信息，k 为最多返回条数
+export const suggestElderlies = (q, k = 10) => api.get('/elderly/suggest', { params: { q, k } })
+export const suggestDoctors = (q, k = 10) => api.get('/doctors/suggest', { params: { q, k } })
 export const createElderly = (data) => api.post('/elderly', data)
 export const deleteElderly = (id) => api.delete(`/elderly/${id}`)
 // 在老人管理部分添加